@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+LLM 호출 정책 지연 시간 측정 스크립트
+==================================
+
+네트워크 없이 지연 시간과 실패를 주입한 로컬 스텁 모델로 호출 정책을 검증합니다.
+- 헤지 요청 사용/미사용 시 p50/p95/p99 지연 시간 비교
+- 기본 모델 장애 시 서킷 브레이커가 열리고 대체 모델로 전환되는지 확인
+
+사용법:
+    python benchmarks/call_policy_latency.py --calls 400
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.models import CallPolicyConfig
+from chatbot_modules.call_stats import CallStats
+from chatbot_modules.call_policy import CallPolicy
+from chatbot_modules.stub_llm import StubChatModel, heavy_tail_latency
+
+def _percentiles(latencies):
+    """p50/p95/p99(ms)를 계산합니다."""
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.mean(ordered) * 1000}
+
+def run_latency(calls: int, hedge: bool, base: float, tail: float, tail_probability: float):
+    """헤지 사용 여부에 따른 지연 시간 분포를 측정합니다."""
+    stub = StubChatModel(latency=heavy_tail_latency(base, tail, tail_probability, seed=7), model_name="primary")
+    config = CallPolicyConfig(primary_model="primary", fallback_model="fallback", hedge_enabled=hedge,
+                              hedge_min_delay=base, hedge_min_samples=20)
+    policy = CallPolicy(config, llm_factory=lambda **kwargs: stub, stats=CallStats())
+
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        policy.invoke("generate_response", [{"role": "user", "content": "안녕"}])
+        latencies.append(time.perf_counter() - started)
+    return _percentiles(latencies), stub.calls
+
+def run_breaker(calls: int):
+    """기본 모델이 항상 실패할 때 대체 모델로 전환되는지 확인합니다."""
+    models = {
+        "primary": StubChatModel(latency=0.001, failure_rate=1.0, model_name="primary"),
+        "fallback": StubChatModel(latency=0.001, model_name="fallback"),
+    }
+    config = CallPolicyConfig(primary_model="primary", fallback_model="fallback",
+                              retry_base_delay=0.001, retry_max_delay=0.01, breaker_failure_threshold=3)
+    policy = CallPolicy(config, llm_factory=lambda model_name, **kwargs: models[model_name], stats=CallStats())
+
+    succeeded = 0
+    for _ in range(calls):
+        try:
+            policy.invoke("generate_response", [{"role": "user", "content": "안녕"}])
+            succeeded += 1
+        except Exception:
+            pass
+    return succeeded, models["primary"].calls, models["fallback"].calls
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="스텁 모델로 호출 정책의 지연 시간을 측정합니다.")
+    parser.add_argument("--calls", type=int, default=400, help="측정할 호출 수")
+    parser.add_argument("--base", type=float, default=0.02, help="일반 호출 지연 시간(초)")
+    parser.add_argument("--tail", type=float, default=0.5, help="느린 호출 지연 시간(초)")
+    parser.add_argument("--tail-probability", type=float, default=0.05, help="느린 호출 비율")
+    args = parser.parse_args()
+
+    for hedge in (False, True):
+        result, stub_calls = run_latency(args.calls, hedge, args.base, args.tail, args.tail_probability)
+        label = "헤지 사용" if hedge else "헤지 없음"
+        print(f"{label}: p50 {result['p50']:.1f} ms, p95 {result['p95']:.1f} ms, "
+              f"p99 {result['p99']:.1f} ms, 평균 {result['mean']:.1f} ms, 스텁 호출 {stub_calls}회")
+
+    succeeded, primary_calls, fallback_calls = run_breaker(20)
+    print(f"서킷 브레이커: 성공 {succeeded}/20, 기본 모델 호출 {primary_calls}회, 대체 모델 호출 {fallback_calls}회")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
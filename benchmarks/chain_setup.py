@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+체인 생성 비용 측정 스크립트
+==========================
+
+대화 맥락 추적 노드의 LLM 체인을 호출할 때마다 만드는 이전 방식(ChatPromptTemplate.from_messages +
+f-string으로 채운 SystemMessage + prompt | llm | StrOutputParser() | lambda)과 그래프 생성 시 한 번 만든
+체인(chains.chain_registry)에 입력 변수만 넘기는 현재 방식을 비교합니다.
+- 체인 생성: 호출마다 체인을 만드는 시간 (현재 방식은 레지스트리 조회)
+- 호출 전체: 지연 시간이 없는 스텁 모델로 체인 생성 + 실행까지의 시간
+
+사용법:
+    python benchmarks/chain_setup.py --calls 2000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.call_policy import call_policy
+from chatbot_modules.chains import chain_registry
+from chatbot_modules.graph_nodes import context_tracking_inputs, context_tracking_prompt
+from chatbot_modules.stub_llm import stub_llm_factory
+
+_CONTEXT = {
+    "main_topics": ["등산", "회사", "이직"],
+    "current_context": "주말 등산 계획과 이직 고민을 이야기하는 중",
+    "pending_questions": ["어느 산이 좋을까?"],
+    "references": {"산": "북한산", "회사": "스타트업"}
+}
+_MESSAGE = "이번 주말에 북한산 가려고 하는데 날씨가 괜찮을까?"
+
+def _legacy_chain(user_id: str):
+    """이전 방식: 호출마다 프롬프트와 체인을 새로 만듭니다."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.messages import SystemMessage, HumanMessage
+    from langchain_core.output_parsers import StrOutputParser
+
+    llm = call_policy.as_runnable("track_conversation_context", user_id, temperature=0)
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=context_tracking_prompt(_CONTEXT)),
+        HumanMessage(content=f"사용자의 마지막 메시지: {_MESSAGE}")
+    ])
+    return prompt | llm | StrOutputParser() | (lambda x: json.loads(x) if x.strip() else {})
+
+def _per_call_us(function, calls: int) -> float:
+    """함수를 calls번 실행한 호출당 평균 시간(μs)을 반환합니다."""
+    started = time.perf_counter()
+    for index in range(calls):
+        function(index)
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="호출마다 체인을 만드는 방식과 미리 만든 체인의 호출당 비용을 비교합니다.")
+    parser.add_argument("--calls", type=int, default=2000, help="측정 호출 수")
+    args = parser.parse_args()
+
+    # 로그 파일이 측정 중에 만들어지지 않도록 로깅 비활성화
+    import logging
+    logging.disable(logging.CRITICAL)
+    call_policy.configure(llm_factory=stub_llm_factory())
+    chain_registry.build()
+
+    # 워밍업 (지연 import와 모델 생성 제외)
+    _legacy_chain("bench_user").invoke({})
+    chain_registry.invoke("track_conversation_context", {**context_tracking_inputs(_CONTEXT), "last_message": _MESSAGE},
+                          user_id="bench_user")
+
+    legacy_setup = _per_call_us(lambda i: _legacy_chain(f"user_{i % 50}"), args.calls)
+    current_setup = _per_call_us(lambda i: chain_registry.get("track_conversation_context"), args.calls)
+    legacy_total = _per_call_us(lambda i: _legacy_chain(f"user_{i % 50}").invoke({}), args.calls)
+    current_total = _per_call_us(
+        lambda i: chain_registry.invoke("track_conversation_context",
+                                        {**context_tracking_inputs(_CONTEXT), "last_message": _MESSAGE},
+                                        user_id=f"user_{i % 50}"),
+        args.calls)
+
+    print(f"체인 생성: 이전 방식 {legacy_setup:8.1f} μs/호출, 현재 방식 {current_setup:8.1f} μs/호출")
+    print(f"호출 전체: 이전 방식 {legacy_total:8.1f} μs/호출, 현재 방식 {current_total:8.1f} μs/호출 "
+          f"({(1 - current_total / legacy_total) * 100:.1f}% 감소)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
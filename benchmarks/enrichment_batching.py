@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+보조 노드 묶음 효과 측정 스크립트
+==============================
+
+여러 사용자가 동시에 대화할 때 맥락 추적/정보 추출 호출을 사용자마다 따로 보내는 방식과
+짧은 구간 동안 모아 한 요청으로 보내는 방식(enrichment_batcher)을 비교합니다.
+- 노드별 LLM 요청 수 (묶음 요청은 한 번으로 셈)
+- 턴 처리 시간 p50/p95 (묶음을 기다리는 시간 포함)
+- 묶음 크기 분포
+
+스텁 모델은 호출마다 고정 지연 시간을 주며 업스트림 동시 처리 한도를 둘 수 있어,
+요청 수가 줄면 속도 제한 압력이 어떻게 달라지는지 볼 수 있습니다.
+
+사용법:
+    python benchmarks/enrichment_batching.py --users 16 --turns 5 --latency 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.stub_llm import StubChatModel, _default_responder
+
+def _user_message(user: int, turn: int) -> str:
+    """합성 사용자 메시지 (게이트를 통과하고 개인정보 키워드로 정보 추출을 바로 실행)"""
+    return f"사용자{user}의 {turn}번째 이야기: 내 직업 때문에 요즘 회사 일이 많아서 주말마다 등산을 못 가고 있어. 어떻게 하지?"
+
+def _percentile(values: list, q: float) -> float:
+    """값 목록의 q 분위수"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def run(args, batching: bool) -> dict:
+    """사용자들이 동시에 대화하는 동안 요청 수와 턴 처리 시간을 측정합니다."""
+    from chatbot_modules.models import EnrichmentBatchConfig
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.enrichment_batcher import enrichment_batcher
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.logging_utils import get_log_context, set_log_context
+    from chatbot_modules.main import create_persona_chatbot
+    from chatbot_modules.metrics import metrics
+
+    requests = Counter()
+    lock = threading.Lock()
+
+    def _responder(messages):
+        with lock:
+            requests[get_log_context().get("node", "unknown")] += 1
+        return _default_responder(messages)
+
+    def _factory(model_name: str = "stub", **llm_kwargs):
+        return StubChatModel(model_name=model_name, latency=args.latency, responder=_responder,
+                             concurrency_limit=args.upstream_limit)
+
+    call_policy.configure(llm_factory=_factory)
+    enrichment_batcher.configure(EnrichmentBatchConfig(enabled=batching, max_batch_size=args.batch_size,
+                                                       window_ms=args.window_ms))
+    chatbot = create_persona_chatbot()
+    metrics.reset()
+    prefix = "batch" if batching else "single"
+    turn_times = []
+
+    def _conversation(user: int):
+        user_id = f"{prefix}_user_{user}"
+        thread_id = f"thread_{user_id}"
+        state = {"user_id": user_id, "conversation_id": thread_id, "message_count": 0}
+        set_log_context(user_id=user_id)
+        for turn in range(args.turns):
+            message_store.append(thread_id, "user", _user_message(user, turn))
+            state["message_count"] = message_store.count(thread_id)
+            started = time.perf_counter()
+            state = chatbot.invoke(state, {"configurable": {"thread_id": thread_id}})
+            with lock:
+                turn_times.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(_conversation, range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    sizes = Counter()
+    for value in metrics.snapshot()["metrics"]["chatbot_enrichment_batch_size"]["values"]:
+        previous = 0
+        for bound, total in value["buckets"].items():
+            if total > previous:
+                sizes[f"{value['labels']['kind']}≤{bound}"] += total - previous
+            previous = total
+    return {"requests": dict(requests), "elapsed": elapsed, "p50": _percentile(turn_times, 0.5),
+            "p95": _percentile(turn_times, 0.95), "sizes": dict(sizes)}
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="보조 노드 호출을 사용자마다 보내는 방식과 묶어 보내는 방식을 비교합니다.")
+    parser.add_argument("--users", type=int, default=16, help="동시에 대화하는 사용자 수")
+    parser.add_argument("--turns", type=int, default=5, help="사용자별 대화 턴 수")
+    parser.add_argument("--latency", type=float, default=0.05, help="스텁 모델 호출당 지연 시간(초)")
+    parser.add_argument("--upstream-limit", type=int, default=0, help="스텁 모델 업스트림 동시 처리 한도 (0이면 없음)")
+    parser.add_argument("--batch-size", type=int, default=8, help="묶음 최대 작업 수")
+    parser.add_argument("--window-ms", type=float, default=20.0, help="묶음 대기 시간(ms)")
+    args = parser.parse_args()
+
+    # 로그 파일이 측정 중에 만들어지지 않도록 로깅 비활성화
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"사용자 {args.users}명 x {args.turns}턴, 스텁 지연 {args.latency * 1000:.0f} ms, "
+          f"묶음 최대 {args.batch_size}개/{args.window_ms:.0f} ms")
+    results = {"사용자별 호출": run(args, batching=False), "묶음 호출": run(args, batching=True)}
+    for name, result in results.items():
+        enrichment = sum(count for node, count in result["requests"].items() if node != "generate_response")
+        print(f"{name:8s} 보조 노드 요청 {enrichment:4d}회, 응답 생성 요청 {result['requests'].get('generate_response', 0):4d}회, "
+              f"턴 p50 {result['p50'] * 1000:6.1f} ms, p95 {result['p95'] * 1000:6.1f} ms, 전체 {result['elapsed']:.2f}초")
+    print(f"묶음 크기 분포: {results['묶음 호출']['sizes']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+import 시간 측정 스크립트
+======================
+
+`python -X importtime`으로 주요 진입 모듈의 누적 import 시간을 측정하고,
+예산(import_budget.json)을 넘으면 0이 아닌 종료 코드를 반환합니다.
+
+사용법:
+    python benchmarks/import_time.py              # 측정 및 예산 검사
+    python benchmarks/import_time.py --top 15     # 가장 느린 import 15개 출력
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+# "import time:   self [us] | cumulative | imported package" 형식의 줄
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure_import(module: str) -> dict:
+    """새 인터프리터에서 모듈을 import하고 누적 시간(ms)과 import 목록을 반환합니다."""
+    env = dict(os.environ)
+    # API 키가 없어도 import가 가능해야 하므로 측정용 값을 넣어둠
+    env.setdefault("OPENAI_API_KEY", "import-time-benchmark")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"'{module}' import 실패:\n{result.stderr[-2000:]}")
+
+    imports = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        imports.append((name, int(self_us), int(cumulative_us)))
+        # 대상 모듈의 누적 시간 (인터프리터 시작 시 로드되는 모듈은 제외)
+        if name == module:
+            total_us = int(cumulative_us)
+    return {"total_ms": total_us / 1000, "imports": imports}
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="주요 모듈의 import 시간을 측정합니다.")
+    parser.add_argument("--runs", type=int, default=5, help="모듈별 반복 측정 횟수 (중앙값 사용)")
+    parser.add_argument("--top", type=int, default=0, help="가장 느린 import(자체 시간 기준) 출력 개수")
+    parser.add_argument("--budget", default=BUDGET_FILE, help="예산 파일 경로 (모듈: 최대 ms)")
+    args = parser.parse_args()
+
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        budgets = json.load(f)
+
+    failed = False
+    for module, budget_ms in budgets.items():
+        runs = [measure_import(module) for _ in range(args.runs)]
+        median_ms = statistics.median(run["total_ms"] for run in runs)
+        status = "OK" if median_ms <= budget_ms else "초과"
+        failed = failed or median_ms > budget_ms
+        print(f"{module:<40} {median_ms:8.1f} ms  (예산 {budget_ms} ms)  {status}")
+
+        if args.top:
+            slowest = sorted(runs[-1]["imports"], key=lambda x: x[1], reverse=True)[:args.top]
+            for name, self_us, cumulative_us in slowest:
+                print(f"    {name:<50} self {self_us / 1000:7.1f} ms  cumulative {cumulative_us / 1000:7.1f} ms")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+LLM 작업 스케줄러 부하 테스트 스크립트
+===================================
+
+동시 처리 한도가 있는 로컬 스텁 모델(업스트림 속도 제한 모의)에 이전 로그 분석(backfill)과
+정보 추출(enrichment) 작업을 쏟아붓는 동안 응답 생성(interactive) 지연 시간을 측정합니다.
+스케줄러를 끈 경우(모든 호출이 업스트림 앞에서 순서 없이 경쟁)와 켠 경우를 비교합니다.
+
+사용법:
+    python benchmarks/llm_scheduler_load.py --seconds 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.models import CallPolicyConfig, LLMSchedulerConfig
+from chatbot_modules.call_policy import CallPolicy
+from chatbot_modules.call_stats import CallStats
+from chatbot_modules.llm_scheduler import LLMLoadShedError, llm_scheduler
+from chatbot_modules.logging_utils import set_log_context
+from chatbot_modules.stub_llm import stub_llm_factory
+
+def _percentile(values, q):
+    """분위수(ms)를 계산합니다."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+def run(enabled: bool, args) -> dict:
+    """스케줄러를 켜거나 끈 상태로 부하를 걸고 결과를 반환합니다."""
+    llm_scheduler.configure(LLMSchedulerConfig(enabled=enabled, max_concurrency=args.upstream, tokens_per_minute=0))
+    policy = CallPolicy(
+        CallPolicyConfig(hedge_enabled=False, max_retries=0, default_deadline=60.0,
+                         node_deadlines={}, turn_budget_seconds=60.0),
+        llm_factory=stub_llm_factory(latency=args.latency, concurrency_limit=args.upstream, scheduler=llm_scheduler),
+        stats=CallStats()
+    )
+    stop = threading.Event()
+    results = {"interactive": [], "enrichment": 0, "enrichment_shed": 0, "backfill": 0}
+    lock = threading.Lock()
+
+    def _background(node: str, key: str, user_id: str):
+        set_log_context(user_id=user_id)
+        while not stop.is_set():
+            try:
+                policy.invoke(node, [{"role": "user", "content": "분석"}], user_id=user_id)
+                with lock:
+                    results[key] += 1
+            except LLMLoadShedError:
+                with lock:
+                    results[f"{key}_shed"] = results.get(f"{key}_shed", 0) + 1
+                time.sleep(args.latency)
+
+    def _interactive(user_id: str):
+        set_log_context(user_id=user_id)
+        while not stop.is_set():
+            started = time.perf_counter()
+            policy.invoke("generate_response", [{"role": "user", "content": "안녕"}], user_id=user_id)
+            with lock:
+                results["interactive"].append(time.perf_counter() - started)
+            time.sleep(args.think_time)
+
+    threads = [threading.Thread(target=_background, args=("analyze_previous_logs", "backfill", f"backfill_{i}"))
+               for i in range(args.backfill)]
+    threads += [threading.Thread(target=_background, args=("extract_user_information", "enrichment", f"user_{i}"))
+                for i in range(args.enrichment)]
+    threads += [threading.Thread(target=_interactive, args=(f"user_{i}",)) for i in range(args.interactive)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    results["scheduler"] = llm_scheduler.stats()
+    return results
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="부하 상황에서 LLM 작업 스케줄러의 우선순위/부하 차단 동작을 확인합니다.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="측정 시간(초)")
+    parser.add_argument("--upstream", type=int, default=4, help="스텁 모델의 동시 처리 한도")
+    parser.add_argument("--latency", type=float, default=0.1, help="스텁 모델 호출당 지연 시간(초)")
+    parser.add_argument("--backfill", type=int, default=32, help="이전 로그 분석 작업 스레드 수")
+    parser.add_argument("--enrichment", type=int, default=8, help="정보 추출 작업 스레드 수")
+    parser.add_argument("--interactive", type=int, default=4, help="응답 생성 사용자 수")
+    parser.add_argument("--think-time", type=float, default=0.2, help="응답 생성 사이 대기 시간(초)")
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        result = run(enabled, args)
+        label = "스케줄러 사용" if enabled else "스케줄러 없음"
+        print(f"{label}: 응답 생성 p50 {_percentile(result['interactive'], 0.5):7.1f} ms, "
+              f"p95 {_percentile(result['interactive'], 0.95):7.1f} ms ({len(result['interactive'])}회), "
+              f"정보 추출 {result['enrichment']}회 (버림 {result['enrichment_shed']}회), 로그 분석 {result['backfill']}회")
+        if enabled:
+            for priority, stats in result["scheduler"]["priorities"].items():
+                print(f"  {priority:<11} 대기 p50 {stats['wait_p50_ms']} ms, p95 {stats['wait_p95_ms']} ms, "
+                      f"입장 {stats['admitted']}회, 버림 {stats['shed']}회")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+로그 형식 크기/파싱 시간 비교 스크립트
+====================================
+
+긴 합성 대화 세션을 전체 기록 형식(항목마다 전체 요청 메시지 기록)으로 만든 뒤
+델타 형식으로 변환하여 다음을 비교합니다. 실제 그래프처럼 턴마다 응답 생성 호출 사이에
+맥락 추적/정보 추출 호출이 번갈아 기록됩니다.
+- 로그 파일 크기
+- iter_log_file + extract_conversation_turn 파싱 시간 (이전 로그 로딩 경로)
+- batch_analysis.parse_log_file 파싱 시간 (일괄 분석 경로)
+- 두 형식에서 추출한 대화 턴이 같은지 확인
+- 왕복 확인: 델타 로그를 iter_log_file로 읽은 모든 항목의 요청/응답이 원본과 같은지 확인
+- 역방향 확인: 키프레임 간격을 작게 둔 델타 로그를 iter_log_file_reversed로 읽은 결과가 원본의 역순과 같은지,
+  마지막 항목 하나를 읽을 때 파일 전체가 아닌 마지막 구간만 복원하는지 확인
+- 응답 생성 델타 항목 크기가 대화 길이와 무관하게 유지되는지 확인 (처음/마지막 10% 평균 비교)
+
+사용법:
+    python benchmarks/log_format_size.py --turns 2000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.models import FRIEND_PERSONA
+from chatbot_modules.log_format import convert_log_file
+from chatbot_modules.log_analysis import iter_log_file, iter_log_file_reversed, extract_conversation_turn
+from chatbot_modules.batch_analysis import parse_log_file
+
+def write_full_log(path: str, turns: int) -> list:
+    """응답 생성 호출마다 전체 대화 기록을 요청에 담은 전체 기록 형식 로그를 만들고 기록한 항목을 반환합니다.
+
+    턴마다 응답 생성 앞뒤로 맥락 추적/정보 추출 호출 항목을 같은 user_id로 끼워 넣습니다.
+    """
+    messages = [{"role": "system", "content": FRIEND_PERSONA["system_prompt"]}]
+    entries = []
+
+    def _entry(turn: int, node: str, request: list, response: dict) -> dict:
+        index = len(entries)
+        entry = {
+            "timestamp": f"2026-01-01T{turn // 3600 % 24:02d}:{turn // 60 % 60:02d}:{turn % 60:02d}.{index:06d}",
+            "id": f"entry-{index}",
+            "source": "LoggingChatOpenAI",
+            "user_id": "user_benchmark",
+            "node": node,
+            "request": request,
+            "response": response,
+            "latency_ms": 850.0
+        }
+        entries.append(entry)
+        return entry
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for turn in range(turns):
+            message = {"role": "human", "content": f"{turn}번째 이야기인데, 오늘 회사에서 있었던 일 들어볼래?"}
+            context = {"role": "system", "content": f"사용자의 마지막 메시지를 분석하세요. 이전 맥락 정보: {{\"turn\":{turn}}}"}
+            profile = {"role": "system", "content": f"사용자 정보의 변경분을 추출하세요. 이미 알고 있는 정보: {{\"turn\":{turn}}}"}
+            messages.append(message)
+            response = {"role": "ai", "content": f"당연하지! {turn}번째 이야기도 궁금해. 무슨 일이 있었어?"}
+            turn_entries = [
+                _entry(turn, "track_conversation_context", [context, message], {"role": "ai", "content": "{}"}),
+                _entry(turn, "generate_response", list(messages), response),
+                _entry(turn, "extract_user_information", [profile, message], {"role": "ai", "content": "{}"}),
+            ]
+            for entry in turn_entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            messages.append(response)
+    return entries
+
+def check_round_trip(path: str, originals: list, reverse: bool = False) -> bool:
+    """델타 로그를 iter_log_file(reverse면 iter_log_file_reversed)로 읽은 항목이 원본 항목과 같은지 확인합니다."""
+    decoded = list(reversed(list(iter_log_file_reversed(path)))) if reverse else list(iter_log_file(path))
+    if len(decoded) != len(originals):
+        return False
+    for entry, original in zip(decoded, originals):
+        if list(entry["request"]) != original["request"] or entry["response"] != original["response"]:
+            return False
+    return True
+
+def response_entry_sizes(path: str) -> list:
+    """델타 로그의 응답 생성 항목 크기(bytes) 목록"""
+    sizes = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if '"node": "generate_response"' in line:
+                sizes.append(len(line.encode('utf-8')))
+    return sizes
+
+def _timed(function, repeat: int):
+    """함수를 repeat번 실행하여 가장 짧은 시간(초)과 결과를 반환합니다."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="전체 기록 형식과 델타 형식 로그의 크기/파싱 시간을 비교합니다.")
+    parser.add_argument("--turns", type=int, default=2000, help="합성 세션의 대화 턴 수")
+    parser.add_argument("--repeat", type=int, default=3, help="파싱 시간 측정 반복 횟수")
+    parser.add_argument("--keyframe-kib", type=int, default=1024, help="역방향 확인용 델타 로그의 키프레임 간격(KiB)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        full_path = os.path.join(directory, "full.json")
+        delta_path = os.path.join(directory, "delta.json")
+        originals = write_full_log(full_path, args.turns)
+        convert_log_file(full_path, delta_path)
+
+        results = {}
+        for label, path in (("전체 기록", full_path), ("델타", delta_path)):
+            load_time, turns = _timed(
+                lambda: [extract_conversation_turn(entry) for entry in iter_log_file(path)], args.repeat)
+            batch_time, _ = _timed(lambda: parse_log_file(path, max_turns=args.turns), args.repeat)
+            results[label] = turns
+            print(f"{label:>6}: {os.path.getsize(path) / 1024 / 1024:8.2f} MiB, "
+                  f"로그 로딩 {load_time * 1000:8.1f} ms, 일괄 분석 파싱 {batch_time * 1000:8.1f} ms")
+
+        same = results["전체 기록"] == results["델타"]
+        print(f"추출한 대화 턴 일치: {same} ({len(results['델타'])}턴)")
+        round_trip = check_round_trip(delta_path, originals)
+        print(f"델타 로그 왕복 복원 일치: {round_trip} ({len(originals)}개 항목, 노드 3개 교차)")
+
+        sizes = response_entry_sizes(delta_path)
+        window = max(1, len(sizes) // 10)
+        first, last = sum(sizes[:window]) / window, sum(sizes[-window:]) / window
+        # 턴 번호 자릿수만큼만 늘어나야 함 (대화 길이에 비례해 늘면 직전 항목 재사용 실패)
+        constant = last <= first * 1.2
+        print(f"응답 생성 델타 항목 크기: 처음 {first:.0f} bytes → 마지막 {last:.0f} bytes (일정 유지: {constant})")
+
+        # 키프레임 간격을 작게 두고 역방향 읽기 확인
+        keyframe_path = os.path.join(directory, "keyframes.json")
+        convert_log_file(full_path, keyframe_path, keyframe_interval_bytes=args.keyframe_kib * 1024)
+        with open(keyframe_path, 'r', encoding='utf-8') as f:
+            keyframes = sum(1 for line in f if '"keyframe": true' in line)
+        reversed_ok = check_round_trip(keyframe_path, originals, reverse=True)
+        tail_time, _ = _timed(lambda: next(iter_log_file_reversed(keyframe_path)), args.repeat)
+        full_time, _ = _timed(lambda: list(iter_log_file(keyframe_path)), args.repeat)
+        print(f"키프레임 {args.keyframe_kib} KiB: {os.path.getsize(keyframe_path) / 1024 / 1024:.2f} MiB, 키프레임 {keyframes}개, "
+              f"역방향 복원 일치: {reversed_ok}, 마지막 항목 읽기 {tail_time * 1000:.1f} ms (전체 읽기 {full_time * 1000:.1f} ms)")
+        return 0 if same and round_trip and constant and reversed_ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
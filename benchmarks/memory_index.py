@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+장기 기억 인덱스 성능 측정 스크립트
+================================
+
+사용자 한 명의 인덱스에 합성 대화 턴을 대량으로 넣고 다음을 측정합니다.
+- 일괄 임베딩/추가 처리량 (턴/초)
+- 대화 중 턴 하나씩 추가하는 지연 시간
+- 질의 하나의 검색 지연 시간 p50/p95 (임베딩 포함)
+- 여러 질의를 한 번에 검색하는 배치 검색 지연 시간
+- 인덱스에 심어 둔 턴을 다시 찾는지 확인
+
+사용법:
+    python benchmarks/memory_index.py --turns 100000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.models import MemoryIndexConfig
+from chatbot_modules.memory_index import LongTermMemory
+
+_SUBJECTS = ["회사", "학교", "친구", "가족", "운동", "요리", "여행", "게임", "음악", "영화", "강아지", "고양이", "주식", "날씨"]
+_VERBS = ["때문에 피곤해", "얘기 좀 들어줄래", "이 요즘 재밌어", "계획 세우는 중이야", "생각하면 기분 좋아", "이 걱정돼"]
+
+# 검색 확인용으로 심어 둘 턴 (사용자 메시지, 질의)
+_PLANTED = [
+    ("우리 집 앵무새 이름은 망고야", "앵무새 망고가 오늘 말을 따라 했어"),
+    ("나 내년 봄에 포르투갈 리스본으로 이사 가", "리스본 집값 어때?"),
+    ("요즘 바이올린 레슨 받고 있어", "바이올린 연습하기 싫다"),
+]
+
+def _synthetic_turns(count: int, seed: int = 7):
+    """합성 대화 턴을 만듭니다."""
+    rng = random.Random(seed)
+    for i in range(count):
+        subject = rng.choice(_SUBJECTS)
+        yield (f"{i}일차 {subject}{rng.choice(_VERBS)} {rng.choice(_SUBJECTS)} 얘기도 하고 싶어", f"{subject} 얘기 좋아!")
+
+def _percentile(values, q):
+    """분위수(ms)를 계산합니다."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="장기 기억 인덱스의 추가/검색 성능을 측정합니다.")
+    parser.add_argument("--turns", type=int, default=100000, help="인덱스에 넣을 턴 수")
+    parser.add_argument("--queries", type=int, default=200, help="검색 지연 시간 측정 질의 수")
+    parser.add_argument("--batch", type=int, default=32, help="배치 검색 질의 수")
+    parser.add_argument("--dim", type=int, default=MemoryIndexConfig().dim, help="임베딩 차원 수")
+    args = parser.parse_args()
+
+    config = MemoryIndexConfig(dim=args.dim)
+    memory = LongTermMemory(config)
+    user_id = "user_benchmark"
+
+    # 일괄 추가 (이전 로그 인덱싱 경로)
+    started = time.perf_counter()
+    batch = []
+    for turn in _synthetic_turns(args.turns):
+        batch.append(turn)
+        if len(batch) >= config.index_batch_size:
+            memory.add_turns(user_id, batch)
+            batch = []
+    memory.add_turns(user_id, batch + [(text, "응") for text, _ in _PLANTED])
+    elapsed = time.perf_counter() - started
+    index = memory._indexes[user_id]
+    print(f"일괄 추가: {memory.size(user_id):,}턴, {elapsed:.2f} s ({memory.size(user_id) / elapsed:,.0f}턴/s), "
+          f"벡터 메모리 {index.nbytes() / 1024 / 1024:.1f} MiB")
+
+    # 대화 중 턴 하나씩 추가
+    latencies = []
+    for i, (user_text, assistant_text) in enumerate(_synthetic_turns(args.queries, seed=11)):
+        started = time.perf_counter()
+        memory.add_turn(user_id, user_text, assistant_text, conversation_id="current")
+        latencies.append(time.perf_counter() - started)
+    print(f"턴 하나 추가: p50 {_percentile(latencies, 0.5):.2f} ms, p95 {_percentile(latencies, 0.95):.2f} ms")
+
+    # 질의 하나씩 검색 (manage_messages 경로)
+    rng = random.Random(3)
+    queries = [f"{rng.choice(_SUBJECTS)} 때문에 요즘 고민이야" for _ in range(args.queries)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        memory.recall(user_id, query, exclude_conversation="current")
+        latencies.append(time.perf_counter() - started)
+    print(f"단일 검색: p50 {_percentile(latencies, 0.5):.2f} ms, p95 {_percentile(latencies, 0.95):.2f} ms")
+
+    # 배치 검색
+    started = time.perf_counter()
+    memory.search_many(user_id, queries[:args.batch])
+    elapsed = time.perf_counter() - started
+    print(f"배치 검색: 질의 {args.batch}개 {elapsed * 1000:.1f} ms (질의당 {elapsed * 1000 / args.batch:.2f} ms)")
+
+    # 심어 둔 턴 검색 확인
+    found = 0
+    for planted, query in _PLANTED:
+        matches = memory.recall(user_id, query)
+        found += any(match["user"] == planted for match in matches)
+    print(f"심어 둔 턴 검색: {found}/{len(_PLANTED)}")
+    return 0 if found == len(_PLANTED) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+장시간 대화 메모리 소크 테스트 스크립트
+====================================
+
+여러 가상 사용자가 번갈아 수천 턴을 대화하는 동안(LLM은 네트워크 없이 스텁 모델 사용)
+일정 턴마다 tracemalloc 스냅샷을 찍어 메모리 증가가 어디에서 생기는지 보여 줍니다.
+- 할당 위치별: 스냅샷 차이를 호출 스택에서 가장 가까운 모듈 분류(사용자 상태, 체크포인트, 메시지 저장소 등)로 집계
+- 구조별: 사용자 상태 딕셔너리, MemorySaver 체크포인트, 메시지 저장소, 장기 기억 인덱스, LLM 클라이언트 캐시 등
+  각 구조가 실제로 참조하는 객체 크기와 항목 수
+
+워밍업(모든 사용자의 첫 턴) 이후 턴당 증가 바이트가 예산을 넘으면 종료 코드 1을 반환합니다.
+
+사용법:
+    python benchmarks/memory_soak.py --users 50 --turns 3000 --budget-bytes-per-turn 24000
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import types
+import functools
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.stub_llm import StubChatModel
+
+# 할당 위치 분류 (파일 경로에 포함된 문자열, 호출 스택의 안쪽 프레임부터 처음 맞는 분류 사용)
+_SITE_CATEGORIES = [
+    ("user_state", ("chatbot_modules/state_management.py",)),
+    ("message_store", ("chatbot_modules/message_store.py",)),
+    ("checkpoints", ("langgraph/checkpoint/",)),
+    ("long_term_memory", ("chatbot_modules/memory_index.py",)),
+    ("llm_clients", ("chatbot_modules/llm_wrappers.py", "chatbot_modules/stub_llm.py", "langchain_openai/")),
+    ("call_policy", ("chatbot_modules/call_policy.py", "chatbot_modules/call_stats.py",
+                     "chatbot_modules/llm_scheduler.py", "chatbot_modules/model_router.py")),
+    ("enrichment", ("chatbot_modules/extraction_scheduler.py", "chatbot_modules/turn_gating.py")),
+    ("logging", ("chatbot_modules/logging_utils.py", "chatbot_modules/log_format.py", "/logging/")),
+    ("graph_nodes", ("chatbot_modules/graph_nodes.py", "chatbot_modules/utils.py",
+                     "chatbot_modules/prompt_encoding.py")),
+    ("langgraph_runtime", ("langgraph/", "langchain_core/")),
+    ("soak_driver", ("memory_soak.py",)),
+]
+
+_TOPICS = ["등산", "회사", "요리", "여행", "운동", "게임", "음악", "영화"]
+
+def _responder(messages) -> str:
+    """보조 노드에는 맥락/사용자 정보가 바뀌는 변경분, 응답 생성에는 짧은 응답을 반환합니다."""
+    system = getattr(messages[0], "content", "")
+    content = getattr(messages[-1], "content", "")
+    topic = next((topic for topic in _TOPICS if topic in content), "일상")
+    if "대화 맥락 정보의 변경분" in system:
+        return json.dumps({"add": {"main_topics": [topic], "pending_questions": [f"{content[:12]}?"],
+                                   "references": {topic: content[:20]}},
+                           "change": {"current_context": content[:40]}}, ensure_ascii=False)
+    if "JSON" in system:
+        return json.dumps({"add": {"interests": [topic], "preferences": {topic: "좋아함"}}}, ensure_ascii=False)
+    return f"{topic} 얘기구나! {content[:30]} 더 들려줘."
+
+def _user_message(user: int, turn: int) -> str:
+    """합성 사용자 메시지"""
+    topic = _TOPICS[(user * 3 + turn) % len(_TOPICS)]
+    return f"{turn}번째 얘기인데, 요즘 {topic} 때문에 {user}번 친구랑 자주 만나. 주말에 뭐 하면 좋을까?"
+
+@functools.lru_cache(maxsize=None)
+def _file_category(filename: str):
+    """파일 경로의 할당 위치 분류를 반환합니다. (알려진 모듈이 아니면 None)"""
+    filename = filename.replace(os.sep, "/")
+    for category, patterns in _SITE_CATEGORIES:
+        if any(pattern in filename for pattern in patterns):
+            return category
+    return None
+
+def _site_category(traceback) -> str:
+    """할당 스택에서 가장 안쪽의 알려진 모듈 분류를 반환합니다."""
+    for frame in reversed(traceback):
+        category = _file_category(frame.filename)
+        if category is not None:
+            return category
+    return "other"
+
+def growth_by_site(snapshot, baseline) -> dict:
+    """두 스냅샷 사이의 증가 바이트를 할당 위치 분류별로 집계합니다."""
+    totals = defaultdict(int)
+    for stat in snapshot.compare_to(baseline, "traceback"):
+        totals[_site_category(stat.traceback)] += stat.size_diff
+    return dict(totals)
+
+def deep_size(root, exclude=()) -> int:
+    """root에서 참조로 닿는 객체의 크기 합(바이트)을 반환합니다. (모듈, 클래스, 함수와 exclude 객체는 제외)"""
+    seen = {id(obj) for obj in exclude}
+    stack, total = [root], 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+def structure_sizes(chatbot, llm_count) -> dict:
+    """의심되는 구조별 (참조 크기 바이트, 항목 수)를 반환합니다."""
+    from chatbot_modules.state_management import user_state
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.memory_index import long_term_memory
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.extraction_scheduler import extraction_scheduler
+
+    # 사용자 상태의 대화 기록은 메시지 저장소 뷰를 참조하므로 저장소 자체는 제외
+    shared = (message_store, message_store._lock, user_state._lock)
+    saver = chatbot.checkpointer
+    return {
+        "user_state.conversation_history": (deep_size(user_state.conversation_history, shared),
+                                            len(user_state.conversation_history)),
+        "user_state.user_information": (deep_size(user_state.user_information), len(user_state.user_information)),
+        "user_state.conversation_contexts": (deep_size(user_state.conversation_contexts),
+                                             len(user_state.conversation_contexts)),
+        "memory_saver.checkpoints": (deep_size((saver.storage, saver.writes, getattr(saver, "blobs", None))),
+                                     sum(len(namespaces.get("", {})) for namespaces in saver.storage.values())),
+        "message_store": (deep_size((message_store._records, message_store._refcounts, message_store._conversations)),
+                          len(message_store._records)),
+        "long_term_memory": (deep_size(long_term_memory), sum(long_term_memory.size(user_id) for user_id in
+                                                               list(user_state.conversation_history))),
+        "llm_clients": (deep_size(call_policy._llms), llm_count()),
+        "extraction_scheduler": (deep_size(extraction_scheduler), len(extraction_scheduler.known_bigrams)),
+    }
+
+def run_soak(args) -> dict:
+    """소크 테스트를 실행하고 스냅샷별 측정 결과를 반환합니다."""
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.logging_utils import set_log_context
+    from chatbot_modules.main import create_persona_chatbot
+
+    # LLM 클라이언트가 호출마다 새로 만들어지는지 확인할 수 있도록 생성 횟수를 셈
+    created = []
+
+    def _factory(model_name: str = "stub", **llm_kwargs):
+        created.append(model_name)
+        return StubChatModel(model_name=model_name, responder=_responder)
+
+    call_policy.configure(llm_factory=_factory)
+    chatbot = create_persona_chatbot()
+    states = {}
+
+    def _turn(user: int, turn: int):
+        user_id = f"soak_user_{user}"
+        thread_id = f"messages_{user_id}"
+        state = states.get(user) or {"user_id": user_id, "conversation_id": thread_id, "message_count": 0}
+        set_log_context(user_id=user_id)
+        message_store.append(thread_id, "user", _user_message(user, turn))
+        state["message_count"] = message_store.count(thread_id)
+        states[user] = chatbot.invoke(state, {"configurable": {"thread_id": thread_id}})
+
+    tracemalloc.start(args.frames)
+    # 워밍업: 모든 사용자의 첫 턴 (사용자별 고정 비용과 지연 초기화는 턴당 증가에서 제외)
+    for user in range(args.users):
+        _turn(user, 0)
+    gc.collect()
+    baseline = tracemalloc.take_snapshot()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+
+    snapshots = []
+    started = time.perf_counter()
+    for index in range(args.turns):
+        _turn(index % args.users, 1 + index // args.users)
+        done = index + 1
+        if done % args.snapshot_every == 0 or done == args.turns:
+            gc.collect()
+            snapshot = tracemalloc.take_snapshot()
+            current = tracemalloc.get_traced_memory()[0]
+            snapshots.append({
+                "turns": done,
+                "elapsed_seconds": round(time.perf_counter() - started, 1),
+                "retained_bytes": current - baseline_bytes,
+                "bytes_per_turn": (current - baseline_bytes) / done,
+                "by_site": growth_by_site(snapshot, baseline),
+                "structures": structure_sizes(chatbot, lambda: len(created))
+            })
+            print(f"{done:6d}턴: 유지 {snapshots[-1]['retained_bytes'] / 1024 / 1024:7.2f} MiB, "
+                  f"턴당 {snapshots[-1]['bytes_per_turn']:9,.0f} bytes", flush=True)
+    tracemalloc.stop()
+    return {"snapshots": snapshots, "llm_instances": len(created)}
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="여러 사용자의 긴 대화에서 메모리 증가 원인을 찾고 턴당 증가 예산을 확인합니다.")
+    parser.add_argument("--users", type=int, default=50, help="가상 사용자 수")
+    parser.add_argument("--turns", type=int, default=3000, help="워밍업 이후 전체 대화 턴 수 (사용자들이 번갈아 진행)")
+    parser.add_argument("--snapshot-every", type=int, default=500, help="스냅샷 간격(턴)")
+    parser.add_argument("--frames", type=int, default=3,
+                        help="할당 위치 분류에 사용할 호출 스택 깊이 (깊을수록 분류되지 않는 할당이 줄지만 느려짐)")
+    parser.add_argument("--budget-bytes-per-turn", type=float, default=24000, help="턴당 증가 바이트 예산")
+    parser.add_argument("--top", type=int, default=8, help="출력할 할당 위치 분류 수")
+    parser.add_argument("--output", default=None, help="스냅샷별 측정 결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    # 로그 파일이 측정 중에 만들어지지 않도록 로깅 비활성화
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"사용자 {args.users}명, 워밍업 이후 {args.turns}턴, {args.snapshot_every}턴마다 스냅샷")
+    result = run_soak(args)
+    last = result["snapshots"][-1]
+
+    print("\n할당 위치별 증가 (워밍업 이후):")
+    for category, size in sorted(last["by_site"].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {category:<20} {size / 1024:10.1f} KiB  턴당 {size / last['turns']:8,.0f} bytes")
+
+    print("\n구조별 크기 (첫 스냅샷 → 마지막 스냅샷):")
+    first = result["snapshots"][0]
+    for name, (size, items) in last["structures"].items():
+        first_size, first_items = first["structures"][name]
+        print(f"  {name:<34} {first_size / 1024:9.1f} → {size / 1024:9.1f} KiB  (항목 {first_items} → {items})")
+    print(f"LLM 클라이언트 생성 {result['llm_instances']}회")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    within_budget = last["bytes_per_turn"] <= args.budget_bytes_per_turn
+    print(f"\n턴당 {last['bytes_per_turn']:,.0f} bytes (예산 {args.budget_bytes_per_turn:,.0f}): "
+          f"{'통과' if within_budget else '초과'}")
+    return 0 if within_budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
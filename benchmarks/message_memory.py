@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+대화 메시지 메모리 사용량 측정 스크립트
+====================================
+
+긴 대화 세션에서 턴당 유지되는 메모리(바이트)를 tracemalloc으로 측정합니다.
+- 이전 방식: 그래프 상태에 메시지 목록을 두고 매 턴 LangChain 메시지 사본(updated_messages)과
+  정규화된 대화 기록 사본을 만들며, 체크포인트가 전체 메시지 목록을 저장
+- 현재 방식: 메시지 저장소에 한 번만 저장하고 그래프 상태/체크포인트/대화 기록은 ID와 메시지 수만 유지
+
+LLM은 네트워크 없이 스텁 모델을 사용합니다.
+
+사용법:
+    python benchmarks/message_memory.py --turns 1000 --legacy-turns 200
+"""
+
+import os
+import sys
+import argparse
+import datetime
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.stub_llm import stub_llm_factory
+
+def _user_message(turn: int) -> str:
+    """측정용 사용자 메시지를 만듭니다."""
+    return f"{turn}번째 이야기: 오늘은 회사 끝나고 친구랑 한강에서 자전거를 탔는데 바람이 많이 불어서 힘들었어."
+
+def _build_legacy_graph(llm):
+    """이전 방식(메시지 목록 상태)의 그래프를 재현합니다."""
+    from langgraph.graph import StateGraph, END
+    from langgraph.checkpoint.memory import MemorySaver
+    from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+    from chatbot_modules.models import FRIEND_PERSONA
+
+    history = {}
+
+    def manage_messages(state):
+        # 정규화된 대화 기록 사본 저장
+        history[state["user_id"]] = [
+            {"role": msg["role"], "content": msg["content"], "timestamp": datetime.datetime.now().isoformat()}
+            for msg in state["messages"]
+        ]
+        # 매 턴 전체 LangChain 메시지 사본 생성
+        chat_messages = [SystemMessage(content=FRIEND_PERSONA["system_prompt"])]
+        for msg in state["messages"]:
+            message_class = HumanMessage if msg["role"] == "user" else AIMessage
+            chat_messages.append(message_class(content=msg["content"]))
+        state["updated_messages"] = chat_messages
+        return state
+
+    def generate_response(state):
+        response = llm.invoke(state["updated_messages"])
+        state["messages"].append({"role": "assistant", "content": response.content})
+        state["response"] = response.content
+        return state
+
+    graph = StateGraph(dict)
+    graph.add_node("manage_messages", manage_messages)
+    graph.add_node("generate_response", generate_response)
+    graph.add_edge("manage_messages", "generate_response")
+    graph.add_edge("generate_response", END)
+    graph.set_entry_point("manage_messages")
+    return graph.compile(checkpointer=MemorySaver()), history
+
+def run_legacy(turns: int) -> int:
+    """이전 방식으로 대화를 진행하고 유지되는 메모리(바이트)를 반환합니다."""
+    llm = stub_llm_factory()("stub")
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    chatbot, history = _build_legacy_graph(llm)
+    state = {"messages": [], "user_id": "legacy_user"}
+    for turn in range(turns):
+        state["messages"].append({"role": "user", "content": _user_message(turn)})
+        state = chatbot.invoke(state, {"configurable": {"thread_id": "legacy_thread"}})
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return retained
+
+def run_current(turns: int) -> int:
+    """현재 그래프로 대화를 진행하고 유지되는 메모리(바이트)를 반환합니다."""
+    from chatbot_modules.models import EnrichmentGateConfig
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.main import create_persona_chatbot
+
+    call_policy.configure(llm_factory=stub_llm_factory())
+    # 보조 노드는 메모리 비교 대상이 아니므로 게이트로 건너뜀
+    chatbot = create_persona_chatbot(EnrichmentGateConfig(min_chars=10 ** 6, log_every=0))
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    state = {"user_id": "current_user", "conversation_id": "current_thread", "message_count": 0}
+    for turn in range(turns):
+        message_store.append("current_thread", "user", _user_message(turn))
+        state["message_count"] = message_store.count("current_thread")
+        state = chatbot.invoke(state, {"configurable": {"thread_id": "current_thread"}})
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return retained
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="대화 턴당 유지되는 메모리를 측정합니다.")
+    parser.add_argument("--turns", type=int, default=1000, help="현재 방식 측정 턴 수")
+    parser.add_argument("--legacy-turns", type=int, default=200,
+                        help="이전 방식 측정 턴 수 (체크포인트 크기가 턴 수의 제곱으로 늘어나므로 작게 설정)")
+    args = parser.parse_args()
+
+    # 로그 파일이 측정 중에 만들어지지 않도록 로깅 비활성화
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    legacy = run_legacy(args.legacy_turns)
+    print(f"이전 방식: {args.legacy_turns}턴, 유지 메모리 {legacy / 1024 / 1024:.1f} MiB, "
+          f"턴당 {legacy / args.legacy_turns:,.0f} bytes")
+
+    current = run_current(args.turns)
+    print(f"현재 방식: {args.turns}턴, 유지 메모리 {current / 1024 / 1024:.1f} MiB, "
+          f"턴당 {current / args.turns:,.0f} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
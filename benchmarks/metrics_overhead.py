@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+지표 기록 비용 측정 스크립트
+==========================
+
+1. 기록 한 번의 비용: 카운터 증가, 히스토그램 기록, 캐시 조회 기록, 노드 래퍼 호출의 이벤트당 시간(μs)을
+   측정하고 예산(--budget-us)을 넘으면 실패합니다.
+2. 내보내기 확인: 로컬 스텁 모델로 대화 턴을 실행하면서 HTTP 엔드포인트(임의 포트)와 스냅샷 파일을 켜고,
+   /metrics 응답에 턴/노드/LLM 호출/토큰/캐시/로그 기록/UserState/대기열 지표가 모두 있는지 확인합니다.
+   턴당 지표 이벤트 수와 이벤트당 비용으로 턴 처리 시간 중 지표 기록이 차지하는 비율을 추정합니다.
+
+사용법:
+    python benchmarks/metrics_overhead.py --events 200000 --turns 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.metrics import metrics, MetricsRegistry, record_cache, start_metrics_export, timed_node
+
+# /metrics 응답에 있어야 하는 지표
+EXPECTED_METRICS = (
+    "chatbot_turn_seconds", "chatbot_node_seconds", "chatbot_llm_call_seconds", "chatbot_llm_tokens_total",
+    "chatbot_llm_prompt_tokens", "chatbot_cache_lookups_total", "chatbot_log_write_seconds",
+    "chatbot_user_state_entries", "chatbot_llm_queue_depth"
+)
+
+def _per_event_us(function, events: int) -> float:
+    """함수를 events번 실행한 이벤트당 평균 시간(μs)을 반환합니다."""
+    started = time.perf_counter()
+    for _ in range(events):
+        function()
+    return (time.perf_counter() - started) / events * 1_000_000
+
+def measure_events(events: int) -> dict:
+    """지표 종류별 이벤트당 기록 비용(μs)"""
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "측정용 카운터", ["node", "model"])
+    histogram = registry.histogram("bench_seconds", "측정용 히스토그램", ["node", "model", "outcome"])
+    labels2 = ("generate_response", "gpt-3.5-turbo")
+    labels3 = ("generate_response", "gpt-3.5-turbo", "ok")
+    node = timed_node("bench_node", lambda state: state)
+    state = {}
+
+    results = {
+        "loop": _per_event_us(lambda: None, events),
+        "counter.inc": _per_event_us(lambda: counter.inc(1.0, labels2), events),
+        "histogram.observe": _per_event_us(lambda: histogram.observe(0.042, labels3), events),
+        "record_cache": _per_event_us(lambda: record_cache("bench", True), events),
+        "timed_node": _per_event_us(lambda: node(state), events),
+    }
+    # 빈 람다 호출 비용을 빼서 기록 자체의 비용만 남김
+    loop = results.pop("loop")
+    return {name: max(0.0, value - loop) for name, value in results.items()}
+
+def run_turns(turns: int, snapshot_path: str) -> dict:
+    """스텁 모델로 대화 턴을 실행하고 엔드포인트/스냅샷에서 지표를 읽습니다."""
+    from chatbot_modules.models import MetricsConfig
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.logging_utils import set_log_context
+    from chatbot_modules.main import create_persona_chatbot
+    from chatbot_modules.metrics import turn_seconds
+    from chatbot_modules.stub_llm import stub_llm_factory
+
+    call_policy.configure(llm_factory=stub_llm_factory())
+    chatbot = create_persona_chatbot()
+    metrics.reset()
+    exporter = start_metrics_export(MetricsConfig(port=0, snapshot_path=snapshot_path, snapshot_interval_seconds=0.2))
+
+    state = {"user_id": "metrics_user", "conversation_id": "thread_metrics_user", "message_count": 0}
+    set_log_context(user_id="metrics_user")
+    started = time.perf_counter()
+    for turn in range(turns):
+        message_store.append(state["conversation_id"], "user",
+                             f"{turn}번째 이야기인데, 요즘 회사 일이 많아서 주말마다 등산을 못 가고 있어. 어떻게 하지?")
+        state["message_count"] = message_store.count(state["conversation_id"])
+        turn_started = time.perf_counter()
+        state = chatbot.invoke(state, {"configurable": {"thread_id": state["conversation_id"]}})
+        turn_seconds.observe(time.perf_counter() - turn_started)
+    elapsed = time.perf_counter() - started
+
+    host, port = exporter.address
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+        text = response.read().decode("utf-8")
+    exporter.stop()
+    with open(snapshot_path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    # 턴당 지표 이벤트 수 (카운터 증가량이 아닌 기록 호출 수)
+    event_count = 0
+    for data in snapshot["metrics"].values():
+        if data["type"] == "histogram":
+            event_count += sum(value["count"] for value in data["values"])
+    event_count += sum(value["value"] for value in snapshot["metrics"]["chatbot_cache_lookups_total"]["values"])
+    # 성공한 LLM 호출마다 토큰 카운터 기록 2번 (입력/출력)
+    event_count += 2 * sum(value["count"] for value in snapshot["metrics"]["chatbot_llm_call_seconds"]["values"]
+                           if value["labels"]["outcome"] == "ok")
+
+    return {
+        "turn_ms": elapsed / turns * 1000,
+        "events_per_turn": event_count / turns,
+        "missing": [name for name in EXPECTED_METRICS if f"# TYPE {name} " not in text],
+        "lines": len(text.splitlines())
+    }
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="지표 기록 비용을 측정하고 엔드포인트/스냅샷 내보내기를 확인합니다.")
+    parser.add_argument("--events", type=int, default=200000, help="지표 종류별 측정 이벤트 수")
+    parser.add_argument("--turns", type=int, default=50, help="스텁 모델로 실행할 대화 턴 수")
+    parser.add_argument("--budget-us", type=float, default=5.0, help="이벤트당 기록 비용 예산(μs)")
+    args = parser.parse_args()
+
+    # 로그 파일이 측정 중에 만들어지지 않도록 로깅 비활성화
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    costs = measure_events(args.events)
+    for name, value in costs.items():
+        print(f"{name:20s} {value:6.2f} μs/이벤트")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = run_turns(args.turns, os.path.join(temp_dir, "metrics.json"))
+    overhead_us = result["events_per_turn"] * max(costs.values())
+    print(f"\n턴당 {result['turn_ms']:.2f} ms, 지표 이벤트 {result['events_per_turn']:.1f}개 "
+          f"(기록 비용 최대 {overhead_us:.1f} μs, 턴 처리 시간의 {overhead_us / (result['turn_ms'] * 1000) * 100:.2f}%)")
+    print(f"/metrics 응답 {result['lines']}줄, 누락된 지표: {', '.join(result['missing']) or '없음'}")
+
+    over_budget = [name for name, value in costs.items() if value > args.budget_us]
+    if over_budget or result["missing"]:
+        print(f"실패: 예산({args.budget_us} μs) 초과 {over_budget}, 누락 {result['missing']}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
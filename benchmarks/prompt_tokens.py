@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+보조 노드 프롬프트 토큰 비교 스크립트
+==================================
+
+대화가 진행되며 대화 맥락과 사용자 정보가 조금씩 늘어나는 합성 세션에서
+track_conversation_context / extract_user_information 호출의 턴당 토큰 수를 비교합니다.
+- 이전 방식: 기존 객체를 들여쓰기 JSON(indent=2)으로 넣고 전체 객체를 응답으로 받음
+- 현재 방식: 빈 필드를 생략한 압축 JSON을 넣고 변경분(add/change/remove)만 응답으로 받음
+
+토큰 수는 tiktoken으로 세며, tiktoken 인코딩을 불러올 수 없으면 utils.estimate_tokens로 추정합니다.
+
+사용법:
+    python benchmarks/prompt_tokens.py --turns 30
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules import utils
+from chatbot_modules.models import ConversationContext, UserInformation
+from chatbot_modules.graph_nodes import context_tracking_prompt, profile_extraction_prompt
+
+_TOPICS = ["회사", "운동", "요리", "여행", "게임", "음악", "영화", "강아지", "주식", "날씨"]
+
+def legacy_context_prompt(context):
+    """이전 대화 맥락 추적 프롬프트"""
+    return f"""
+            다음 대화에서 사용자의 마지막 메시지를 분석하여 대화 맥락 정보를 JSON 형식으로 반환하세요:
+
+            1. main_topics: 주요 주제들의 배열(최대 3개, 짧은 키워드로)
+            2. current_context: 현재 맥락에 대한 간단한 요약 (최대 100자)
+            3. pending_questions: 아직 대답하지 않은 사용자의 질문들 배열
+            4. references: 대화 중 언급된 참조 정보 객체 (키-값 쌍)
+
+            이전 맥락 정보:
+            {json.dumps(context, ensure_ascii=False, indent=2)}
+
+            새로운 정보만 추가하고, 기존 맥락과 일관성 있게 업데이트하세요.
+            """
+
+def legacy_profile_prompt(info):
+    """이전 사용자 정보 추출 프롬프트"""
+    return f"""
+                다음 대화에서 사용자에 대한 개인 정보를 추출하세요.
+                이미 알고 있는 정보: {json.dumps(info, ensure_ascii=False, indent=2)}
+
+                새로운 정보만 추출하고, 확실한 정보만 포함하세요. 추측하지 마세요.
+                결과를 다음 JSON 형식으로 반환하세요:
+                {{
+                  "name": null,
+                  "age": null,
+                  "occupation": null,
+                  "location": null,
+                  "interests": [],
+                  "preferences": {{}},
+                  "goals": [],
+                  "family": {{}},
+                  "contact_info": null
+                }}
+                """
+
+def _synthetic_turn(turn, context, info):
+    """턴마다 맥락/사용자 정보에 생기는 변경분을 만들고 두 객체에 반영합니다."""
+    topic = _TOPICS[turn % len(_TOPICS)]
+    context_delta = {
+        "add": {"main_topics": [topic], "pending_questions": [f"{topic} 얘기 더 해줄래?"], "references": {f"{topic}_{turn}": f"{turn}번째 턴에 언급"}},
+        "change": {"current_context": f"사용자가 {topic}에 대해 이야기하는 중"},
+        "remove": {"pending_questions": context["pending_questions"][:1]}
+    }
+    context["main_topics"] = list(dict.fromkeys([topic] + context["main_topics"]))[:5]
+    context["current_context"] = context_delta["change"]["current_context"]
+    context["pending_questions"] = (context["pending_questions"][1:] + context_delta["add"]["pending_questions"])[-5:]
+    context["references"] = dict(list({**context["references"], **context_delta["add"]["references"]}.items())[-10:])
+
+    profile_delta = {"add": {"interests": [topic]}} if topic not in info["interests"] else {}
+    if turn == 0:
+        profile_delta["change"] = {"name": "민수", "occupation": "개발자"}
+    for key, value in profile_delta.get("change", {}).items():
+        info[key] = value
+    info["interests"] += profile_delta.get("add", {}).get("interests", [])
+    return context_delta, profile_delta
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="보조 노드 프롬프트의 이전/현재 방식 턴당 토큰 수를 비교합니다.")
+    parser.add_argument("--turns", type=int, default=30, help="합성 세션의 대화 턴 수")
+    args = parser.parse_args()
+
+    context, info = ConversationContext().dict(), UserInformation().dict()
+    totals = {"legacy_in": 0, "legacy_out": 0, "delta_in": 0, "delta_out": 0}
+    for turn in range(args.turns):
+        totals["legacy_in"] += utils.count_tokens(legacy_context_prompt(context)) + utils.count_tokens(legacy_profile_prompt(info))
+        totals["delta_in"] += utils.count_tokens(context_tracking_prompt(context)) + utils.count_tokens(profile_extraction_prompt(info))
+
+        context_delta, profile_delta = _synthetic_turn(turn, context, info)
+        # 이전 방식은 갱신된 전체 객체를, 현재 방식은 변경분만 응답으로 받음
+        totals["legacy_out"] += utils.count_tokens(json.dumps(context, ensure_ascii=False)) + utils.count_tokens(json.dumps(info, ensure_ascii=False))
+        totals["delta_out"] += utils.count_tokens(json.dumps(context_delta, ensure_ascii=False)) + utils.count_tokens(json.dumps(profile_delta, ensure_ascii=False))
+
+    method = "tiktoken" if utils._token_encoder else "추정(estimate_tokens)"
+    print(f"토큰 계산: {method}, {args.turns}턴")
+    for label, prefix in (("이전 방식", "legacy"), ("현재 방식", "delta")):
+        tokens_in, tokens_out = totals[f"{prefix}_in"] / args.turns, totals[f"{prefix}_out"] / args.turns
+        print(f"{label}: 턴당 입력 {tokens_in:7.1f} 토큰, 출력 {tokens_out:7.1f} 토큰, 합계 {tokens_in + tokens_out:7.1f} 토큰")
+    legacy = totals["legacy_in"] + totals["legacy_out"]
+    delta = totals["delta_in"] + totals["delta_out"]
+    print(f"턴당 절감: {(legacy - delta) / args.turns:.1f} 토큰 ({(1 - delta / legacy) * 100:.1f}%)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
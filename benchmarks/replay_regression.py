@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+로그 재생 회귀 테스트 스크립트
+============================
+
+로컬 스텁 모델로 여러 사용자의 대화를 실행하면서 LoggingChatOpenAI와 같은 형식으로 LLM 통신 로그를
+기록한 뒤, chatbot_modules.replay로 같은 로그를 다시 실행합니다. 프롬프트 조립이 결정적이면
+모든 호출이 요청 해시로 정확히 일치해야 하며(불일치 0), 노드별 처리 시간과 프롬프트 크기 증가를 출력합니다.
+
+사용법:
+    python benchmarks/replay_regression.py --users 4 --turns 15
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.models import CallPolicyConfig
+from chatbot_modules.call_policy import call_policy
+from chatbot_modules.logging_utils import log_llm_communication, set_log_context, set_log_filename
+from chatbot_modules.message_store import message_store
+from chatbot_modules.replay import load_replay_corpus, replay_sessions
+from chatbot_modules.stub_llm import StubChatModel
+
+_TOPICS = ["등산", "회사", "요리", "여행", "운동", "게임"]
+
+def _responder(messages) -> str:
+    """보조 노드에는 주제가 쌓이는 변경분, 응답 생성에는 사용자 메시지를 따라 하는 응답을 반환합니다."""
+    system = getattr(messages[0], "content", "")
+    content = getattr(messages[-1], "content", "")
+    topic = next((topic for topic in _TOPICS if topic in content), "일상")
+    if "대화 맥락 정보의 변경분" in system:
+        return json.dumps({"add": {"main_topics": [topic]}, "change": {"current_context": content[:40]}},
+                          ensure_ascii=False)
+    if "JSON" in system:
+        return json.dumps({"add": {"interests": [topic]}}, ensure_ascii=False)
+    return f"{topic} 이야기 좋다! {content[:20]}"
+
+class RecordingStubChatModel(StubChatModel):
+    """LoggingChatOpenAI처럼 요청/응답을 LLM 통신 로그에 기록하는 스텁 모델"""
+
+    def _respond(self, input):
+        """응답을 만든 뒤 로그에 기록합니다."""
+        started = time.perf_counter()
+        response = super()._respond(input)
+        request = [{"role": message.type, "content": message.content} for message in self._to_messages(input)]
+        log_llm_communication(request, {"role": response.type, "content": response.content},
+                              source=self.__class__.__name__, latency_ms=(time.perf_counter() - started) * 1000)
+        return response
+
+def record(path: str, args):
+    """스텁 모델로 대화를 실행하며 로그를 기록합니다."""
+    from chatbot_modules.main import create_persona_chatbot
+
+    set_log_filename(path)
+    llm = RecordingStubChatModel(latency=args.latency, responder=_responder)
+    call_policy.configure(CallPolicyConfig(**{**call_policy.config.dict(), "hedge_enabled": False}),
+                          llm_factory=lambda model_name="stub", **kwargs: llm)
+    chatbot = create_persona_chatbot()
+    for user in range(args.users):
+        user_id = f"record_user_{user}"
+        thread_id = f"messages_{user_id}"
+        state = {"user_id": user_id, "conversation_id": thread_id, "message_count": 0}
+        set_log_context(user_id=user_id)
+        for turn in range(args.turns):
+            topic = _TOPICS[(user + turn) % len(_TOPICS)]
+            message_store.append(thread_id, "user", f"{turn}번째 얘기인데, 요즘 {topic} 때문에 고민이 많아. 어떻게 생각해?")
+            state["message_count"] = message_store.count(thread_id)
+            state = chatbot.invoke(state, {"configurable": {"thread_id": thread_id}})
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="스텁 모델로 기록한 로그를 재생하여 결정성과 노드별 처리 시간을 확인합니다.")
+    parser.add_argument("--users", type=int, default=4, help="사용자 수")
+    parser.add_argument("--turns", type=int, default=15, help="사용자당 대화 턴 수")
+    parser.add_argument("--latency", type=float, default=0.0, help="기록 시 스텁 모델 호출당 지연 시간(초)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_path = os.path.join(log_dir, "recorded.json")
+        record(log_path, args)
+        corpus = load_replay_corpus([log_path])
+        set_log_filename(os.path.join(log_dir, "replay_events.json"))
+        report = replay_sessions(corpus, latency="none")
+
+    print(f"세션 {report['sessions']}개, 턴 {report['turns']}개, LLM 호출 {report['llm_calls']}회, "
+          f"일치 방식 {report['matches']}, 응답 불일치 {report['response_mismatches']}회")
+    for node, stats in report["nodes"].items():
+        print(f"  {node:<28} {stats['calls']:4d}회, 호출당 LLM 외 처리 {stats['overhead_ms_per_call']:7.2f} ms")
+    for node, growth in report["prompt_growth"].items():
+        print(f"  {node:<28} 프롬프트 {growth['first_tokens']} → {growth['last_tokens']} 토큰 "
+              f"(호출당 {growth['tokens_per_call']:+.1f})")
+    print(f"불일치 {report['divergence_count']}건")
+    return 0 if report["divergence_count"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+다중 프로세스 샤딩 처리량 측정 스크립트
+====================================
+
+로컬 스텁 모델을 쓰는 워커 프로세스 수를 바꿔 가며 여러 사용자가 동시에 대화할 때의
+처리량(턴/초)을 측정합니다. 마지막으로 워커를 추가/제거하는 동안 대화가 이어지는지
+(메시지 수가 끊기지 않는지) 확인합니다.
+
+스텁 모델 지연 시간을 0에 가깝게 두면 프롬프트 조립, JSON 처리, 로깅 같은 CPU 작업이
+처리량을 결정하므로, 워커 수에 따른 향상은 사용할 수 있는 CPU 코어 수에 따라 달라집니다.
+
+사용법:
+    python benchmarks/sharding_throughput.py --workers 1 2 4 --users 32 --turns 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_modules.sharding import ShardedChatbot
+
+def configure_stub(latency: float):
+    """워커 프로세스에서 호출 정책에 스텁 모델을 주입합니다."""
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.stub_llm import stub_llm_factory
+    call_policy.configure(llm_factory=stub_llm_factory(latency=latency))
+
+def _user_message(user: int, turn: int) -> str:
+    """합성 사용자 메시지"""
+    return f"{turn}번째로 말하는 건데, 나 요즘 {user}번 프로젝트 때문에 바빠서 운동을 못 하고 있어. 어떻게 생각해?"
+
+def _run_users(chatbot: ShardedChatbot, users: range, turns: range, concurrency: int):
+    """사용자마다 차례로 턴을 보내고 마지막 결과를 반환합니다."""
+    def _conversation(user: int):
+        result = None
+        for turn in turns:
+            result = chatbot.chat(f"bench_user_{user}", _user_message(user, turn))
+        return result
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(_conversation, users))
+
+def measure(workers: int, args, profile_dir: str) -> float:
+    """워커 수별 처리량(턴/초)을 측정합니다."""
+    with ShardedChatbot(workers, args.threads_per_worker, profile_dir,
+                        initializer=configure_stub, initargs=(args.latency,)) as chatbot:
+        # 워커 시작과 그래프 생성 시간은 제외
+        _run_users(chatbot, range(workers * 4), range(1), workers * 4)
+        started = time.perf_counter()
+        _run_users(chatbot, range(args.users), range(args.turns), args.users)
+        elapsed = time.perf_counter() - started
+    return args.users * args.turns / elapsed
+
+def check_rebalance(args, profile_dir: str) -> bool:
+    """워커 추가/제거 후에도 사용자 대화가 이어지는지 확인합니다."""
+    users = range(args.users)
+    with ShardedChatbot(2, args.threads_per_worker, profile_dir,
+                        initializer=configure_stub, initargs=(args.latency,)) as chatbot:
+        before = {result["worker_id"] for result in _run_users(chatbot, users, range(2), args.users)}
+        added = chatbot.add_worker()
+        after_add = _run_users(chatbot, users, range(2, 4), args.users)
+        moved_to_new = sum(result["worker_id"] == added for result in after_add)
+        removed = chatbot.remove_worker("worker0")
+        after_remove = _run_users(chatbot, users, range(4, 6), args.users)
+
+    # 턴마다 사용자/챗봇 메시지 2개씩 쌓이므로 6턴 뒤에는 12개여야 함
+    continued = all(result["message_count"] == 12 for result in after_remove)
+    print(f"재배치: 시작 워커 {sorted(before)}, {added} 추가 후 {moved_to_new}명 이동, "
+          f"worker0 제거로 {removed}명 이동, 대화 이어짐: {continued}")
+    return continued
+
+def main() -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="워커 프로세스 수에 따른 대화 처리량을 측정합니다.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="측정할 워커 수 목록")
+    parser.add_argument("--users", type=int, default=32, help="동시 사용자 수")
+    parser.add_argument("--turns", type=int, default=20, help="사용자당 대화 턴 수")
+    parser.add_argument("--threads-per-worker", type=int, default=4, help="워커마다 동시에 처리할 대화 턴 수")
+    parser.add_argument("--latency", type=float, default=0.0, help="스텁 모델 호출당 지연 시간(초)")
+    args = parser.parse_args()
+
+    print(f"CPU 코어 {os.cpu_count()}개, 사용자 {args.users}명 x {args.turns}턴, 스텁 지연 {args.latency * 1000:.0f} ms")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as profile_dir:
+            throughput = measure(workers, args, profile_dir)
+        baseline = baseline or throughput
+        print(f"워커 {workers}개: {throughput:8.1f} 턴/s (x{throughput / baseline:.2f})")
+
+    with tempfile.TemporaryDirectory() as profile_dir:
+        return 0 if check_rebalance(args, profile_dir) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,29 @@ LangGraph를 활용한 친구 페르소나 챗봇 구현
 - models: 데이터 모델 정의
 - logging_utils: 로깅 유틸리티
 - state_management: 사용자 상태 관리
+- message_store: 대화 메시지 저장소
+- memory_index: 과거 대화 턴 검색용 장기 기억 인덱스
 - llm_wrappers: LLM 래퍼 클래스
+- call_policy: LLM 호출 정책 (마감 시간, 재시도, 헤지, 서킷 브레이커)
+- llm_scheduler: 우선순위/공정성/부하 차단을 적용하는 프로세스 전체 LLM 작업 스케줄러
+- call_stats: LLM 호출 지연 시간/오류 통계
+- model_router: 노드/호출 지점별 모델 라우터
+- stub_llm: 지연 시간과 실패를 주입할 수 있는 로컬 스텁 모델
 - graph_nodes: LangGraph 노드 함수
 - log_analysis: 로그 분석 기능
+- log_format: 델타 로그 형식 및 변환 도구
+- prompt_encoding: 보조 노드 프롬프트 압축 인코딩과 변경분 응답 형식
+- chains: 미리 만들어 공유하는 LLM 체인과 프롬프트 템플릿 레지스트리
 - utils: 유틸리티 함수
+- turn_gating: 보조 노드 실행 여부를 결정하는 턴 게이트
+- extraction_scheduler: 사용자 정보 추출 스케줄러
+- profile_store: 사용자 프로필 저장소
+- batch_analysis: 오프라인 로그 일괄 분석 CLI
+- sharding: user_id별 다중 프로세스 워커 샤딩과 상태 인계
+- replay: 로그 재생 기반 성능/회귀 테스트
+- personas: 페르소나 레지스트리와 컴파일된 그래프 캐시
+- metrics: 런타임 지표 레지스트리와 Prometheus 텍스트 엔드포인트/스냅샷 파일 내보내기
+- enrichment_batcher: 여러 사용자의 보조 노드 호출을 모아 한 요청으로 보내는 묶음 처리기
 - main: 메인 실행 모듈
 """
 
@@ -0,0 +1,265 @@
+"""
+오프라인 로그 일괄 분석 모듈
+- LOG_DIR의 모든 로그 파일을 orjson으로 스트리밍 파싱 (프로세스 풀, 앞서 제출하는 파일 수 제한)
+- 사용자/세션별로 대화 턴을 묶어 프로필·맥락 추출 (동시 실행 수가 제한된 LLM 호출)
+- 체크포인트 파일로 진행 상황을 기록하여 중단 후 이어서 실행
+- 결과를 프로필 저장소에 병합
+
+사용법:
+    python -m chatbot_modules.batch_analysis --workers 4 --concurrency 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from chatbot_modules.logging_utils import LOG_DIR, PROFILE_DIR, setup_logging
+from chatbot_modules.log_analysis import _list_log_files, extract_conversation_turn, analyze_previous_logs
+from chatbot_modules.log_format import DeltaDecoder
+from chatbot_modules.profile_store import ProfileStore
+
+def _file_key(file_path: str) -> str:
+    """파일 이름과 크기로 파일 단위 체크포인트 키를 만듭니다. (기록 중인 파일은 크기가 바뀌면 다시 처리)"""
+    return f"{os.path.basename(file_path)}:{os.path.getsize(file_path)}"
+
+def parse_log_file(file_path: str, max_turns: int = 200) -> Dict[str, Any]:
+    """로그 파일 하나를 스트리밍 파싱하여 사용자/세션별 대화 턴을 반환합니다.
+
+    user_id가 기록되지 않은 이전 형식의 로그는 파일(=실행 세션) 단위의 가상 사용자로 묶습니다.
+    세션마다 최근 max_turns개의 턴만 유지합니다.
+    """
+    file_name = os.path.basename(file_path)
+    default_user = f"session_{os.path.splitext(file_name)[0]}"
+    sessions = {}  # user_id: deque
+    decoder = DeltaDecoder()  # 델타 형식 항목의 메시지 참조 복원
+    line_count = 0
+    error_count = 0
+
+    try:
+        with open(file_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line_count += 1
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    error_count += 1
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+
+                turn = extract_conversation_turn(decoder.decode(entry))
+                if not turn:
+                    continue
+                user_id = turn.get('user_id') or default_user
+                if user_id not in sessions:
+                    sessions[user_id] = deque(maxlen=max_turns)
+                sessions[user_id].append(turn)
+    except Exception as e:
+        print(f"로그 파일 '{file_path}' 파싱 실패: {e}")
+        error_count += 1
+
+    return {
+        "file": file_name,
+        "file_key": _file_key(file_path),
+        "lines": line_count,
+        "errors": error_count,
+        "sessions": [
+            {"session_key": f"{file_name}::{user_id}", "user_id": user_id, "turns": list(turns)}
+            for user_id, turns in sessions.items()
+        ]
+    }
+
+class BackfillCheckpoint:
+    """완료된 세션과 파일을 한 줄씩 추가 기록하는 체크포인트 파일"""
+
+    def __init__(self, path: str):
+        """초기화 (기존 체크포인트가 있으면 읽어옴)"""
+        self.path = path
+        self.completed_sessions = set()
+        self.completed_files = set()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # 중단 시 마지막 줄이 잘렸을 수 있음
+                        continue
+                    if "session" in record:
+                        self.completed_sessions.add(record["session"])
+                    elif "file" in record:
+                        self.completed_files.add(record["file"])
+
+    def _append(self, record: Dict[str, Any]):
+        """체크포인트 레코드를 추가 기록합니다."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(orjson.dumps(record) + b"\n")
+
+    def mark_session(self, session_key: str):
+        """세션 처리 완료를 기록합니다."""
+        with self._lock:
+            self.completed_sessions.add(session_key)
+            self._append({"session": session_key, "time": time.time()})
+
+    def mark_file(self, file_key: str):
+        """파일 내 모든 세션 처리 완료를 기록합니다."""
+        with self._lock:
+            self.completed_files.add(file_key)
+            self._append({"file": file_key, "time": time.time()})
+
+def run_backfill(log_dir: str = LOG_DIR,
+                 profile_dir: str = PROFILE_DIR,
+                 checkpoint_path: Optional[str] = None,
+                 workers: int = 4,
+                 concurrency: int = 8,
+                 max_turns: int = 200,
+                 min_turns: int = 1,
+                 dry_run: bool = False) -> Dict[str, int]:
+    """로그 디렉토리 전체를 분석하여 프로필 저장소를 채웁니다.
+
+    Args:
+        log_dir: 로그 디렉토리
+        profile_dir: 프로필 저장 디렉토리
+        checkpoint_path: 체크포인트 파일 경로 (기본: profile_dir/backfill_checkpoint.jsonl)
+        workers: 파싱에 사용할 프로세스 수
+        concurrency: 동시에 실행할 LLM 분석 작업 수
+        max_turns: 세션당 분석에 사용할 최근 턴 수
+        min_turns: 이보다 턴이 적은 세션은 건너뜀
+        dry_run: True면 파싱만 하고 LLM 호출과 저장은 하지 않음
+    """
+    checkpoint = BackfillCheckpoint(checkpoint_path or os.path.join(profile_dir, "backfill_checkpoint.jsonl"))
+    store = ProfileStore(profile_dir)
+
+    log_files = _list_log_files(log_dir)
+    log_files = [path for path in log_files if _file_key(path) not in checkpoint.completed_files]
+
+    stats = {"files": 0, "lines": 0, "parse_errors": 0, "sessions": 0,
+             "skipped_sessions": 0, "analyzed_sessions": 0, "failed_sessions": 0}
+    stats_lock = threading.Lock()
+    remaining_per_file = {}  # file_key: 남은 세션 수
+    failed_files = set()  # 실패한 세션이 있는 파일 (다음 실행에서 다시 처리)
+    started = time.time()
+
+    # 대기 중인 LLM 작업 수를 제한하여 메모리를 일정하게 유지
+    slots = threading.BoundedSemaphore(concurrency * 2)
+    # 파싱은 이만큼의 파일만 앞서 제출 (파싱 결과가 LLM 단계보다 앞서 쌓이지 않도록)
+    parse_window = max(workers, concurrency) * 2
+
+    def _finish_session(file_key: str, success: bool):
+        with stats_lock:
+            stats["analyzed_sessions" if success else "failed_sessions"] += 1
+            remaining_per_file[file_key] -= 1
+            if not success:
+                failed_files.add(file_key)
+            file_done = remaining_per_file[file_key] == 0 and file_key not in failed_files
+        if file_done:
+            checkpoint.mark_file(file_key)
+
+    def _analyze_session(file_key: str, session: Dict[str, Any]):
+        try:
+            result = analyze_previous_logs(session["turns"], raise_errors=True)
+            if result:
+                store.merge(session["user_id"], result)
+            checkpoint.mark_session(session["session_key"])
+            _finish_session(file_key, True)
+        except Exception as e:
+            print(f"세션 '{session['session_key']}' 분석 실패: {e}")
+            traceback.print_exc()
+            _finish_session(file_key, False)
+        finally:
+            slots.release()
+
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as llm_pool:
+        def _parsed_files():
+            # 파일 순서대로 결과를 꺼내면서, 하나를 꺼낼 때마다 다음 파일 하나를 제출
+            paths = iter(log_files)
+            pending = deque()
+            for path in paths:
+                pending.append(parse_pool.submit(parse_log_file, path, max_turns))
+                if len(pending) >= parse_window:
+                    break
+            while pending:
+                parsed = pending.popleft().result()
+                path = next(paths, None)
+                if path is not None:
+                    pending.append(parse_pool.submit(parse_log_file, path, max_turns))
+                yield parsed
+
+        for parsed in _parsed_files():
+            stats["files"] += 1
+            stats["lines"] += parsed["lines"]
+            stats["parse_errors"] += parsed["errors"]
+
+            todo = []
+            for session in parsed["sessions"]:
+                stats["sessions"] += 1
+                if session["session_key"] in checkpoint.completed_sessions or len(session["turns"]) < min_turns:
+                    stats["skipped_sessions"] += 1
+                    continue
+                todo.append(session)
+
+            if dry_run:
+                continue
+            if not todo:
+                checkpoint.mark_file(parsed["file_key"])
+                continue
+
+            with stats_lock:
+                remaining_per_file[parsed["file_key"]] = len(todo)
+            for session in todo:
+                slots.acquire()
+                llm_pool.submit(_analyze_session, parsed["file_key"], session)
+
+            if stats["files"] % 100 == 0:
+                print(f"진행 상황: 파일 {stats['files']}/{len(log_files)}, "
+                      f"분석 완료 세션 {stats['analyzed_sessions']}개")
+
+    stats["elapsed_seconds"] = round(time.time() - started, 2)
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령행 진입점"""
+    parser = argparse.ArgumentParser(description="LLM 통신 로그를 일괄 분석하여 사용자 프로필을 생성합니다.")
+    parser.add_argument("--log-dir", default=LOG_DIR, help="로그 디렉토리")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="프로필 저장 디렉토리")
+    parser.add_argument("--checkpoint", default=None, help="체크포인트 파일 경로")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="파싱 프로세스 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 LLM 분석 작업 수")
+    parser.add_argument("--max-turns", type=int, default=200, help="세션당 분석할 최근 턴 수")
+    parser.add_argument("--min-turns", type=int, default=1, help="분석할 세션의 최소 턴 수")
+    parser.add_argument("--dry-run", action="store_true", help="파싱만 하고 LLM 호출은 하지 않음")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    stats = run_backfill(
+        log_dir=args.log_dir,
+        profile_dir=args.profile_dir,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        max_turns=args.max_turns,
+        min_turns=args.min_turns,
+        dry_run=args.dry_run
+    )
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 1 if stats["failed_sessions"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+LLM 호출 정책 모듈
+- CallPolicy: LoggingChatOpenAI 호출에 노드별 마감 시간, 지터가 있는 재시도,
+  p95 기반 헤지 요청, 서킷 브레이커와 대체 모델, 턴 예산을 적용하는 계층
+"""
+
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from chatbot_modules.models import CallPolicyConfig
+from chatbot_modules.logging_utils import log_event, set_log_context
+from chatbot_modules.call_stats import CallStats, call_stats
+from chatbot_modules.model_router import ModelRouter, model_router
+from chatbot_modules.llm_scheduler import LLMLoadShedError, llm_scheduler
+from chatbot_modules.metrics import llm_call_seconds, llm_prompt_tokens, llm_tokens, record_cache
+
+# 응답 생성 이외의 보조 노드 (예산이 부족하면 건너뜀)
+AUXILIARY_NODES = ("extract_user_information", "track_conversation_context")
+
+class DeadlineExceededError(TimeoutError):
+    """노드 마감 시간 안에 LLM 응답을 받지 못했을 때 발생하는 예외"""
+
+def _default_llm_factory(model_name: str, temperature: float, timeout: float, max_tokens: Optional[int] = None):
+    """LoggingChatOpenAI 인스턴스를 생성합니다. (재시도는 호출 정책이 담당)"""
+    from chatbot_modules.llm_wrappers import LoggingChatOpenAI
+    params = {"model_name": model_name, "temperature": temperature, "timeout": timeout, "max_retries": 0}
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    return LoggingChatOpenAI(**params)
+
+class _CircuitBreaker:
+    """모델별 연속 실패 횟수를 세어 열림/반열림/닫힘 상태를 관리하는 서킷 브레이커"""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        """초기화"""
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False  # 반열림 상태의 시험 요청이 진행 중인지 여부
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[str]:
+        """요청을 보내도 되는지 반환합니다.
+
+        닫혀 있으면 "closed"를 반환합니다. 열린 뒤 쿨다운이 지나면 시험 요청(반열림) 하나에만 "probe"를 반환하고,
+        시험 요청의 성공/실패가 기록될 때까지 나머지 요청에는 열려 있을 때처럼 None(대체 모델 사용)을 반환합니다.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown_seconds:
+                return None
+            self.probing = True
+            return "probe"
+
+    def release_probe(self):
+        """성공/실패를 기록하지 않고 끝난 시험 요청(부하 차단, 마감 시간 초과)의 차례를 반납합니다."""
+        with self._lock:
+            self.probing = False
+
+    def is_open(self) -> bool:
+        """브레이커가 열려 있는지 반환합니다."""
+        with self._lock:
+            return self.opened_at is not None
+
+    def record_success(self) -> bool:
+        """성공을 기록합니다. 브레이커가 닫히면 True를 반환합니다."""
+        with self._lock:
+            was_open = self.opened_at is not None
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            return was_open
+
+    def record_failure(self) -> bool:
+        """실패를 기록합니다. 브레이커가 새로 열리면 True를 반환합니다."""
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                newly_opened = self.opened_at is None
+                # 반열림 상태의 시험 요청이 실패하면 쿨다운을 다시 시작
+                self.opened_at = time.monotonic()
+                return newly_opened
+            return False
+
+class CallPolicy:
+    """노드 단위 LLM 호출 정책
+
+    Args:
+        config: 호출 정책 설정
+        llm_factory: (model_name, temperature, timeout, max_tokens)를 받아 invoke()를 가진 모델을 반환하는 함수.
+                     로컬 스텁(stub_llm.stub_llm_factory)을 주입하여 네트워크 없이 검증할 수 있습니다.
+        stats: 지연 시간/오류 통계 저장소
+        router: 노드별 모델 라우터 (경로가 없으면 config.primary_model 사용)
+    """
+
+    def __init__(self, config: Optional[CallPolicyConfig] = None,
+                 llm_factory: Optional[Callable[..., Any]] = None,
+                 stats: Optional[CallStats] = None,
+                 router: Optional[ModelRouter] = None):
+        """초기화"""
+        self.config = config or CallPolicyConfig()
+        self.llm_factory = llm_factory or _default_llm_factory
+        self.stats = stats or call_stats
+        self.router = router or (model_router if stats is None else ModelRouter(stats=self.stats))
+        self._llms = {}  # (model, temperature, timeout): 모델 인스턴스
+        self._breakers = {}  # 모델별 서킷 브레이커
+        self._turn_deadlines = {}  # 사용자별 턴 예산 마감 시각 (monotonic)
+        self._lock = threading.Lock()
+        # 우선순위 등급별 작업 스레드 (스케줄러에서 차례를 기다리는 낮은 등급 작업이 응답 생성 스레드를 차지하지 않도록 분리)
+        self._executors = {}
+
+    # ----- 설정 및 상태 -----
+
+    def configure(self, config: Optional[CallPolicyConfig] = None, llm_factory: Optional[Callable[..., Any]] = None):
+        """정책 설정이나 모델 팩토리를 교체합니다. (캐시된 모델과 브레이커 상태는 초기화)"""
+        with self._lock:
+            if config is not None:
+                self.config = config
+            if llm_factory is not None:
+                self.llm_factory = llm_factory
+            self._llms.clear()
+            self._breakers.clear()
+
+    def _get_llm(self, model_name: str, temperature: float, timeout: float, max_tokens: Optional[int] = None):
+        """모델 인스턴스를 재사용합니다."""
+        key = (model_name, temperature, round(timeout, 1), max_tokens)
+        with self._lock:
+            record_cache("llm_clients", key in self._llms)
+            if key not in self._llms:
+                self._llms[key] = self.llm_factory(model_name=model_name, temperature=temperature,
+                                                   timeout=timeout, max_tokens=max_tokens)
+            return self._llms[key]
+
+    def _breaker(self, model_name: str) -> _CircuitBreaker:
+        """모델별 서킷 브레이커를 반환합니다."""
+        with self._lock:
+            if model_name not in self._breakers:
+                self._breakers[model_name] = _CircuitBreaker(
+                    self.config.breaker_failure_threshold, self.config.breaker_cooldown_seconds
+                )
+            return self._breakers[model_name]
+
+    def _deadline_for(self, node: str) -> float:
+        """노드의 마감 시간(초)을 반환합니다."""
+        return self.config.node_deadlines.get(node, self.config.default_deadline)
+
+    def node_deadline(self, node: str, scale: int = 1) -> float:
+        """노드 호출 한 번의 마감 시간(초)을 반환합니다. (경로 설정 우선, 묶음 요청은 작업 수 scale만큼 늘림)"""
+        route = self.router.config.routes.get(node)
+        return ((route.timeout if route is not None else None) or self._deadline_for(node)) * scale
+
+    def start_turn(self, user_id: str):
+        """새 턴의 LLM 호출 시간 예산을 시작합니다."""
+        with self._lock:
+            self._turn_deadlines[user_id] = time.monotonic() + self.config.turn_budget_seconds
+
+    def remaining_budget(self, user_id: Optional[str]) -> Optional[float]:
+        """사용자의 이번 턴 남은 예산(초)을 반환합니다. 턴이 시작되지 않았으면 None을 반환합니다."""
+        with self._lock:
+            deadline = self._turn_deadlines.get(user_id)
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+
+    def tightest_budget(self, user_ids: List[Optional[str]]) -> Optional[float]:
+        """여러 사용자 중 가장 적게 남은 턴 예산(초)을 반환합니다. 턴을 시작한 사용자가 없으면 None을 반환합니다."""
+        budgets = [budget for budget in map(self.remaining_budget, user_ids) if budget is not None]
+        return min(budgets) if budgets else None
+
+    def should_run_auxiliary(self, node: str, user_id: Optional[str] = None) -> bool:
+        """보조 노드를 실행할지 결정합니다.
+
+        기본 모델의 서킷 브레이커가 열려 있거나, 응답 생성에 필요한 시간을 남기지 못할 만큼
+        턴 예산이 줄었으면 보조 노드를 건너뜁니다.
+        """
+        reason = None
+        primary_model = self.router.select(node, self.config.primary_model)["model"]
+        if self._breaker(primary_model).is_open():
+            reason = "breaker_open"
+        else:
+            remaining = self.remaining_budget(user_id)
+            if remaining is not None and remaining < self.config.response_reserve_seconds:
+                reason = "budget_exhausted"
+
+        if reason:
+            log_event("call_policy", {"node": node, "user_id": user_id, "decision": "skip_auxiliary", "reason": reason})
+            return False
+        return True
+
+    # ----- 호출 -----
+
+    def _timed_call(self, node: str, llm: Any, model_name: str, messages: Any):
+        """모델을 호출하고 지연 시간과 성공 여부를 통계와 지표에 기록합니다."""
+        started = time.perf_counter()
+        try:
+            result = llm.invoke(messages)
+        except LLMLoadShedError:
+            # 스케줄러가 버린 작업은 모델 지연 시간/오류 통계에 넣지 않음
+            llm_call_seconds.observe(time.perf_counter() - started, (node, model_name, "load_shed"))
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - started
+            self.stats.record(model_name, elapsed, ok=False)
+            llm_call_seconds.observe(elapsed, (node, model_name, "error"))
+            raise
+        elapsed = time.perf_counter() - started
+        self.stats.record(model_name, elapsed, ok=True)
+        llm_call_seconds.observe(elapsed, (node, model_name, "ok"))
+        usage = getattr(result, "usage_metadata", None)
+        if usage:
+            llm_tokens.inc(usage.get("input_tokens", 0), (node, model_name, "input"))
+            llm_tokens.inc(usage.get("output_tokens", 0), (node, model_name, "output"))
+            llm_prompt_tokens.observe(usage.get("input_tokens", 0), (node,))
+        return result
+
+    def _submit(self, node: str, llm: Any, model_name: str, messages: Any):
+        """현재 로그 맥락(user_id 등)에 노드 이름을 더해 작업 스레드에서 호출합니다."""
+        context = contextvars.copy_context()
+        context.run(set_log_context, node=node)
+        priority = context.run(llm_scheduler.resolve_priority, node)
+        with self._lock:
+            if priority not in self._executors:
+                self._executors[priority] = ThreadPoolExecutor(max_workers=16, thread_name_prefix=f"llm-call-{priority}")
+            executor = self._executors[priority]
+        return executor.submit(context.run, self._timed_call, node, llm, model_name, messages)
+
+    def _hedge_delay(self, model_name: str) -> Optional[float]:
+        """헤지 요청을 보내기 전 대기 시간을 반환합니다. 기록이 부족하거나 비활성화면 None을 반환합니다."""
+        if not self.config.hedge_enabled or self.stats.count(model_name) < self.config.hedge_min_samples:
+            return None
+        delay = self.stats.percentile(model_name, self.config.hedge_quantile)
+        if delay is None:
+            return None
+        return max(self.config.hedge_min_delay, delay)
+
+    def _hedged_call(self, node: str, llm: Any, model_name: str, messages: Any, timeout: float, hedge: bool = True):
+        """첫 요청이 p95 지연 시간 안에 끝나지 않으면 두 번째 요청을 보내고 먼저 성공한 응답을 사용합니다.
+
+        hedge가 False면 (서킷 브레이커의 시험 요청) 두 번째 요청을 보내지 않습니다.
+        """
+        started = time.monotonic()
+        futures = [self._submit(node, llm, model_name, messages)]
+
+        hedge_delay = self._hedge_delay(model_name) if hedge else None
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                log_event("call_policy", {"node": node, "model": model_name, "decision": "hedge",
+                                          "hedge_delay_ms": round(hedge_delay * 1000, 1)})
+                futures.append(self._submit(node, llm, model_name, messages))
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1:
+                        log_event("call_policy", {"node": node, "model": model_name, "decision": "hedge_result",
+                                                  "winner": "hedge" if future is futures[1] else "primary"})
+                    return future.result()
+                last_error = future.exception()
+
+        if last_error is not None and not pending:
+            raise last_error
+        # 마감 시간이 지난 요청은 백그라운드에서 끝나도록 두고 결과는 버림
+        raise DeadlineExceededError(f"{node}: {timeout:.1f}초 안에 응답을 받지 못했습니다.")
+
+    def invoke(self, node: str, messages: Any, user_id: Optional[str] = None, temperature: float = 0.7,
+               batch_user_ids: Optional[List[Optional[str]]] = None):
+        """노드의 마감 시간 안에서 재시도, 헤지, 대체 모델을 적용하여 LLM을 호출합니다.
+
+        batch_user_ids를 주면 여러 사용자의 작업을 담은 묶음 요청으로 보고, 노드의 최대 토큰 수와 마감 시간을
+        작업 수만큼 늘리되 묶인 사용자 중 남은 턴 예산이 가장 적은 사용자를 기준으로 마감 시간을 제한합니다.
+        """
+        started = time.monotonic()
+        route = self.router.select(node, self.config.primary_model)
+        scale = len(batch_user_ids) if batch_user_ids else 1
+        node_deadline = self.node_deadline(node, scale)
+        max_tokens = route["max_tokens"] * scale if route["max_tokens"] is not None else None
+        deadline = started + node_deadline
+
+        # 보조 노드는 응답 생성 시간을 침범하지 않도록 턴 예산 안에서만 실행
+        remaining_turn = self.tightest_budget(batch_user_ids) if batch_user_ids else self.remaining_budget(user_id)
+        if node in AUXILIARY_NODES and remaining_turn is not None:
+            deadline = min(deadline, started + remaining_turn - self.config.response_reserve_seconds)
+
+        attempt = 0
+        while True:
+            model_name = route["model"]
+            admission = self._breaker(model_name).allow()
+            if not admission:
+                model_name = self.config.fallback_model
+                log_event("call_policy", {"node": node, "decision": "fallback_model", "model": model_name})
+            probe = admission == "probe"
+            if probe:
+                log_event("call_policy", {"node": node, "model": model_name, "decision": "breaker_probe"})
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if probe:
+                    self._breaker(model_name).release_probe()
+                log_event("call_policy", {"node": node, "model": model_name, "decision": "deadline_exceeded",
+                                          "attempt": attempt})
+                raise DeadlineExceededError(f"{node}: 호출 마감 시간을 초과했습니다.")
+
+            llm = self._get_llm(model_name, temperature, node_deadline, max_tokens)
+            breaker = self._breaker(model_name)
+            try:
+                result = self._hedged_call(node, llm, model_name, messages, remaining, hedge=not probe)
+                if breaker.record_success():
+                    log_event("call_policy", {"node": node, "model": model_name, "decision": "breaker_closed"})
+                return result
+            except LLMLoadShedError:
+                # 부하 차단은 모델 장애가 아니므로 브레이커에 기록하거나 재시도하지 않음
+                if probe:
+                    breaker.release_probe()
+                log_event("call_policy", {"node": node, "model": model_name, "decision": "load_shed"})
+                raise
+            except Exception as e:
+                if breaker.record_failure():
+                    log_event("call_policy", {"node": node, "model": model_name, "decision": "breaker_opened",
+                                              "error": str(e)})
+
+                attempt += 1
+                if attempt > self.config.max_retries:
+                    log_event("call_policy", {"node": node, "model": model_name, "decision": "give_up",
+                                              "attempt": attempt, "error": str(e)})
+                    raise
+
+                # 지수 증가 + 지터 대기 (마감 시간을 넘지 않도록)
+                backoff = min(self.config.retry_max_delay, self.config.retry_base_delay * (2 ** (attempt - 1)))
+                backoff *= random.uniform(0.5, 1.5)
+                backoff = min(backoff, max(0.0, deadline - time.monotonic()))
+                log_event("call_policy", {"node": node, "model": model_name, "decision": "retry",
+                                          "attempt": attempt, "backoff_ms": round(backoff * 1000, 1),
+                                          "error": str(e)})
+                time.sleep(backoff)
+
+    def as_runnable(self, node: str, user_id: Optional[str] = None, temperature: float = 0.7):
+        """체인(prompt | ... | parser)에 넣을 수 있는 Runnable을 반환합니다.
+
+        user_id를 주지 않으면 호출할 때 config의 configurable.user_id를 사용하므로
+        한 번 만든 체인을 여러 사용자가 공유할 수 있습니다. (chains.chain_registry 참고)
+        묶음 요청은 configurable.batch_user_ids로 묶인 사용자 ID를 전달합니다.
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        def _call(prompt_value: Any, config: Dict[str, Any]):
+            messages = prompt_value.to_messages() if hasattr(prompt_value, "to_messages") else prompt_value
+            configurable = (config or {}).get("configurable", {})
+            call_user_id = user_id if user_id is not None else configurable.get("user_id")
+            return self.invoke(node, messages, user_id=call_user_id, temperature=temperature,
+                               batch_user_ids=configurable.get("batch_user_ids"))
+
+        return RunnableLambda(_call)
+
+# 전역 호출 정책 객체
+call_policy = CallPolicy()
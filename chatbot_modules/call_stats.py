@@ -0,0 +1,69 @@
+"""
+LLM 호출 통계 모듈
+- CallStats: 키(모델 이름 등)별 최근 호출 지연 시간과 오류율을 집계하는 클래스
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+class CallStats:
+    """키별로 최근 window개 호출의 지연 시간(초)과 성공 여부를 유지하는 롤링 통계"""
+
+    def __init__(self, window: int = 200):
+        """초기화"""
+        self.window = window
+        self._samples = {}  # 키별 최근 호출 (key: deque[(latency, ok)])
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float, ok: bool = True):
+        """호출 결과를 기록합니다."""
+        with self._lock:
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append((latency, ok))
+
+    def count(self, key: str) -> int:
+        """기록된 호출 수를 반환합니다."""
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, q: float, successful_only: bool = True) -> Optional[float]:
+        """지연 시간의 q 분위수(0~1)를 반환합니다. 기록이 없으면 None을 반환합니다."""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples.get(key, ())
+                               if ok or not successful_only)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(q * len(latencies)))
+        return latencies[index]
+
+    def error_rate(self, key: str) -> float:
+        """최근 호출의 오류 비율을 반환합니다."""
+        with self._lock:
+            samples = self._samples.get(key, ())
+            if not samples:
+                return 0.0
+            return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """키별 요약 통계를 반환합니다."""
+        with self._lock:
+            keys = list(self._samples.keys())
+        return {
+            key: {
+                "count": self.count(key),
+                "p50": self.percentile(key, 0.5),
+                "p95": self.percentile(key, 0.95),
+                "error_rate": round(self.error_rate(key), 3)
+            }
+            for key in keys
+        }
+
+    def reset(self):
+        """모든 통계를 초기화합니다."""
+        with self._lock:
+            self._samples.clear()
+
+# 전역 호출 통계 객체
+call_stats = CallStats()
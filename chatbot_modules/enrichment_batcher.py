@@ -0,0 +1,215 @@
+"""
+보조 노드 호출 묶음 모듈
+- EnrichmentBatcher: 여러 사용자의 맥락 추적/정보 추출 작업을 짧은 구간 동안 모아 한 번의 LLM 요청으로 보내고
+  결과를 항목 ID로 나누어 각 사용자에게 돌려주는 클래스
+- enrichment_batcher: 전역 묶음 처리기 (graph_nodes의 보조 노드가 사용)
+
+묶음은 먼저 들어온 작업(리더)의 스레드가 보냅니다. 리더는 최대 window_ms 동안 같은 종류의 다른 사용자 작업을
+기다리며, 묶음이 max_batch_size개 또는 max_batch_tokens에 도달하면 바로 보냅니다. 최근(active_user_seconds)에
+다른 사용자의 작업이 없었으면 기다리지 않으므로 사용자가 한 명일 때는 지연 시간이 늘지 않습니다.
+
+작업이 하나뿐인 묶음은 기존 단일 체인으로 보내 프롬프트가 묶음을 쓰지 않을 때와 같습니다. 묶음 요청은 작업 수만큼 늘린
+최대 토큰 수/마감 시간으로 보내되 묶인 사용자 중 가장 적게 남은 턴 예산을 넘지 않으며, 항목은 JSON 배열로 직렬화하여
+사용자 메시지가 다른 항목으로 새지 않게 합니다. 묶음 응답에 결과가 빠진 항목과 묶음 호출이 실패(마감 시간 초과,
+잘린 응답 등)한 경우의 모든 항목은 각 사용자의 스레드에서 단일 체인으로 다시 보냅니다. 리더가 묶음을 만드는 중에
+실패하거나 묶음 결과가 모으는 시간과 묶음 요청의 마감 시간 안에 오지 않은 경우도 마찬가지입니다.
+
+사용 예:
+    result = enrichment_batcher.invoke("track_conversation_context", inputs, user_id=user_id)
+"""
+
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from chatbot_modules.models import EnrichmentBatchConfig
+from chatbot_modules.logging_utils import log_event, set_log_context
+from chatbot_modules.metrics import metrics
+from chatbot_modules.utils import estimate_tokens
+
+# 묶음 응답에 결과가 없거나 묶음 호출이 실패한 항목 표시 (단일 체인으로 다시 호출)
+_MISSING = object()
+
+# 묶음 결과를 기다리는 시간에 더하는 여유(초) (리더가 결과를 나누어 전달하는 시간)
+_RESULT_GRACE_SECONDS = 1.0
+
+_batch_size = metrics.histogram("chatbot_enrichment_batch_size", "보조 노드 묶음 요청 하나에 담긴 사용자 작업 수",
+                                ["kind"], buckets=(1, 2, 4, 8, 16, 32))
+_saved_requests = metrics.counter("chatbot_enrichment_saved_requests_total", "묶음으로 줄인 보조 노드 LLM 요청 수",
+                                  ["kind"])
+
+# 작업 종류별 묶음 체인 이름
+_BATCH_CHAINS = {
+    "track_conversation_context": "track_conversation_context_batch",
+    "extract_user_information": "extract_user_information_batch",
+}
+
+class _Job:
+    """묶음에 들어간 사용자 작업 하나"""
+
+    __slots__ = ("user_id", "inputs", "tokens", "future")
+
+    def __init__(self, user_id: Optional[str], inputs: Dict[str, Any]):
+        """초기화"""
+        self.user_id = user_id
+        self.inputs = inputs
+        self.tokens = estimate_tokens("".join(str(value) for value in inputs.values()))
+        self.future = Future()
+
+class _Batch:
+    """같은 종류의 작업을 모으는 중인 묶음"""
+
+    def __init__(self, kind: str):
+        """초기화"""
+        self.kind = kind
+        self.jobs = []
+        self.tokens = 0
+        self.opened_at = time.monotonic()
+
+class EnrichmentBatcher:
+    """여러 사용자의 보조 노드 작업을 모아 한 번의 LLM 요청으로 보내는 묶음 처리기"""
+
+    def __init__(self, config: Optional[EnrichmentBatchConfig] = None):
+        """초기화"""
+        self.config = config or EnrichmentBatchConfig()
+        self._open = {}  # 종류별로 모으는 중인 묶음 (kind: _Batch)
+        self._recent = {}  # 종류별 최근 작업 시각 (kind: {user_id: monotonic})
+        self._condition = threading.Condition()
+
+    def configure(self, config: EnrichmentBatchConfig):
+        """묶음 설정을 교체합니다."""
+        with self._condition:
+            self.config = config
+
+    def _others_active(self, kind: str, user_id: Optional[str], now: float) -> bool:
+        """최근에 다른 사용자의 같은 종류 작업이 있었는지 확인하고 현재 작업 시각을 기록합니다."""
+        recent = self._recent.setdefault(kind, {})
+        horizon = now - self.config.active_user_seconds
+        for other in [other for other, seen in recent.items() if seen < horizon]:
+            del recent[other]
+        active = any(other != user_id for other in recent)
+        recent[user_id] = now
+        return active
+
+    def _is_full(self, batch: _Batch) -> bool:
+        """묶음을 더 기다리지 않고 보내야 하는지 확인합니다."""
+        return len(batch.jobs) >= self.config.max_batch_size or batch.tokens >= self.config.max_batch_tokens
+
+    def invoke(self, kind: str, inputs: Dict[str, Any], user_id: Optional[str] = None) -> Any:
+        """작업을 묶음에 넣고 이 사용자의 결과(JSON)를 반환합니다. (묶음을 쓰지 않으면 단일 체인 호출)"""
+        from chatbot_modules.chains import chain_registry
+
+        if not self.config.enabled or kind not in _BATCH_CHAINS:
+            return chain_registry.invoke(kind, inputs, user_id=user_id)
+
+        job = _Job(user_id, inputs)
+        leader = False
+        with self._condition:
+            now = time.monotonic()
+            others_active = self._others_active(kind, user_id, now)
+            batch = self._open.get(kind)
+            if batch is None and others_active:
+                batch = self._open[kind] = _Batch(kind)
+                leader = True
+            if batch is not None:
+                batch.jobs.append(job)
+                batch.tokens += job.tokens
+                if self._is_full(batch):
+                    # 가득 찬 묶음은 닫고 기다리는 리더를 깨움
+                    self._open.pop(kind, None)
+                    self._condition.notify_all()
+            if leader:
+                deadline = batch.opened_at + self.config.window_ms / 1000
+                while self._open.get(kind) is batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._open.pop(kind, None)
+                        break
+                    self._condition.wait(remaining)
+
+        # 최근 다른 사용자 작업이 없으면 기다리지 않고 단일 체인으로 보냄
+        if batch is None:
+            return chain_registry.invoke(kind, inputs, user_id=user_id)
+        if leader:
+            self._run(batch)
+
+        result = self._wait_result(kind, job)
+        if result is _MISSING:
+            return chain_registry.invoke(kind, inputs, user_id=user_id)
+        return result
+
+    def _wait_result(self, kind: str, job: _Job) -> Any:
+        """묶음 결과를 기다립니다.
+
+        리더가 묶음을 모으는 시간과 가장 큰 묶음 요청의 마감 시간이 지나도 결과가 없으면
+        리더 스레드에 문제가 생긴 것으로 보고 _MISSING을 반환하여 단일 체인으로 다시 보냅니다.
+        """
+        from chatbot_modules.call_policy import call_policy
+
+        timeout = (self.config.window_ms / 1000 + call_policy.node_deadline(kind, self.config.max_batch_size)
+                   + _RESULT_GRACE_SECONDS)
+        try:
+            return job.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            log_event("enrichment_batcher", {"kind": kind, "decision": "result_timeout", "user_id": job.user_id,
+                                             "timeout_ms": round(timeout * 1000, 1)})
+            return _MISSING
+
+    def _run(self, batch: _Batch):
+        """묶음을 보내고 항목별 결과를 각 작업에 전달합니다. (리더 스레드에서 실행)
+
+        어떤 단계에서 예외가 나더라도 결과가 정해지지 않은 작업은 _MISSING으로 끝내므로,
+        결과를 기다리는 다른 사용자의 스레드는 단일 체인으로 다시 보낼 수 있습니다.
+        """
+        jobs: List[_Job] = batch.jobs
+        try:
+            self._send(batch)
+        except Exception as e:
+            # 묶음이 실패해도 각 사용자의 이번 턴 결과를 잃지 않도록 모든 항목을 단일 체인으로 다시 보냄
+            log_event("enrichment_batcher", {"kind": batch.kind, "decision": "batch_failed", "size": len(jobs),
+                                             "error": str(e)})
+        finally:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_result(_MISSING)
+
+    def _send(self, batch: _Batch):
+        """묶음 요청을 보내고 응답에 있는 항목의 결과를 전달합니다."""
+        from chatbot_modules.chains import chain_registry, encode_batch_items
+
+        jobs: List[_Job] = batch.jobs
+        wait_ms = round((time.monotonic() - batch.opened_at) * 1000, 1)
+        _batch_size.observe(len(jobs), (batch.kind,))
+        if len(jobs) == 1:
+            # 작업이 하나뿐이면 단일 체인 그대로 (묶음 프롬프트 오버헤드 없음)
+            job = jobs[0]
+            try:
+                job.future.set_result(chain_registry.invoke(batch.kind, job.inputs, user_id=job.user_id))
+            except Exception as e:
+                job.future.set_exception(e)
+            return
+
+        items = encode_batch_items([job.inputs for job in jobs])
+        user_ids = [job.user_id for job in jobs]
+
+        def _call():
+            # 묶음 호출은 특정 사용자의 스케줄러 대기열에 속하지 않음 (턴 예산은 묶인 사용자 중 가장 적게 남은 값 적용)
+            set_log_context(user_id=None, batch_user_ids=user_ids)
+            return chain_registry.invoke(_BATCH_CHAINS[batch.kind], {"items": items}, batch_user_ids=user_ids)
+
+        result = contextvars.copy_context().run(_call)
+        result = result if isinstance(result, dict) else {}
+        missing = 0
+        for index, job in enumerate(jobs, 1):
+            item = result.get(str(index), _MISSING)
+            if item is _MISSING:
+                missing += 1
+            job.future.set_result(item if item is _MISSING or isinstance(item, dict) else {})
+        _saved_requests.inc(max(0, len(jobs) - 1 - missing), (batch.kind,))
+        log_event("enrichment_batcher", {"kind": batch.kind, "decision": "batch", "size": len(jobs),
+                                         "wait_ms": wait_ms, "tokens": batch.tokens, "missing": missing})
+
+# 전역 보조 노드 묶음 처리기
+enrichment_batcher = EnrichmentBatcher()
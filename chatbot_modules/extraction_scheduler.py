@@ -0,0 +1,173 @@
+"""
+사용자 정보 추출 스케줄러 모듈
+- ExtractionScheduler: 사용자별로 이미 분석한 턴을 추적하고,
+  미분석 턴을 모아 추출 호출 시점과 범위를 결정하는 클래스
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from chatbot_modules.models import ExtractionSchedulerConfig
+from chatbot_modules.logging_utils import log_event
+from chatbot_modules.utils import _contains_personal_info, estimate_tokens
+from chatbot_modules.turn_gating import _bigrams, _message_role_and_content
+
+class ExtractionScheduler:
+    """사용자별 정보 추출 스케줄러
+
+    - analyzed_count까지의 메시지는 이미 분석된 것으로 보고 다시 보내지 않습니다.
+    - 미분석 턴은 토큰/새로움/턴 수 임계값에 도달하거나 세션이 유휴 상태가 되면 한 번에 보냅니다.
+    - 개인정보 키워드가 포함된 턴은 즉시 보냅니다.
+    - 사용자별 추출 호출 수는 예산(구간당 최대 호출 수)으로 제한합니다.
+    - 미분석 턴이 최대 전송 토큰을 넘으면 오래된 턴부터 나누어 보내고, 보낸 구간까지만 분석 완료로 기록합니다.
+    - 세션 종료/사용자 인계 시에는 flush()로 임계값과 예산에 관계없이 남은 턴을 모두 보냅니다.
+    """
+
+    def __init__(self, config: Optional[ExtractionSchedulerConfig] = None):
+        """초기화"""
+        self.config = config or ExtractionSchedulerConfig()
+        self.analyzed_count = {}  # 분석 완료된 메시지 수 (user_id: int)
+        self.last_turn_time = {}  # 마지막 미분석 턴 시각 (user_id: float)
+        self.known_bigrams = {}  # 이미 분석한 사용자 메시지의 bigram (user_id: set)
+        self.call_times = {}  # 예산 구간 내 추출 호출 시각 (user_id: List[float])
+        self._lock = threading.Lock()
+
+    def _pending(self, user_id: str, messages: List[Any]) -> List[Tuple[int, Dict[str, str]]]:
+        """아직 분석하지 않은 메시지를 (메시지 위치, {"role", "content"}) 형태로 반환합니다."""
+        start = self.analyzed_count.get(user_id, 0)
+        if start > len(messages):
+            # 새로운 세션으로 메시지 목록이 초기화된 경우
+            start = 0
+            self.analyzed_count[user_id] = 0
+
+        pending = []
+        for index in range(start, len(messages)):
+            role, content = _message_role_and_content(messages[index])
+            if role in ("user", "assistant", "ai") and content:
+                pending.append((index, {"role": "assistant" if role == "ai" else role, "content": content}))
+        return pending
+
+    def _budget_left(self, user_id: str, now: float) -> int:
+        """현재 구간에서 남은 추출 호출 수를 반환합니다."""
+        window_start = now - self.config.budget_window_seconds
+        calls = [t for t in self.call_times.get(user_id, []) if t >= window_start]
+        self.call_times[user_id] = calls
+        return self.config.budget_calls - len(calls)
+
+    def next_batch(self, user_id: str, messages: List[Any], now: Optional[float] = None,
+                   force: bool = False) -> Optional[Dict[str, Any]]:
+        """추출을 실행해야 하면 보낼 배치를, 아니면 None을 반환합니다.
+
+        반환된 배치는 추출이 성공한 뒤 complete()로 확정해야 분석 완료로 기록됩니다.
+        force면 임계값과 예산을 확인하지 않고 남은 턴을 보냅니다. (flush 참고)
+        """
+        now = time.time() if now is None else now
+
+        with self._lock:
+            pending = self._pending(user_id, messages)
+            pending_user = [m["content"] for _, m in pending if m["role"] == "user"]
+            if not pending_user:
+                return None
+
+            # 직전 미분석 턴 이후 오래 지났으면 유휴 세션으로 간주
+            last_time = self.last_turn_time.get(user_id)
+            idle = last_time is not None and now - last_time >= self.config.idle_seconds
+            self.last_turn_time[user_id] = now
+
+            known = self.known_bigrams.get(user_id, set())
+            novel_bigrams = set()
+            for text in pending_user:
+                novel_bigrams |= _bigrams(text) - known
+            pending_tokens = sum(estimate_tokens(m["content"]) for _, m in pending)
+
+            reason = None
+            if force:
+                reason = "flush"
+            elif any(_contains_personal_info([{"role": "user", "content": text}]) for text in pending_user):
+                reason = "personal_info"
+            elif pending_tokens >= self.config.max_batch_tokens:
+                reason = "tokens"
+            elif len(novel_bigrams) >= self.config.min_novel_bigrams:
+                reason = "novelty"
+            elif len(pending_user) >= self.config.max_pending_turns:
+                reason = "turns"
+            elif idle:
+                reason = "idle"
+
+            if reason is None:
+                return None
+
+            if not force and self._budget_left(user_id, now) <= 0:
+                log_event("extraction_scheduler", {
+                    "user_id": user_id,
+                    "decision": "deferred",
+                    "reason": "budget_exhausted",
+                    "pending_turns": len(pending_user),
+                    "pending_tokens": pending_tokens
+                })
+                return None
+            self.call_times.setdefault(user_id, []).append(now)
+
+            # 최대 전송 토큰을 넘으면 오래된 턴부터 한도만큼만 보내고 나머지는 다음 배치로 남김
+            batch_messages = []
+            send_tokens = 0
+            analyzed_upto = len(messages)
+            for index, msg in pending:
+                tokens = estimate_tokens(msg["content"])
+                if batch_messages and send_tokens + tokens > self.config.max_send_tokens:
+                    analyzed_upto = index
+                    break
+                batch_messages.append(msg)
+                send_tokens += tokens
+            batch_user = [m["content"] for m in batch_messages if m["role"] == "user"]
+
+        log_event("extraction_scheduler", {
+            "user_id": user_id,
+            "decision": "extract",
+            "reason": reason,
+            "pending_turns": len(pending_user),
+            "pending_tokens": pending_tokens,
+            "sent_messages": len(batch_messages),
+            "sent_tokens": send_tokens,
+            "remaining_messages": len(pending) - len(batch_messages)
+        })
+
+        return {
+            "messages": batch_messages,
+            "analyzed_upto": analyzed_upto,
+            "user_texts": batch_user,
+            "reason": reason
+        }
+
+    def flush(self, user_id: str, messages: List[Any]) -> Optional[Dict[str, Any]]:
+        """남은 미분석 턴의 다음 배치를 임계값과 예산에 관계없이 반환합니다. (없으면 None)
+
+        세션 종료나 사용자 인계 직전에 None이 나올 때까지 호출하며, 배치마다 complete()로 확정합니다.
+        (graph_nodes.flush_user_information 참고)
+        """
+        return self.next_batch(user_id, messages, force=True)
+
+    def complete(self, user_id: str, batch: Dict[str, Any]):
+        """배치의 메시지를 분석 완료로 기록합니다."""
+        with self._lock:
+            self.analyzed_count[user_id] = max(self.analyzed_count.get(user_id, 0), batch["analyzed_upto"])
+            self.last_turn_time.pop(user_id, None)
+
+            known = self.known_bigrams.setdefault(user_id, set())
+            for text in batch["user_texts"]:
+                known |= _bigrams(text)
+            if len(known) > self.config.max_known_bigrams:
+                # 너무 커지면 최근 배치 기준으로 다시 시작
+                self.known_bigrams[user_id] = set().union(*(_bigrams(text) for text in batch["user_texts"]))
+
+    def reset(self, user_id: str):
+        """사용자의 스케줄링 상태를 초기화합니다."""
+        with self._lock:
+            self.analyzed_count.pop(user_id, None)
+            self.last_turn_time.pop(user_id, None)
+            self.known_bigrams.pop(user_id, None)
+            self.call_times.pop(user_id, None)
+
+# 전역 추출 스케줄러 객체
+extraction_scheduler = ExtractionScheduler()
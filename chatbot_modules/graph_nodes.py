@@ -3,40 +3,37 @@ LangGraph 노드 함수 모듈
 - manage_messages: 메시지 관리 노드
 - track_conversation_context: 대화 맥락 추적 노드
 - extract_user_information: 사용자 정보 추출 노드
+- flush_user_information: 세션 종료/사용자 인계 전에 남은 턴의 사용자 정보 추출
 - generate_response: 응답 생성 노드
+- build_chat_messages: LLM 요청 메시지 생성
 """
 
-import json
-import datetime
 import traceback
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
 
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_core.output_parsers import StrOutputParser
 
-from chatbot_modules.models import FRIEND_PERSONA
+from chatbot_modules.personas import persona_registry
 from chatbot_modules.state_management import user_state
-from chatbot_modules.llm_wrappers import LoggingChatOpenAI
-from chatbot_modules.utils import _contains_personal_info, enhance_system_prompt
+from chatbot_modules.call_policy import call_policy
+from chatbot_modules.utils import enhance_system_prompt, count_tokens
+from chatbot_modules.prompt_encoding import CONTEXT_DELTA_FORMAT, PROFILE_DELTA_FORMAT, compact_json, parse_delta
+from chatbot_modules.chains import CONTEXT_TRACKING_SYSTEM, PROFILE_EXTRACTION_SYSTEM
+from chatbot_modules.extraction_scheduler import extraction_scheduler
+from chatbot_modules.enrichment_batcher import enrichment_batcher
+from chatbot_modules.message_store import MessageView, message_store, get_state_messages
+from chatbot_modules.memory_index import long_term_memory
+from chatbot_modules.logging_utils import log_event
+from chatbot_modules.turn_gating import _bigrams
 
 # State 타입 정의
 State = Dict[str, Any]
 
-def manage_messages(state: State) -> State:
-    """사용자와 에이전트 간의 메시지를 관리하고 처리합니다."""
-    user_id = state["user_id"]
-    messages = state["messages"]
-    
-    # 대화 기록 저장
-    user_state.save_conversation(user_id, messages)
-    
-    # FRIEND_PERSONA의 시스템 프롬프트 강화
-    enhanced_system_prompt = enhance_system_prompt(user_id, FRIEND_PERSONA["system_prompt"])
-    
-    # 향상된 시스템 프롬프트로 메시지 업데이트
-    system_message = SystemMessage(content=enhanced_system_prompt)
-    
+def _to_chat_messages(messages) -> List[Any]:
+    """대화 메시지를 LangChain 메시지 객체 목록으로 변환합니다."""
+    if isinstance(messages, MessageView):
+        return messages.to_langchain()
+        
     # 사용자 및 어시스턴트 메시지 변환
     chat_messages = []
     for msg in messages:
@@ -48,9 +45,84 @@ def manage_messages(state: State) -> State:
         else:
             # 이미 LangChain 메시지 객체인 경우
             chat_messages.append(msg)
+    return chat_messages
+
+def _last_user_message(messages) -> Optional[str]:
+    """마지막 사용자 메시지 내용을 반환합니다. (여러 형식 지원)"""
+    for msg in reversed(messages):
+        if isinstance(msg, dict) and "role" in msg and msg["role"] == "user":
+            return msg["content"]
+        elif getattr(msg, "type", None) == "human":
+            return msg.content
+    return None
+
+def build_chat_messages(state: State) -> List[Any]:
+    """강화된 시스템 프롬프트와 대화 메시지로 LLM 요청 메시지 목록을 만듭니다. (LLM 호출 직전에만 생성)"""
+    persona = persona_registry.get(state.get("persona_id"))
+    system_prompt = enhance_system_prompt(state["user_id"], persona["system_prompt"],
+                                          recalled_turns=state.get("recalled_turns"))
+    system_message = SystemMessage(content=system_prompt)
+    return [system_message] + _to_chat_messages(get_state_messages(state))
+
+def context_tracking_inputs(context: Dict[str, Any]) -> Dict[str, str]:
+    """대화 맥락 추적 체인의 시스템 프롬프트 입력 변수 (기존 맥락은 압축 JSON)"""
+    return {"context": compact_json(context, exclude=("last_update_time",))}
+
+def profile_extraction_inputs(current_info: Dict[str, Any]) -> Dict[str, str]:
+    """사용자 정보 추출 체인의 시스템 프롬프트 입력 변수 (기존 정보는 압축 JSON)"""
+    return {"current_info": compact_json(current_info)}
+
+def context_tracking_prompt(context: Dict[str, Any]) -> str:
+    """대화 맥락 추적 시스템 프롬프트를 만듭니다. (기존 맥락은 압축 JSON, 응답은 변경분)"""
+    return CONTEXT_TRACKING_SYSTEM.format(delta_format=CONTEXT_DELTA_FORMAT, **context_tracking_inputs(context))
+
+def profile_extraction_prompt(current_info: Dict[str, Any]) -> str:
+    """사용자 정보 추출 시스템 프롬프트를 만듭니다. (기존 정보는 압축 JSON, 응답은 변경분)"""
+    return PROFILE_EXTRACTION_SYSTEM.format(delta_format=PROFILE_DELTA_FORMAT, **profile_extraction_inputs(current_info))
+
+def manage_messages(state: State, config: Optional[Dict[str, Any]] = None) -> State:
+    """사용자와 에이전트 간의 메시지를 관리하고 처리합니다.
+    
+    그래프 상태에는 메시지 본문 대신 대화 ID(conversation_id)와 메시지 수(message_count)만 두고,
+    메시지는 공유 메시지 저장소에서 참조합니다. 메시지 목록(messages)으로 호출된 경우에는
+    저장소로 옮긴 뒤 같은 방식으로 처리합니다.
+    
+    페르소나는 요청 config의 configurable.persona_id > 스레드 상태의 persona_id > 기본 페르소나 순으로 정합니다.
+    """
+    user_id = state["user_id"]
+    
+    # 이번 턴의 페르소나 (그래프 캐시의 페르소나 바인딩 또는 요청별 지정)
+    requested = ((config or {}).get("configurable") or {}).get("persona_id")
+    state["persona_id"] = persona_registry.resolve(requested or state.get("persona_id"))
     
-    # 업데이트된 메시지로 상태 업데이트
-    state["updated_messages"] = [system_message] + chat_messages
+    # 이번 턴의 LLM 호출 시간 예산 시작
+    call_policy.start_turn(user_id)
+    
+    # 메시지 목록으로 호출된 경우 저장소로 옮김
+    state.setdefault("conversation_id", f"messages_{user_id}")
+    if "messages" in state:
+        message_store.replace_conversation(state["conversation_id"], state["messages"])
+    state["message_count"] = message_store.count(state["conversation_id"])
+    messages = get_state_messages(state)
+    
+    # 대화 기록 저장 (저장소 참조)
+    user_state.save_conversation(user_id, messages)
+    
+    # 새 턴 기록 (오래 언급되지 않은 참조 정보와 오래된 질문 제거)
+    last_user_message = _last_user_message(messages)
+    user_state.advance_turn(user_id, last_user_message)
+    
+    # 장기 기억 인덱스에서 현재 메시지와 관련된 과거 턴 검색 (현재 대화의 턴은 이미 메시지에 있으므로 제외)
+    try:
+        state["recalled_turns"] = long_term_memory.recall(
+            user_id, last_user_message, exclude_conversation=state["conversation_id"])
+    except Exception as e:
+        print(f"과거 대화 검색 중 오류 발생: {e}")
+        state["recalled_turns"] = []
+    
+    # 이전 버전 상태에 남아 있는 메시지 사본 제거
+    # (강화된 시스템 프롬프트와 LLM 요청 메시지는 체크포인트에 남지 않도록 build_chat_messages에서 생성)
+    state.pop("updated_messages", None)
     
     return state
 
@@ -58,95 +130,36 @@ def track_conversation_context(state: State) -> State:
     """대화 맥락을 추적하고 업데이트합니다."""
     try:
         user_id = state["user_id"]
-        messages = state.get("updated_messages", state.get("messages", []))
+        messages = get_state_messages(state)
         
         # 메시지가 없으면 아무 작업도 하지 않음
         if not messages:
             return state
             
         # 마지막 메시지를 가져옴 (여러 형식 지원)
-        last_message = None
-        for msg in reversed(messages):
-            if isinstance(msg, dict) and "role" in msg and msg["role"] == "user":
-                last_message = msg["content"]
-                break
-            elif isinstance(msg, HumanMessage):
-                last_message = msg.content
-                break
+        last_message = _last_user_message(messages)
                 
         if not last_message:
             return state
             
+        # 턴 예산이 부족하거나 기본 모델 장애 시 건너뜀
+        if not call_policy.should_run_auxiliary("track_conversation_context", user_id):
+            return state
+            
         # 현재 대화 맥락 가져오기
         context = user_state.get_conversation_context(user_id)
         
-        # ChatOpenAI 인스턴스 생성
-        llm = LoggingChatOpenAI(temperature=0, model_name="gpt-3.5-turbo")
-        
-        # 대화 맥락 분석
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=f"""
-            다음 대화에서 사용자의 마지막 메시지를 분석하여 대화 맥락 정보를 JSON 형식으로 반환하세요:
-            
-            1. main_topics: 주요 주제들의 배열(최대 3개, 짧은 키워드로)
-            2. current_context: 현재 맥락에 대한 간단한 요약 (최대 100자)
-            3. pending_questions: 아직 대답하지 않은 사용자의 질문들 배열
-            4. references: 대화 중 언급된 참조 정보 객체 (키-값 쌍)
-            
-            이전 맥락 정보:
-            {json.dumps(context, ensure_ascii=False, indent=2)}
-            
-            새로운 정보만 추가하고, 기존 맥락과 일관성 있게 업데이트하세요.
-            """),
-            HumanMessage(content=f"사용자의 마지막 메시지: {last_message}")
-        ])
-        
-        # 분석 실행
-        chain = (
-            prompt 
-            | llm 
-            | StrOutputParser() 
-            | (lambda x: json.loads(x) if x.strip() else {})
+        # 대화 맥락 분석 (그래프 생성 시 만든 체인에 입력 변수만 전달, 호출 정책이 적용된 LLM 사용)
+        # 다른 사용자의 맥락 추적 작업과 함께 한 요청으로 묶일 수 있음
+        analysis_result = enrichment_batcher.invoke(
+            "track_conversation_context",
+            {**context_tracking_inputs(context), "last_message": last_message},
+            user_id=user_id
         )
         
-        analysis_result = chain.invoke({})
-        
-        # 맥락 업데이트
+        # 맥락 업데이트 (변경분만 전달하면 UserState가 기존 값과 병합하고 최대 크기를 유지)
         if analysis_result:
-            context_updates = {}
-            
-            # 주요 주제 업데이트
-            if 'main_topics' in analysis_result and analysis_result['main_topics']:
-                # 기존 주제와 새 주제 합쳐서 중복 제거 후 최대 5개로 제한
-                existing_topics = context.get('main_topics', [])
-                new_topics = analysis_result['main_topics']
-                all_topics = list(dict.fromkeys(existing_topics + new_topics))
-                context_updates['main_topics'] = all_topics[:5]
-                
-            # 현재 맥락 업데이트
-            if 'current_context' in analysis_result and analysis_result['current_context']:
-                context_updates['current_context'] = analysis_result['current_context']
-                
-            # 대답하지 않은 질문 업데이트
-            if 'pending_questions' in analysis_result and analysis_result['pending_questions']:
-                existing_questions = context.get('pending_questions', [])
-                new_questions = analysis_result['pending_questions']
-                all_questions = list(dict.fromkeys(existing_questions + new_questions))
-                context_updates['pending_questions'] = all_questions
-                
-            # 참조 정보 업데이트
-            if 'references' in analysis_result and analysis_result['references']:
-                existing_refs = context.get('references', {})
-                existing_refs.update(analysis_result['references'])
-                context_updates['references'] = existing_refs
-                
-            # 마지막 업데이트 시간
-            current_time = datetime.datetime.now().isoformat()
-            context_updates['last_update_time'] = current_time
-            
-            # 맥락 업데이트
-            if context_updates:
-                user_state.update_conversation_context(user_id, context_updates)
+            user_state.apply_conversation_context_delta(user_id, parse_delta(analysis_result))
         
     except Exception as e:
         print(f"대화 맥락 업데이트 중 오류 발생: {e}")
@@ -154,78 +167,49 @@ def track_conversation_context(state: State) -> State:
         
     return state
 
+def _run_extraction(user_id: str, batch: Dict[str, Any]) -> bool:
+    """스케줄러 배치의 턴에서 사용자 정보를 추출하여 반영합니다. 성공하면 True를 반환합니다."""
+    # 미분석 메시지 텍스트 추출
+    conversation_text = ""
+    for msg in batch["messages"]:
+        role = "사용자" if msg["role"] == "user" else "챗봇"
+        conversation_text += f"{role}: {msg['content']}\n"
+        
+    # 현재 사용자 정보 가져오기
+    current_info = user_state.get_user_information(user_id)
+    
+    # 추출 실행 (그래프 생성 시 만든 체인에 입력 변수만 전달, 호출 정책이 적용된 LLM 사용)
+    # 다른 사용자의 추출 작업과 함께 한 요청으로 묶일 수 있음
+    try:
+        result = enrichment_batcher.invoke(
+            "extract_user_information",
+            {**profile_extraction_inputs(current_info), "conversation_text": conversation_text},
+            user_id=user_id
+        )
+        
+        # 비어있지 않은 결과가 있을 때만 업데이트
+        if result:
+            user_state.apply_user_information_delta(user_id, parse_delta(result))
+            
+        # 보낸 턴을 분석 완료로 기록
+        extraction_scheduler.complete(user_id, batch)
+        return True
+    except Exception as e:
+        print(f"사용자 정보 추출 중 파싱 오류: {e}")
+        return False
+
 def extract_user_information(state: State) -> State:
     """대화에서 사용자 정보를 추출합니다."""
     try:
         user_id = state["user_id"]
-        messages = state.get("updated_messages", state.get("messages", []))
-        
-        # 5턴 마다 사용자 정보 업데이트 (주기적 업데이트)
-        conversation_count = len([msg for msg in messages 
-                                 if (isinstance(msg, dict) and msg.get("role") == "user") or 
-                                    isinstance(msg, HumanMessage)])
+        messages = get_state_messages(state)
         
-        # 대화가 최소 3턴 이상이고, 3턴 마다 또는 마지막 메시지에 개인정보가 있을 가능성이 높을 때 분석
-        if conversation_count >= 3 and (conversation_count % 3 == 0 or _contains_personal_info(messages)):
-            # 최근 대화만 사용
-            recent_messages = messages[-10:]
-            
-            # 메시지 텍스트 추출
-            conversation_text = ""
-            for msg in recent_messages:
-                if isinstance(msg, dict) and "role" in msg and "content" in msg:
-                    role = "사용자" if msg["role"] == "user" else "챗봇"
-                    conversation_text += f"{role}: {msg['content']}\n"
-                elif isinstance(msg, (HumanMessage, AIMessage)):
-                    role = "사용자" if isinstance(msg, HumanMessage) else "챗봇"
-                    conversation_text += f"{role}: {msg.content}\n"
-                
-            # ChatOpenAI 인스턴스 생성
-            llm = LoggingChatOpenAI(temperature=0, model_name="gpt-3.5-turbo")
-            
-            # 현재 사용자 정보 가져오기
-            current_info = user_state.get_user_information(user_id)
-            
-            # 프롬프트 생성
-            prompt = ChatPromptTemplate.from_messages([
-                SystemMessage(content=f"""
-                다음 대화에서 사용자에 대한 개인 정보를 추출하세요.
-                이미 알고 있는 정보: {json.dumps(current_info, ensure_ascii=False, indent=2)}
-                
-                새로운 정보만 추출하고, 확실한 정보만 포함하세요. 추측하지 마세요.
-                결과를 다음 JSON 형식으로 반환하세요:
-                {{
-                  "name": null,
-                  "age": null,
-                  "occupation": null,
-                  "location": null, 
-                  "interests": [],
-                  "preferences": {{}},
-                  "goals": [],
-                  "family": {{}},
-                  "contact_info": null
-                }}
-                """),
-                HumanMessage(content=f"대화:\n{conversation_text}")
-            ])
-            
-            # 실행
-            chain = (
-                prompt 
-                | llm 
-                | StrOutputParser()
-                | (lambda x: json.loads(x) if x.strip() else {})
-            )
-            
-            # 추출 실행
-            try:
-                result = chain.invoke({})
-                
-                # 비어있지 않은 결과가 있을 때만 업데이트
-                if result:
-                    user_state.update_user_information(user_id, result)
-            except Exception as e:
-                print(f"사용자 정보 추출 중 파싱 오류: {e}")
+        # 아직 분석하지 않은 턴을 모아 보낼 시점인지 스케줄러에 확인
+        batch = None
+        if call_policy.should_run_auxiliary("extract_user_information", user_id):
+            batch = extraction_scheduler.next_batch(user_id, messages)
+        if batch:
+            _run_extraction(user_id, batch)
     
     except Exception as e:
         print(f"사용자 정보 추출 중 오류 발생: {e}")
@@ -233,22 +217,72 @@ def extract_user_information(state: State) -> State:
         
     return state
 
+def flush_user_information(user_id: str, messages: Sequence[Any]):
+    """세션 종료/사용자 인계 전에 아직 분석하지 않은 턴에서 사용자 정보를 모두 추출합니다."""
+    try:
+        # 마지막 턴의 예산이 남아 있지 않아도 추출할 수 있도록 새 예산으로 시작
+        call_policy.start_turn(user_id)
+        while True:
+            batch = extraction_scheduler.flush(user_id, messages)
+            if not batch or not _run_extraction(user_id, batch):
+                break
+    except Exception as e:
+        print(f"남은 사용자 정보 추출 중 오류 발생: {e}")
+        traceback.print_exc()
+
+def _retire_answered_questions(user_id: str, response_content: str):
+    """응답과 글자 bigram이 충분히 겹치는 대기 질문을 답변된 것으로 보고 제거합니다."""
+    limits = user_state.context_limits
+    response_bigrams = _bigrams(response_content)
+    if not response_bigrams:
+        return
+    context = user_state.get_conversation_context(user_id)
+    for question in list(context.get("pending_questions", [])):
+        question_bigrams = _bigrams(question)
+        if question_bigrams and len(question_bigrams & response_bigrams) / len(question_bigrams) >= limits.answered_overlap:
+            user_state.remove_pending_question(user_id, question)
+
+def _log_context_size(user_id: str, chat_messages: List[Any]):
+    """프롬프트에 들어간 대화 맥락과 시스템 프롬프트 크기를 턴마다 기록합니다."""
+    size = user_state.get_context_size(user_id)
+    log_every = user_state.context_limits.log_every
+    if log_every <= 0 or size["turn"] % log_every:
+        return
+    system_prompt = chat_messages[0].content if chat_messages else ""
+    size["system_prompt_chars"] = len(system_prompt)
+    size["system_prompt_tokens"] = count_tokens(system_prompt)
+    log_event("context_size", size)
+
 def generate_response(state: State) -> State:
     """새로운 응답을 생성합니다."""
     user_id = state["user_id"]
     
     try:
-        # LLM 인스턴스 생성
-        llm = LoggingChatOpenAI(model_name="gpt-3.5-turbo", temperature=0.7)
-        
-        # 응답 생성
-        response = llm.invoke(state["updated_messages"])
+        # 호출 정책을 적용하여 응답 생성
+        chat_messages = build_chat_messages(state)
+        _log_context_size(user_id, chat_messages)
+        response = call_policy.invoke("generate_response", chat_messages, user_id=user_id, temperature=0.7)
         
         # 응답 내용을 상태에 추가
         response_content = response.content
         
-        # 메시지 목록에 응답 추가
-        state["messages"].append({"role": "assistant", "content": response_content})
+        # 메시지 저장소에 응답 추가
+        message_store.append(state["conversation_id"], "assistant", response_content)
+        state["message_count"] = message_store.count(state["conversation_id"])
+        
+        # 메시지 목록으로 호출된 경우 목록에도 응답 추가
+        if "messages" in state:
+            state["messages"].append({"role": "assistant", "content": response_content})
+        
+        # 완료된 턴을 장기 기억 인덱스에 추가
+        try:
+            long_term_memory.add_turn(user_id, _last_user_message(get_state_messages(state)) or "",
+                                      response_content, conversation_id=state["conversation_id"])
+        except Exception as e:
+            print(f"장기 기억 인덱스 추가 중 오류 발생: {e}")
+        
+        # 이번 응답으로 답변된 질문을 대기 목록에서 제거
+        _retire_answered_questions(user_id, response_content)
         
         # 응답 결과를 별도 키에 저장 (출력용)
         state["response"] = response_content
@@ -0,0 +1,231 @@
+"""
+LLM 작업 스케줄러 모듈
+- LLMScheduler: 프로세스 전체 LLM 호출의 입장 제어(동시 실행 수, 토큰 속도 제한)와 우선순위 스케줄링
+- llm_priority: 현재 실행 맥락의 LLM 호출 우선순위 등급을 지정하는 컨텍스트 관리자
+- LLMLoadShedError: 부하가 높아 낮은 우선순위 작업을 버릴 때 발생하는 예외
+
+우선순위 등급은 interactive(응답 생성) > enrichment(정보 추출/맥락 추적) > backfill(이전 로그 분석)이며,
+llm_priority로 지정하지 않으면 로그 맥락의 노드 이름(call_policy가 설정)으로 정합니다.
+같은 등급 안에서는 사용자별 대기열을 번갈아 꺼내므로 한 사용자의 작업이 다른 사용자를 밀어내지 않습니다.
+대기열이 길어지면 enrichment/backfill 작업은 버려지고(LLMLoadShedError), 최대 대기 시간이 없는 등급은
+상위 등급 작업이 없을 때까지 미뤄집니다.
+"""
+
+import time
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from chatbot_modules.models import LLMSchedulerConfig
+from chatbot_modules.logging_utils import get_log_context, log_event
+
+# 우선순위 등급 (앞에 있을수록 먼저 실행)
+PRIORITIES = ("interactive", "enrichment", "backfill")
+
+# 대기 시간 통계에 유지할 최근 기록 수
+_WAIT_WINDOW = 512
+
+# 현재 실행 맥락의 우선순위 등급 (None이면 노드 이름으로 결정)
+_llm_priority = contextvars.ContextVar("llm_priority", default=None)
+
+class LLMLoadShedError(RuntimeError):
+    """부하가 높아 낮은 우선순위 LLM 작업을 실행하지 않고 버렸을 때 발생하는 예외"""
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """이 블록 안에서 시작하는 LLM 호출의 우선순위 등급을 지정합니다."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"알 수 없는 우선순위 등급: {priority}")
+    token = _llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        _llm_priority.reset(token)
+
+class _Ticket:
+    """대기열에 들어간 LLM 작업 하나"""
+
+    __slots__ = ("user_id", "priority", "tokens", "enqueued_at", "admitted")
+
+    def __init__(self, user_id: str, priority: str, tokens: int):
+        """초기화"""
+        self.user_id = user_id
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.admitted = False
+
+class LLMScheduler:
+    """프로세스 전체 LLM 호출을 우선순위와 사용자별 공정성에 따라 실행하는 스케줄러
+
+    Args:
+        config: 스케줄러 설정
+    """
+
+    def __init__(self, config: Optional[LLMSchedulerConfig] = None):
+        """초기화"""
+        self.config = config or LLMSchedulerConfig()
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}  # 등급별 사용자 대기열 (user_id: deque)
+        self._depths = {priority: 0 for priority in PRIORITIES}
+        self._running = 0
+        self._tokens = float(self.config.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._counters = {priority: {"admitted": 0, "shed": 0} for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=_WAIT_WINDOW) for priority in PRIORITIES}
+        self._stats_logged_at = time.monotonic()
+        self._condition = threading.Condition()
+
+    def configure(self, config: LLMSchedulerConfig):
+        """설정을 교체합니다. (대기 중인 작업은 새 설정으로 다시 판단)"""
+        with self._condition:
+            self.config = config
+            self._tokens = min(self._tokens, float(config.tokens_per_minute))
+            self._condition.notify_all()
+
+    def resolve_priority(self, node: Optional[str] = None) -> str:
+        """현재 맥락의 우선순위 등급을 반환합니다. (llm_priority > 노드별 설정 > 기본값)"""
+        priority = _llm_priority.get()
+        if priority is None:
+            node = node or get_log_context().get("node")
+            priority = self.config.node_priorities.get(node, self.config.default_priority)
+        return priority if priority in PRIORITIES else self.config.default_priority
+
+    # ----- 입장 제어 -----
+
+    def _refill(self, now: float):
+        """토큰 버킷을 경과 시간만큼 채웁니다. (잠금 보유 상태에서 호출)"""
+        capacity = self.config.tokens_per_minute
+        self._tokens = min(capacity, self._tokens + (now - self._refilled_at) * capacity / 60.0)
+        self._refilled_at = now
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """다음에 실행할 작업을 반환합니다. (가장 높은 등급에서 사용자를 번갈아 선택, 잠금 보유 상태에서 호출)"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _can_admit(self, ticket: _Ticket) -> bool:
+        """동시 실행 수와 토큰 버킷에 여유가 있는지 확인합니다. (잠금 보유 상태에서 호출)"""
+        if self._running >= self.config.max_concurrency:
+            return False
+        if self.config.tokens_per_minute > 0:
+            # 버킷 용량보다 큰 요청은 버킷이 가득 찼을 때 허용
+            return self._tokens >= min(ticket.tokens, self.config.tokens_per_minute)
+        return True
+
+    def _dequeue(self, ticket: _Ticket):
+        """작업을 대기열에서 꺼내고 해당 사용자를 순서 맨 뒤로 보냅니다. (잠금 보유 상태에서 호출)"""
+        queue = self._queues[ticket.priority]
+        user_queue = queue[ticket.user_id]
+        user_queue.remove(ticket)
+        if user_queue:
+            queue.move_to_end(ticket.user_id)
+        else:
+            del queue[ticket.user_id]
+        self._depths[ticket.priority] -= 1
+
+    def _shed(self, ticket: _Ticket, reason: str):
+        """작업을 버리고 기록합니다. (잠금 보유 상태에서 호출)"""
+        self._counters[ticket.priority]["shed"] += 1
+        log_event("llm_scheduler", {"decision": "shed", "priority": ticket.priority, "user_id": ticket.user_id,
+                                    "reason": reason, "queue_depth": dict(self._depths)})
+        raise LLMLoadShedError(f"LLM 부하가 높아 {ticket.priority} 작업을 건너뜁니다. ({reason})")
+
+    def acquire(self, user_id: Optional[str], priority: str, tokens: int) -> _Ticket:
+        """실행 차례가 될 때까지 기다린 뒤 작업 표를 반환합니다. 버려지면 LLMLoadShedError가 발생합니다."""
+        ticket = _Ticket(user_id or "", priority, max(0, tokens))
+        with self._condition:
+            if not self.config.enabled:
+                self._running += 1
+                ticket.admitted = True
+                return ticket
+
+            max_depth = self.config.max_queue_depth.get(priority)
+            if max_depth is not None and self._depths[priority] >= max_depth:
+                self._shed(ticket, "queue_full")
+
+            self._queues[priority].setdefault(ticket.user_id, deque()).append(ticket)
+            self._depths[priority] += 1
+            max_wait = self.config.max_wait_seconds.get(priority)
+
+            while True:
+                now = time.monotonic()
+                if self.config.tokens_per_minute > 0:
+                    self._refill(now)
+                if self._next_ticket() is ticket and self._can_admit(ticket):
+                    break
+
+                waited = now - ticket.enqueued_at
+                if max_wait is not None and waited >= max_wait:
+                    self._dequeue(ticket)
+                    self._condition.notify_all()
+                    self._shed(ticket, "wait_timeout")
+
+                # 토큰 버킷이 찰 때까지 기다리는 경우를 위해 짧게 깨어나 다시 확인
+                timeout = 0.05 if self.config.tokens_per_minute > 0 else None
+                if max_wait is not None:
+                    timeout = min(timeout or max_wait, max(0.001, max_wait - waited))
+                self._condition.wait(timeout)
+
+            self._dequeue(ticket)
+            self._running += 1
+            ticket.admitted = True
+            if self.config.tokens_per_minute > 0:
+                self._tokens -= ticket.tokens
+            self._counters[priority]["admitted"] += 1
+            self._waits[priority].append(time.monotonic() - ticket.enqueued_at)
+            # 다음 차례의 작업이 바로 입장할 수 있도록 깨움
+            self._condition.notify_all()
+            return ticket
+
+    def release(self, ticket: _Ticket, used_tokens: Optional[int] = None):
+        """작업 실행이 끝났음을 알립니다. 실제 사용 토큰 수를 알면 추정치와의 차이를 버킷에 반영합니다."""
+        with self._condition:
+            if not ticket.admitted:
+                return
+            ticket.admitted = False
+            self._running -= 1
+            if used_tokens is not None and self.config.enabled and self.config.tokens_per_minute > 0:
+                self._tokens = min(self.config.tokens_per_minute, self._tokens + ticket.tokens - used_tokens)
+            self._condition.notify_all()
+            
+            # 일정 간격으로 대기열 지표 기록
+            interval = self.config.stats_log_interval_seconds
+            log_stats = interval > 0 and time.monotonic() - self._stats_logged_at >= interval
+            if log_stats:
+                self._stats_logged_at = time.monotonic()
+        if log_stats:
+            log_event("llm_scheduler", {"decision": "stats", **self.stats()})
+
+    @contextmanager
+    def slot(self, user_id: Optional[str], priority: str, tokens: int) -> Iterator[_Ticket]:
+        """실행 차례를 기다렸다가 블록이 끝나면 반환하는 컨텍스트 관리자"""
+        ticket = self.acquire(user_id, priority, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    # ----- 지표 -----
+
+    def stats(self) -> Dict[str, Any]:
+        """등급별 대기열 길이, 입장/버림 횟수, 최근 대기 시간(p50/p95, ms)을 반환합니다."""
+        with self._condition:
+            result = {"running": self._running, "tokens_available": round(self._tokens), "priorities": {}}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                result["priorities"][priority] = {
+                    "queue_depth": self._depths[priority],
+                    "waiting_users": len(self._queues[priority]),
+                    **self._counters[priority],
+                    "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+                    "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else None
+                }
+            return result
+
+# 전역 LLM 작업 스케줄러 객체
+llm_scheduler = LLMScheduler()
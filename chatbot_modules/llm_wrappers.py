@@ -1,12 +1,16 @@
 """
 LLM 래퍼 모듈
-- LoggingChatOpenAI: 로깅 기능이 추가된 ChatOpenAI 래퍼
+- LoggingChatOpenAI: 로깅 기능과 LLM 작업 스케줄러가 적용된 ChatOpenAI 래퍼
 """
 
+import time
+
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
-from chatbot_modules.logging_utils import log_llm_communication, OPENAI_API_KEY, check_api_key
+from chatbot_modules.logging_utils import log_llm_communication, get_log_context, OPENAI_API_KEY, check_api_key
+from chatbot_modules.llm_scheduler import llm_scheduler
+from chatbot_modules.utils import estimate_tokens
 
 class LoggingChatOpenAI(ChatOpenAI):
     """로깅 기능이 추가된 ChatOpenAI 래퍼 클래스"""
@@ -34,20 +38,40 @@ class LoggingChatOpenAI(ChatOpenAI):
         # 입력 메시지 로깅
         request_data = self._format_for_logging(input)
         
-        # 부모 클래스의 invoke 메서드 호출
-        response = super().invoke(input, config=config, **kwargs)
+        # 스케줄러에서 실행 차례를 받은 뒤 부모 클래스의 invoke 메서드 호출
+        # (우선순위는 llm_priority 또는 로그 맥락의 노드 이름, 부하가 높으면 LLMLoadShedError 발생)
+        ticket = llm_scheduler.acquire(get_log_context().get("user_id"), llm_scheduler.resolve_priority(),
+                                       self._estimate_request_tokens(request_data))
+        used_tokens = None
+        try:
+            started = time.perf_counter()
+            response = super().invoke(input, config=config, **kwargs)
+            latency_ms = (time.perf_counter() - started) * 1000
+            used_tokens = (getattr(response, "usage_metadata", None) or {}).get("total_tokens")
+        finally:
+            llm_scheduler.release(ticket, used_tokens)
         
         # 응답 로깅
         response_data = self._format_for_logging(response)
         
         # LLM 통신 로깅
         try:
-            log_llm_communication(request_data, response_data, source=self.__class__.__name__)
+            log_llm_communication(request_data, response_data, source=self.__class__.__name__,
+                                  latency_ms=latency_ms)
         except Exception as e:
             print(f"로깅 중 오류 발생: {e}")
         
         return response
     
+    def _estimate_request_tokens(self, request_data) -> int:
+        """요청 메시지와 최대 응답 길이로 이번 호출의 토큰 사용량을 추정합니다."""
+        if isinstance(request_data, list):
+            text = "".join(str(item.get("content", "")) if isinstance(item, dict) else str(item) for item in request_data)
+        else:
+            text = str(request_data)
+        completion_tokens = self.max_tokens or llm_scheduler.config.expected_completion_tokens
+        return estimate_tokens(text) + completion_tokens
+    
     def _format_for_logging(self, data):
         """로깅을 위한 데이터 형식 변환"""
         if data is None:
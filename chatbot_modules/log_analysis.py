@@ -1,69 +1,200 @@
 """
 로그 분석 모듈
-- 로그 파일 로딩
+- 로그 파일 로딩 (k-way 병합 스트리밍, 역방향 tail 읽기, 델타 형식 지연 복원)
 - 로그 데이터 분석
+- 대화 턴 추출
 - 대화 요약
 """
 
 import os
 import json
+import heapq
 import datetime
 import traceback
-from typing import List, Dict, Any
-
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_core.output_parsers import StrOutputParser
+from typing import List, Dict, Any, Callable, Iterator, Optional
 
 from chatbot_modules.logging_utils import LOG_DIR
-from chatbot_modules.llm_wrappers import LoggingChatOpenAI
+from chatbot_modules.log_format import DeltaDecoder, LoggedMessages, is_delta_entry
 
-def load_previous_logs(user_id: str) -> List[Dict]:
-    """이전 로그 파일들을 로드하고 해당 사용자의 대화 내용을 반환합니다."""
-    all_logs = []
-    
+# 역방향 읽기 시 한 번에 읽는 블록 크기
+_REVERSE_READ_BLOCK_SIZE = 64 * 1024
+
+def _parse_log_line(line: str, file_path: str, last_timestamp: Optional[str] = None) -> Optional[Dict]:
+    """로그 한 줄을 파싱하여 유효한 대화 로그 항목이면 반환합니다."""
     try:
-        # logs 디렉토리의 모든 로그 파일 검색
-        log_files = [f for f in os.listdir(LOG_DIR) if f.endswith('.json')]
+        # 공백 및 빈 줄 스킵
+        if not line.strip():
+            return None
+            
+        log_entry = json.loads(line.strip())
         
-        for log_file in log_files:
-            file_path = os.path.join(LOG_DIR, log_file)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        try:
-                            # 공백 및 빈 줄 스킵
-                            if not line.strip():
-                                continue
-                                
-                            log_entry = json.loads(line.strip())
-                            
-                            # 유효한 로그 항목만 처리 (필수 필드 확인)
-                            if 'request' in log_entry and 'response' in log_entry:
-                                # 타임스탬프가 없는 경우 추가
-                                if 'timestamp' not in log_entry:
-                                    log_entry['timestamp'] = datetime.datetime.now().isoformat()
-                                    
-                                # 소스 정보가 없는 경우 추가
-                                if 'source' not in log_entry:
-                                    log_entry['source'] = 'unknown'
-                                    
-                                all_logs.append(log_entry)
-                        except json.JSONDecodeError:
-                            print(f"잘못된 JSON 형식의 로그 라인 무시: {file_path}")
-                            continue
-                        except Exception as e:
-                            print(f"로그 라인 처리 중 오류 발생: {e}")
-                            continue
-            except Exception as e:
-                print(f"로그 파일 '{file_path}' 열기 실패: {e}")
+        # 유효한 로그 항목만 처리 (필수 필드 확인)
+        if not isinstance(log_entry, dict):
+            return None
+        if not is_delta_entry(log_entry) and ('request' not in log_entry or 'response' not in log_entry):
+            return None
+            
+        # 타임스탬프가 없는 경우 파일 내 순서가 유지되도록 직전 항목의 시간을 사용
+        if 'timestamp' not in log_entry:
+            log_entry['timestamp'] = last_timestamp or datetime.datetime.now().isoformat()
+            
+        # 소스 정보가 없는 경우 추가
+        if 'source' not in log_entry:
+            log_entry['source'] = 'unknown'
+            
+        return log_entry
+    except json.JSONDecodeError:
+        print(f"잘못된 JSON 형식의 로그 라인 무시: {file_path}")
+    except Exception as e:
+        print(f"로그 라인 처리 중 오류 발생: {e}")
+    return None
+
+def _list_log_files(log_dir: str) -> List[str]:
+    """로그 디렉토리의 로그 파일 경로를 이름(=생성 시각) 순으로 반환합니다.
+    
+    로그 디렉토리는 첫 로그 기록 시 만들어지므로, 아직 없으면 빈 목록을 반환합니다.
+    """
+    if not os.path.isdir(log_dir):
+        return []
+    return sorted(os.path.join(log_dir, f) for f in os.listdir(log_dir) if f.endswith('.json'))
+
+def iter_log_file(file_path: str) -> Iterator[Dict]:
+    """로그 파일 하나의 유효한 항목을 앞에서부터 하나씩 반환합니다.
+    
+    델타 형식 항목의 요청 메시지는 파일의 메시지 테이블을 참조하는 LoggedMessages로 복원됩니다.
+    """
+    last_timestamp = None
+    decoder = DeltaDecoder()
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                log_entry = _parse_log_line(line, file_path, last_timestamp)
+                if log_entry is not None:
+                    last_timestamp = log_entry['timestamp']
+                    yield decoder.decode(log_entry)
+    except Exception as e:
+        print(f"로그 파일 '{file_path}' 열기 실패: {e}")
+
+def _iter_lines_reversed(file_path: str) -> Iterator[str]:
+    """파일을 끝에서부터 블록 단위로 읽어 줄을 역순으로 반환합니다."""
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(_REVERSE_READ_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # 첫 줄은 이전 블록과 이어질 수 있으므로 보류
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode('utf-8', errors='replace')
+        if remainder.strip():
+            yield remainder.decode('utf-8', errors='replace')
+
+def _decode_segment_reversed(segment: List[Dict]) -> Iterator[Dict]:
+    """끝에서부터 모은 델타 구간(키프레임 또는 파일 처음부터)을 앞에서부터 복원하여 역순으로 반환합니다."""
+    decoder = DeltaDecoder()
+    decoded = [decoder.decode(log_entry) for log_entry in reversed(segment)]
+    return reversed(decoded)
+
+def iter_log_file_reversed(file_path: str) -> Iterator[Dict]:
+    """로그 파일 하나의 유효한 항목을 끝에서부터 하나씩 반환합니다.
+    
+    델타 형식 항목은 같은 구간의 앞쪽 항목에 기록된 메시지를 참조하므로, 델타 항목을 만나면 구간이 시작되는
+    키프레임 항목까지 거꾸로 읽어 모은 뒤 그 구간만 앞에서부터 복원하여 역순으로 반환합니다.
+    인코더가 일정 크기마다 키프레임을 기록하므로 한 번에 메모리에 두는 양은 파일 크기가 아니라 구간 크기에 비례합니다.
+    (키프레임이 없는 이전 델타 로그는 파일 처음까지 모아 복원)
+    """
+    try:
+        segment = []  # 아직 복원하지 않은 현재 구간의 항목 (역순)
+        for line in _iter_lines_reversed(file_path):
+            log_entry = _parse_log_line(line, file_path)
+            if log_entry is None:
                 continue
+            if not segment and not is_delta_entry(log_entry):
+                yield log_entry
+                continue
+            segment.append(log_entry)
+            if log_entry.get("keyframe"):
+                yield from _decode_segment_reversed(segment)
+                segment = []
+        yield from _decode_segment_reversed(segment)
+    except Exception as e:
+        print(f"로그 파일 '{file_path}' 열기 실패: {e}")
+
+def iter_previous_logs(log_dir: str = LOG_DIR) -> Iterator[Dict]:
+    """모든 로그 파일의 항목을 타임스탬프 순으로 스트리밍합니다.
+    
+    각 로그 파일은 이미 시간 순으로 기록되어 있으므로 파일별 이터레이터를
+    힙 기반 k-way 병합하여, 전체 로그를 메모리에 올리지 않고 정렬된 순서로 반환합니다.
+    """
+    file_iterators = [iter_log_file(path) for path in _list_log_files(log_dir)]
+    return heapq.merge(*file_iterators, key=lambda x: x.get('timestamp', ''))
+
+def tail_previous_logs(max_entries: int, log_dir: str = LOG_DIR,
+                       predicate: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+    """가장 최근 로그 항목 max_entries개를 오래된 것부터 반환합니다.
+    
+    최근에 수정된 파일부터 끝에서 거꾸로 읽으면서 최신 항목 max_entries개만 힙에 유지합니다.
+    힙이 가득 찬 뒤에는 더 오래된 항목이 나오면 그 파일 읽기를 멈추고, 마지막 수정 시각이
+    힙의 가장 오래된 항목보다 이전인 파일은 열지 않으므로 메모리와 읽는 양은 요청한 항목 수에 비례합니다.
+    
+    Args:
+        max_entries: 수집할 항목 수
+        log_dir: 로그 디렉토리
+        predicate: 지정하면 조건을 만족하는 항목만 수집 (예: 대화 턴만)
+    """
+    if max_entries <= 0:
+        return []
         
-        # 로그를 타임스탬프 기준으로 정렬 (가장 오래된 것부터)
-        all_logs.sort(key=lambda x: x.get('timestamp', ''))
+    # (timestamp, 순번, 항목) 최소 힙: 가장 오래된 항목이 맨 앞
+    newest = []
+    sequence = 0
+    
+    log_files = sorted(_list_log_files(log_dir), key=os.path.getmtime, reverse=True)
+    for file_path in log_files:
+        if len(newest) >= max_entries:
+            modified = datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+            if modified < newest[0][0]:
+                break
+                
+        for log_entry in iter_log_file_reversed(file_path):
+            if predicate is not None and not predicate(log_entry):
+                continue
+            item = (log_entry.get('timestamp', ''), sequence, log_entry)
+            sequence += 1
+            if len(newest) < max_entries:
+                heapq.heappush(newest, item)
+            elif item[0] > newest[0][0]:
+                heapq.heapreplace(newest, item)
+            else:
+                # 파일은 시간 순이므로 이후 항목은 모두 더 오래됨
+                break
+    
+    return [log_entry for _, _, log_entry in sorted(newest, key=lambda x: (x[0], -x[1]))]
+
+def load_previous_logs(user_id: str, max_entries: Optional[int] = None, verbose: bool = True) -> List[Dict]:
+    """이전 로그 파일들을 로드하고 해당 사용자의 대화 내용을 반환합니다.
+    
+    Args:
+        user_id: 사용자 ID
+        max_entries: 지정하면 가장 최근 항목만 역방향으로 읽어 반환 (tail 모드)
+        verbose: 로딩 결과 출력 여부
+    """
+    all_logs = []
+    
+    try:
+        if max_entries is not None:
+            all_logs = tail_previous_logs(max_entries)
+        else:
+            all_logs = list(iter_previous_logs())
         
         valid_log_count = len(all_logs)
-        print(f"로그 파일 로딩 완료: {valid_log_count}개의 유효한 대화 로그 항목 로딩")
+        if verbose:
+            print(f"로그 파일 로딩 완료: {valid_log_count}개의 유효한 대화 로그 항목 로딩")
                         
     except Exception as e:
         print(f"로그 로딩 중 오류 발생: {e}")
@@ -71,12 +202,44 @@ def load_previous_logs(user_id: str) -> List[Dict]:
         
     return all_logs
 
+# 로그에 기록된 메시지 역할(LangChain type)을 대화 역할로 변환
+_ROLE_ALIASES = {"human": "user", "user": "user", "ai": "assistant", "assistant": "assistant"}
+
+def extract_conversation_turn(log_entry: Dict) -> Dict:
+    """응답 생성 호출 로그에서 한 턴(마지막 사용자 메시지와 응답)만 추출합니다.
+    
+    보조 노드의 체인 호출처럼 메시지 목록이 아닌 요청은 대화 턴이 아니므로 빈 딕셔너리를 반환합니다.
+    반환 형식은 analyze_previous_logs/summarize_previous_conversations가 처리하는 로그 항목 형식과 같습니다.
+    """
+    request = log_entry.get('request')
+    response = log_entry.get('response')
+    if not isinstance(request, (list, LoggedMessages)) or not isinstance(response, dict):
+        return {}
+    
+    user_content = None
+    for msg in reversed(request):
+        if isinstance(msg, dict) and _ROLE_ALIASES.get(msg.get('role')) == 'user' and msg.get('content'):
+            user_content = msg['content']
+            break
+    if user_content is None or not response.get('content'):
+        return {}
+    
+    turn = {
+        "timestamp": log_entry.get('timestamp', ''),
+        "source": log_entry.get('source', 'unknown'),
+        "request": [{"role": "user", "content": user_content}],
+        "response": {"role": "assistant", "content": response['content']}
+    }
+    if log_entry.get('user_id'):
+        turn['user_id'] = log_entry['user_id']
+    return turn
+
 def summarize_previous_conversations(logs: List[Dict]) -> str:
     """이전 대화에서 중요한 내용을 요약하여 반환합니다."""
+    # LangChain/OpenAI 의존성은 로그 읽기만 하는 도구가 로드하지 않도록 실제 분석 시점에 import
+    from chatbot_modules.chains import chain_registry
+    
     try:
-        # ChatOpenAI 인스턴스 생성
-        llm = LoggingChatOpenAI(temperature=0, model_name="gpt-3.5-turbo")
-        
         # 로그에서 대화 내용 추출
         conversations = []
         for log in logs:
@@ -97,7 +260,7 @@ def summarize_previous_conversations(logs: List[Dict]) -> str:
                 elif isinstance(request, str):
                     conversations.append(f"사용자: {request}")
                 # 요청이 리스트인 경우
-                elif isinstance(request, list):
+                elif isinstance(request, (list, LoggedMessages)):
                     for item in request:
                         if isinstance(item, dict) and 'role' in item and item['role'] == 'user' and 'content' in item:
                             conversations.append(f"사용자: {item['content']}")
@@ -127,18 +290,8 @@ def summarize_previous_conversations(logs: List[Dict]) -> str:
         if not conversation_text:
             return ""
             
-        # 요약 프롬프트 생성
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content="""
-            다음은 이전 대화 기록입니다. 이 대화의 주요 내용을 200자 이내로 간결하게 요약해주세요.
-            중요한 정보, 주제 및 맥락만 포함하세요.
-            """),
-            HumanMessage(content=f"대화 기록:\n\n{conversation_text}")
-        ])
-        
-        # 요약 실행
-        chain = prompt | llm | StrOutputParser()
-        summary = chain.invoke({})
+        # 요약 실행 (미리 만든 체인에 대화 기록만 전달, 모델 라우터와 호출 정책이 적용된 LLM 사용)
+        summary = chain_registry.invoke("summarize_previous_conversations", {"conversation_text": conversation_text})
         
         return summary
         
@@ -147,12 +300,17 @@ def summarize_previous_conversations(logs: List[Dict]) -> str:
         traceback.print_exc()
         return ""
 
-def analyze_previous_logs(logs: List[Dict]) -> Dict[str, Any]:
-    """이전 로그를 분석하여 사용자 정보와 대화 맥락을 추출합니다."""
+def analyze_previous_logs(logs: List[Dict], raise_errors: bool = False) -> Dict[str, Any]:
+    """이전 로그를 분석하여 사용자 정보와 대화 맥락을 추출합니다.
+    
+    Args:
+        logs: 로그 항목 목록
+        raise_errors: True면 오류를 빈 결과로 바꾸지 않고 그대로 발생시킴 (일괄 분석 재시도용)
+    """
+    # LangChain/OpenAI 의존성은 로그 읽기만 하는 도구가 로드하지 않도록 실제 분석 시점에 import
+    from chatbot_modules.chains import chain_registry
+    
     try:
-        # ChatOpenAI 인스턴스 생성
-        llm = LoggingChatOpenAI(temperature=0, model_name="gpt-3.5-turbo")
-        
         # 로그에서 대화 내용 추출
         conversations = []
         for log in logs:
@@ -171,7 +329,7 @@ def analyze_previous_logs(logs: List[Dict]) -> Dict[str, Any]:
                 elif isinstance(request, str):
                     conversations.append(f"request: {request}")
                 # request가 리스트인 경우 (각 항목 처리)
-                elif isinstance(request, list):
+                elif isinstance(request, (list, LoggedMessages)):
                     for item in request:
                         if isinstance(item, dict) and 'role' in item and 'content' in item:
                             conversations.append(f"{item['role']}: {item['content']}")
@@ -201,44 +359,8 @@ def analyze_previous_logs(logs: List[Dict]) -> Dict[str, Any]:
         if not conversation_text:
             return {}
         
-        # 분석 프롬프트 생성
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content="""
-            다음 대화 기록을 분석하여 중요한 정보를 추출하세요. JSON 형식으로 다음 정보를 반환하세요:
-            
-            1. user_information: {
-                "name": str | null,
-                "age": int | null,
-                "occupation": str | null,
-                "location": str | null,
-                "interests": string[],
-                "preferences": {key: value},
-                "goals": string[],
-                "family": {key: value},
-                "contact_info": str | null
-            }
-            
-            2. conversation_context: {
-                "main_topics": string[],
-                "current_context": str,
-                "pending_questions": string[],
-                "references": {key: value}
-            }
-            
-            대화에서 명확하게 언급된 정보만 포함하세요. 추측하지 마세요.
-            """),
-            HumanMessage(content=f"다음 대화 기록을 분석하세요:\n\n{conversation_text}")
-        ])
-        
-        # 분석 실행
-        chain = (
-            prompt 
-            | llm 
-            | StrOutputParser() 
-            | (lambda x: json.loads(x) if x.strip() else {})
-        )
-        
-        result = chain.invoke({})
+        # 분석 실행 (미리 만든 체인에 대화 기록만 전달, 모델 라우터와 호출 정책이 적용된 LLM 사용)
+        result = chain_registry.invoke("analyze_previous_logs", {"conversation_text": conversation_text})
         
         # 대화 요약 추가
         if result and 'conversation_context' in result:
@@ -253,6 +375,8 @@ def analyze_previous_logs(logs: List[Dict]) -> Dict[str, Any]:
         return result
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"로그 분석 중 오류 발생: {e}")
         traceback.print_exc()
         return {} 
\ No newline at end of file
@@ -0,0 +1,352 @@
+"""
+로그 형식 모듈
+- DeltaEncoder: 요청 메시지를 세션(로그 파일) 안에서 한 번만 기록하는 델타 인코더
+- DeltaDecoder: 델타 항목의 메시지 참조를 지연 복원하는 디코더
+- LoggedMessages: 메시지 테이블을 참조하는 읽기 전용 요청 메시지 시퀀스
+- convert_log_file: 기존 전체 기록 형식(JSON lines) 로그를 델타 형식으로 변환
+
+델타 형식 항목 예:
+    {"timestamp": ..., "id": ..., "source": ..., "user_id": ...,
+     "messages": {"<id>": {"role": "human", "content": "..."}},  # 이 항목에서 처음 등장한 메시지만
+     "base": {"scope": "node", "length": 41, "replace": {"0": "<id>"}},  # 같은 (user_id, node)의 직전 델타 항목(요청+응답) 앞부분 재사용
+     "request_refs": ["<id>"],                                     # 재사용한 앞부분 뒤에 이어지는 요청 메시지
+     "response_ref": "<id>"}
+
+메시지 ID는 역할과 내용의 해시이므로 같은 메시지는 로그 파일 안에서 한 번만 기록됩니다.
+요청은 직전 요청과 응답에 새 사용자 메시지가 붙는 형태이므로, 직전 항목과 겹치는 앞부분은
+길이와 바뀐 위치(예: 갱신된 시스템 프롬프트)만 기록하여 항목 크기가 대화 길이와 무관하게 유지됩니다.
+한 턴 안에서 응답 생성과 보조 노드(맥락 추적, 정보 추출) 호출이 번갈아 기록되므로 직전 항목은 user_id와
+노드 이름 쌍으로 찾습니다. ("scope": "node"가 없는 이전 델타 로그는 user_id만으로 찾음)
+요청이 메시지 목록이 아닌 항목(체인 호출 등)은 그대로 기록합니다.
+
+인코더는 기록한 크기가 KEYFRAME_INTERVAL_BYTES를 넘을 때마다 메시지 테이블과 직전 항목을 비우고 다음 델타 항목을
+키프레임("keyframe": true)으로 기록합니다. 키프레임부터 시작하는 구간은 앞 구간을 참조하지 않으므로, 끝에서부터 읽는
+쪽(log_analysis.iter_log_file_reversed)은 파일 전체가 아니라 마지막 키프레임까지만 읽어 복원할 수 있습니다.
+
+사용법 (기존 로그 변환):
+    python -m chatbot_modules.log_format logs/
+"""
+
+import os
+import sys
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from chatbot_modules.message_store import _message_id
+
+# 로그 형식 환경 변수 ("delta" 또는 "full")
+LOG_FORMAT_ENV_VAR = "CHATBOT_LOG_FORMAT"
+DELTA_FORMAT = "delta"
+FULL_FORMAT = "full"
+
+# 직전 항목의 앞부분을 재사용할 때 허용하는 바뀐 위치 수 (시스템 프롬프트 갱신 등)
+MAX_BASE_REPLACEMENTS = 4
+
+# 키프레임 간격 (이 크기만큼 기록할 때마다 메시지 테이블과 직전 항목을 새로 시작)
+KEYFRAME_INTERVAL_BYTES = 2 * 1024 * 1024
+
+# 인코더가 직전 요청을 기억하는 (user_id, node) 수
+MAX_TRACKED_KEYS = 256
+
+def get_log_format() -> str:
+    """새 로그에 사용할 형식을 반환합니다. (기본값: 델타 형식)"""
+    value = os.getenv(LOG_FORMAT_ENV_VAR, DELTA_FORMAT).strip().lower()
+    return FULL_FORMAT if value == FULL_FORMAT else DELTA_FORMAT
+
+def _is_message(data: Any) -> bool:
+    """역할과 문자열 내용을 가진 메시지 딕셔너리인지 확인합니다."""
+    return isinstance(data, dict) and isinstance(data.get("role"), str) and isinstance(data.get("content"), str)
+
+def _base_key(entry: Dict[str, Any]) -> Tuple[str, str]:
+    """직전 항목을 찾는 키 (user_id, 노드 이름)"""
+    return entry.get("user_id", ""), entry.get("node", "")
+
+def is_delta_entry(entry: Dict[str, Any]) -> bool:
+    """델타 형식 항목인지 확인합니다."""
+    return "request_refs" in entry
+
+class LoggedMessages(Sequence):
+    """델타 로그의 메시지 테이블을 참조하는 읽기 전용 요청 메시지 시퀀스
+
+    같은 사용자의 항목들은 하나의 메시지 ID 목록(refs)을 공유하고 각자 길이와 바뀐 위치만 가지므로,
+    메모리 사용량은 항목 수가 아니라 메시지 수에 비례합니다. 메시지는 접근할 때만 테이블에서 꺼냅니다.
+    """
+
+    __slots__ = ("table", "refs", "length", "overrides")
+
+    def __init__(self, table: Dict[str, Dict[str, str]], refs: List[str], length: int,
+                 overrides: Optional[Dict[int, str]] = None):
+        """초기화"""
+        self.table = table
+        self.refs = refs
+        self.length = length
+        self.overrides = overrides or {}
+
+    def _ref(self, index: int) -> str:
+        """위치의 메시지 ID를 반환합니다."""
+        return self.overrides.get(index, self.refs[index])
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self.table[self._ref(i)] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("message index out of range")
+        return self.table[self._ref(index)]
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for i in range(self.length):
+            yield self.table[self._ref(i)]
+
+    def __reversed__(self) -> Iterator[Dict[str, str]]:
+        for i in range(self.length - 1, -1, -1):
+            yield self.table[self._ref(i)]
+
+    def ref_list(self) -> List[str]:
+        """메시지 ID 목록을 반환합니다."""
+        return [self._ref(i) for i in range(self.length)]
+
+    def to_list(self) -> List[Dict[str, str]]:
+        """전체 요청 메시지를 복원한 목록을 반환합니다."""
+        return [dict(msg) for msg in self]
+
+class DeltaEncoder:
+    """로그 파일 하나(=실행 세션)에 대해 이미 기록한 메시지와 (user_id, node)별 직전 요청을 추적하는 델타 인코더
+
+    인코딩과 기록을 하나의 잠금 안에서 수행하므로 파일에 기록되는 순서와 참조하는 직전 항목이 항상 일치하고,
+    기록에 실패한 항목의 메시지를 이후 항목이 참조하는 일이 없습니다.
+
+    Args:
+        keyframe_interval_bytes: 키프레임 간격(bytes). emit이 기록한 크기를 반환할 때만 적용됩니다.
+    """
+
+    def __init__(self, keyframe_interval_bytes: int = KEYFRAME_INTERVAL_BYTES):
+        """초기화"""
+        self.keyframe_interval_bytes = keyframe_interval_bytes
+        self._written = set()  # 현재 구간에 기록된 메시지 ID
+        self._bases = OrderedDict()  # (user_id, node)별 직전 델타 항목의 요청+응답 메시지 ID 목록
+        self._segment_bytes = 0  # 현재 구간(마지막 키프레임 이후)에 기록한 크기
+        self._lock = threading.Lock()
+
+    def write(self, entry: Dict[str, Any], emit: Callable[[Dict[str, Any]], Optional[int]]):
+        """항목을 델타 형식으로 인코딩하여 emit으로 기록합니다. (메시지 목록이 아닌 요청은 그대로 기록)
+
+        emit이 기록한 크기(bytes)를 반환하면 키프레임 간격 계산에 사용합니다.
+        """
+        with self._lock:
+            if self._segment_bytes >= self.keyframe_interval_bytes:
+                # 새 구간 시작: 다음 델타 항목은 앞 구간을 참조하지 않는 키프레임이 됨
+                self._written.clear()
+                self._bases.clear()
+                self._segment_bytes = 0
+            encoded, new_messages, base = self._encode(entry)
+            self._segment_bytes += emit(encoded) or 0
+            # 기록에 성공한 뒤에만 상태 반영
+            self._written.update(new_messages)
+            if base is not None:
+                key = _base_key(entry)
+                self._bases[key] = base
+                self._bases.move_to_end(key)
+                while len(self._bases) > MAX_TRACKED_KEYS:
+                    self._bases.popitem(last=False)
+
+    def _encode(self, entry: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, str]], Optional[List[str]]]:
+        """(인코딩한 항목, 새 메시지, 다음 항목이 재사용할 메시지 ID 목록)을 반환합니다. (잠금 보유 상태에서 호출)"""
+        request = entry.get("request")
+        response = entry.get("response")
+        if not isinstance(request, list) or not all(_is_message(msg) for msg in request):
+            return entry, {}, None
+
+        new_messages = {}
+        def _ref(msg: Dict[str, str]) -> str:
+            message_id = _message_id(msg["role"], msg["content"])
+            if message_id not in self._written and message_id not in new_messages:
+                new_messages[message_id] = {"role": msg["role"], "content": msg["content"]}
+            return message_id
+
+        refs = [_ref(msg) for msg in request]
+        encoded = {key: value for key, value in entry.items() if key not in ("request", "response")}
+        if not self._written and not self._bases:
+            encoded["keyframe"] = True
+
+        # 직전 항목과 겹치는 앞부분 찾기 (바뀐 위치는 MAX_BASE_REPLACEMENTS개까지 허용)
+        base = self._bases.get(_base_key(entry))
+        length, replace = 0, {}
+        if base:
+            limit = min(len(base), len(refs))
+            while length < limit:
+                if base[length] != refs[length]:
+                    if len(replace) >= MAX_BASE_REPLACEMENTS:
+                        break
+                    replace[length] = refs[length]
+                length += 1
+            # 끝부분이 바뀐 위치면 재사용하지 않고 새 메시지로 기록
+            while length and length - 1 in replace:
+                length -= 1
+                del replace[length]
+        if length > len(replace):
+            encoded["base"] = {"scope": "node", "length": length}
+            if replace:
+                encoded["base"]["replace"] = {str(i): ref for i, ref in replace.items()}
+        else:
+            length = 0
+
+        encoded["request_refs"] = refs[length:]
+        if _is_message(response):
+            response_ref = _ref(response)
+            encoded["response_ref"] = response_ref
+            refs.append(response_ref)
+        else:
+            encoded["response"] = response
+        if new_messages:
+            # 읽기 쉽도록 메시지 테이블을 참조 필드보다 앞에 배치
+            encoded = {**{k: v for k, v in encoded.items() if k not in ("base", "request_refs", "response_ref")},
+                       "messages": new_messages,
+                       **{k: v for k, v in encoded.items() if k in ("base", "request_refs", "response_ref")}}
+        return encoded, new_messages, refs
+
+class DeltaDecoder:
+    """로그 파일 하나를 앞에서부터 읽으면서 델타 항목의 요청/응답을 복원하는 디코더"""
+
+    def __init__(self):
+        """초기화"""
+        self.table = {}  # 메시지 테이블 (message_id: {"role", "content"})
+        self._bases = {}  # (user_id, node)별 직전 델타 항목 (공유 refs, 요청+응답 길이, 바뀐 위치)
+        self._user_bases = {}  # user_id별 직전 델타 항목 (scope 표시가 없는 이전 델타 로그용)
+
+    def decode(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """델타 항목이면 request/response를 메시지 참조로 채워 반환합니다. (그 외 항목은 그대로 반환)"""
+        if not is_delta_entry(entry):
+            return entry
+        if entry.pop("keyframe", False):
+            # 새 구간은 앞 구간의 메시지를 참조하지 않음 (이미 반환한 항목은 이전 테이블을 계속 참조)
+            self.table = {}
+            self._bases = {}
+            self._user_bases = {}
+        self.table.update(entry.pop("messages", None) or {})
+        key = _base_key(entry)
+        tail = entry.pop("request_refs")
+        base = entry.pop("base", None)
+        bases, base_key = (self._bases, key) if base and base.get("scope") == "node" else (self._user_bases, key[0])
+
+        refs, overrides, length = [], {}, 0
+        if base and base_key in bases:
+            base_refs, base_length, base_overrides = bases[base_key]
+            length = base["length"]
+            replace = {int(i): ref for i, ref in (base.get("replace") or {}).items()}
+            if length == base_length == len(base_refs):
+                # 직전 항목 전체를 재사용하면 공유 refs 뒤에 이어 붙임 (복사 없음)
+                refs = base_refs
+                overrides = {**base_overrides, **replace}
+            else:
+                refs = [replace.get(i, base_overrides.get(i, base_refs[i])) for i in range(length)]
+        refs.extend(tail)
+        length += len(tail)
+        entry["request"] = LoggedMessages(self.table, refs, length, overrides)
+
+        if "response_ref" in entry:
+            response_ref = entry.pop("response_ref")
+            entry["response"] = self.table.get(response_ref)
+            refs.append(response_ref)
+        self._bases[key] = self._user_bases[key[0]] = (refs, len(refs), overrides)
+        return entry
+
+def convert_log_file(source_path: str, target_path: str,
+                     keyframe_interval_bytes: int = KEYFRAME_INTERVAL_BYTES) -> Dict[str, int]:
+    """전체 기록 형식 로그 파일을 델타 형식으로 변환합니다.
+
+    이벤트 항목과 파싱할 수 없는 줄은 그대로 옮기고, 이미 델타 형식인 항목은 복원한 뒤 다시 인코딩합니다.
+    """
+    encoder = DeltaEncoder(keyframe_interval_bytes)
+    decoder = DeltaDecoder()
+    stats = {"lines": 0, "converted": 0, "source_bytes": 0, "target_bytes": 0}
+
+    with open(source_path, 'r', encoding='utf-8') as source, open(target_path, 'w', encoding='utf-8') as target:
+        def _emit(encoded: Dict[str, Any]) -> int:
+            if is_delta_entry(encoded):
+                stats["converted"] += 1
+            line = json.dumps(encoded, ensure_ascii=False) + "\n"
+            target.write(line)
+            return len(line.encode('utf-8'))
+
+        for line in source:
+            if not line.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                target.write(line if line.endswith("\n") else line + "\n")
+                continue
+            if not isinstance(entry, dict):
+                target.write(line if line.endswith("\n") else line + "\n")
+                continue
+
+            if is_delta_entry(entry):
+                entry = decoder.decode(entry)
+                entry["request"] = entry["request"].to_list()
+            encoder.write(entry, _emit)
+
+    stats["source_bytes"] = os.path.getsize(source_path)
+    stats["target_bytes"] = os.path.getsize(target_path)
+    return stats
+
+def _iter_log_paths(paths: List[str]) -> Iterator[str]:
+    """파일/디렉토리 경로에서 로그 파일 경로를 반환합니다."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.json'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령행 진입점"""
+    import argparse
+    from chatbot_modules.logging_utils import LOG_DIR
+
+    parser = argparse.ArgumentParser(description="기존 전체 기록 형식 로그를 델타 형식으로 변환합니다.")
+    parser.add_argument("paths", nargs="*", default=[LOG_DIR], help="로그 파일 또는 디렉토리 (기본값: logs/)")
+    parser.add_argument("--output-dir", default=None, help="변환 결과 디렉토리 (지정하지 않으면 원본 파일을 교체)")
+    parser.add_argument("--no-backup", action="store_true", help="원본 교체 시 .bak 백업을 남기지 않음")
+    args = parser.parse_args(argv)
+
+    total_source = total_target = 0
+    for source_path in _iter_log_paths(args.paths):
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            target_path = os.path.join(args.output_dir, os.path.basename(source_path))
+        else:
+            target_path = source_path + ".tmp"
+
+        try:
+            stats = convert_log_file(source_path, target_path)
+        except Exception as e:
+            print(f"로그 파일 '{source_path}' 변환 실패: {e}")
+            if not args.output_dir and os.path.exists(target_path):
+                os.remove(target_path)
+            continue
+
+        if not args.output_dir:
+            if not args.no_backup:
+                os.replace(source_path, source_path + ".bak")
+            os.replace(target_path, source_path)
+
+        total_source += stats["source_bytes"]
+        total_target += stats["target_bytes"]
+        print(f"{source_path}: {stats['lines']}줄 중 {stats['converted']}개 항목 변환, "
+              f"{stats['source_bytes']:,} → {stats['target_bytes']:,} bytes")
+
+    if total_source:
+        print(f"전체: {total_source:,} → {total_target:,} bytes ({total_target / total_source:.1%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,95 @@
 """
 로깅 관련 유틸리티 모듈
-- 로그 디렉토리 생성
-- 로거 설정
+- 로거 설정 (로그 디렉토리와 파일은 첫 기록 시 생성)
 - LLM 통신 로깅 기능
+- 로그 맥락(user_id 등) 관리
 - API 키 설정 관리
 """
 
 import os
 import json
+import time
 import logging
 import datetime
+import contextvars
 from uuid import uuid4
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 
+from chatbot_modules.log_format import DELTA_FORMAT, DeltaEncoder, get_log_format
+from chatbot_modules.metrics import log_write_seconds
+
 # .env 파일에서 환경 변수 로드
 load_dotenv()
 
 # OpenAI API 키 확인
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# 로그 디렉토리 설정
+# 로그 디렉토리 설정 (디렉토리와 파일은 첫 기록 시 생성)
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
+
+# 사용자 프로필 저장 디렉토리 설정
+PROFILE_DIR = os.path.join(os.path.dirname(LOG_DIR), "profiles")
 
 # 현재 시간을 기반으로 로그 파일 이름 생성
 current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 log_filename = os.path.join(LOG_DIR, f"llm_log_{current_time}.json")
 
-# 로그 설정
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# httpx 로거의 레벨을 WARNING으로 설정하여 INFO 로그를 숨김
-logging.getLogger("httpx").setLevel(logging.WARNING)
+class LazyFileHandler(logging.FileHandler):
+    """첫 로그 기록 시점에 로그 디렉토리와 파일을 만드는 파일 핸들러"""
+    
+    def __init__(self, filename: str, encoding: str = 'utf-8'):
+        """초기화 (파일은 열지 않음)"""
+        super().__init__(filename, encoding=encoding, delay=True)
+    
+    def _open(self):
+        """로그 디렉토리를 만든 뒤 파일을 엽니다."""
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
 logger = logging.getLogger("llm_communication")
+logger.setLevel(logging.INFO)
 
 # 콘솔 핸들러를 모두 제거
 for handler in logger.handlers:
     logger.removeHandler(handler)
 
 # 파일 핸들러 추가
-file_handler = logging.FileHandler(log_filename, encoding='utf-8')
+file_handler = LazyFileHandler(log_filename, encoding='utf-8')
 file_handler.setLevel(logging.INFO)
 formatter = logging.Formatter('%(message)s')  # 간단한 형식 (JSON만 저장)
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 logger.propagate = False  # 상위 로거로 전파하지 않음
 
+# 델타 형식 인코더 (현재 로그 파일에 이미 기록한 메시지를 추적, 전체 기록 형식이면 None)
+_delta_encoder = DeltaEncoder() if get_log_format() == DELTA_FORMAT else None
+
+def setup_logging():
+    """프로세스 전체 로깅을 설정합니다. (실행 진입점에서 한 번 호출)"""
+    logging.basicConfig(level=logging.INFO, 
+                       format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    # httpx 로거의 레벨을 WARNING으로 설정하여 INFO 로그를 숨김
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# 로그 항목에 함께 기록할 호출 맥락 정보 (예: user_id)
+_log_context = contextvars.ContextVar("llm_log_context", default={})
+
+def set_log_context(**fields) -> contextvars.Token:
+    """현재 실행 맥락의 로그 필드를 설정합니다. (None 값은 제거)"""
+    context = dict(_log_context.get())
+    for key, value in fields.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+    return _log_context.set(context)
+
+def get_log_context() -> Dict[str, Any]:
+    """현재 실행 맥락의 로그 필드를 반환합니다."""
+    return _log_context.get()
+
 def check_api_key():
     """API 키가 설정되어 있는지 확인합니다."""
     if not OPENAI_API_KEY:
@@ -58,27 +99,45 @@ def check_api_key():
         )
     return True
 
-def log_llm_communication(request_data: Any, response_data: Any, source: str) -> None:
+def _emit_log_line(entry: Dict[str, Any]) -> int:
+    """로그 항목 한 줄을 기록하고 크기(bytes)를 반환합니다. (델타 인코더의 키프레임 간격 계산용)"""
+    line = json.dumps(entry, ensure_ascii=False)
+    logger.info(line)
+    return len(line.encode('utf-8')) + 1
+
+def log_llm_communication(request_data: Any, response_data: Any, source: str,
+                          latency_ms: Optional[float] = None) -> None:
     """LLM 통신 내용을 로깅합니다.
     
+    델타 형식(기본값)에서는 요청 메시지 중 현재 로그 파일에 처음 등장한 메시지만 기록하고
+    나머지는 메시지 ID로 참조합니다. (chatbot_modules.log_format 참고)
+    
     Args:
         request_data: LLM에 전송된 요청 데이터
         response_data: LLM에서 받은 응답 데이터
         source: 로그 소스 (예: 'ChatOpenAI')
+        latency_ms: 호출 지연 시간(ms)
     """
+    started = time.perf_counter()
     try:
         log_entry = {
             "timestamp": datetime.datetime.now().isoformat(),
             "id": str(uuid4()),
             "source": source,
+            **get_log_context(),
             "request": request_data,
             "response": response_data
         }
+        if latency_ms is not None:
+            log_entry["latency_ms"] = round(latency_ms, 1)
         
         # JSON 직렬화 시도
         try:
-            log_json = json.dumps(log_entry, ensure_ascii=False)
-            logger.info(log_json)
+            if _delta_encoder is not None:
+                _delta_encoder.write(log_entry, _emit_log_line)
+            else:
+                log_json = json.dumps(log_entry, ensure_ascii=False)
+                logger.info(log_json)
             # print(f"LLM 통신 로그가 '{log_filename}'에 저장되었습니다.")
         except TypeError as e:
             # 직렬화 할 수 없는 객체가 있는 경우, 간단한 형태로 로깅
@@ -92,6 +151,46 @@ def log_llm_communication(request_data: Any, response_data: Any, source: str) ->
             # print(f"로깅 중 직렬화 오류 발생, 간소화된 로그가 저장되었습니다.")
     except Exception as e:
         print(f"로깅 시스템 오류: {e}")
+    log_write_seconds.observe(time.perf_counter() - started, ("llm",))
+
+def log_event(event_type: str, data: Dict[str, Any]) -> None:
+    """LLM 통신 이외의 런타임 이벤트(지표, 정책 결정 등)를 로깅합니다.
+    
+    이벤트 항목에는 'request'/'response' 필드가 없으므로
+    이전 로그 로딩 시 대화 로그로 취급되지 않습니다.
+    
+    Args:
+        event_type: 이벤트 종류 (예: 'enrichment_gate')
+        data: 이벤트 데이터
+    """
+    started = time.perf_counter()
+    try:
+        log_entry = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "id": str(uuid4()),
+            "event": event_type,
+            **get_log_context(),
+            "data": data
+        }
+        logger.info(json.dumps(log_entry, ensure_ascii=False, default=str))
+    except Exception as e:
+        print(f"이벤트 로깅 오류: {e}")
+    log_write_seconds.observe(time.perf_counter() - started, ("event",))
+
+def set_log_filename(filename: str) -> None:
+    """이후 로그를 기록할 파일을 바꿉니다. (프로세스마다 다른 로그 파일을 쓰는 워커 프로세스용)
+    
+    델타 형식 인코더는 새 파일 기준으로 다시 시작합니다.
+    """
+    global log_filename, _delta_encoder
+    file_handler.acquire()
+    try:
+        file_handler.close()
+        file_handler.baseFilename = os.path.abspath(filename)
+        log_filename = filename
+        _delta_encoder = DeltaEncoder() if get_log_format() == DELTA_FORMAT else None
+    finally:
+        file_handler.release()
 
 def get_log_filename() -> str:
     """현재 로그 파일 이름을 반환합니다."""
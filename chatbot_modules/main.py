@@ -1,43 +1,75 @@
 """
 메인 실행 모듈
 - 그래프 설정
+- 이전 대화 분석 (동기 또는 백그라운드 워밍업)
 - 챗봇 실행
 """
 
+import os
+import time
 import datetime
-from typing import Dict, Any
+import threading
+import contextvars
+from typing import TYPE_CHECKING, Dict, Any, Optional
 
-from langgraph.graph import Graph, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
-
-from chatbot_modules.models import FRIEND_PERSONA
-from chatbot_modules.logging_utils import get_log_filename, check_api_key
+from chatbot_modules.models import EnrichmentGateConfig, MemoryIndexConfig
+from chatbot_modules.logging_utils import LOG_DIR, get_log_filename, check_api_key, set_log_context, setup_logging, log_event
 from chatbot_modules.state_management import user_state
-from chatbot_modules.log_analysis import load_previous_logs, analyze_previous_logs
-from chatbot_modules.graph_nodes import (
-    manage_messages,
-    extract_user_information,
-    track_conversation_context,
-    generate_response
+from chatbot_modules.log_analysis import (
+    load_previous_logs, analyze_previous_logs, iter_log_file, extract_conversation_turn, _list_log_files
 )
+from chatbot_modules.turn_gating import EnrichmentGate, enrichment_gate
+from chatbot_modules.message_store import message_store
+from chatbot_modules.metrics import start_metrics_export, timed_node, turn_seconds
+
+if TYPE_CHECKING:
+    from langgraph.graph import Graph
+    from chatbot_modules.memory_index import MemoryStore
 
 # State 타입 정의
 State = Dict[str, Any]
 
-def create_persona_chatbot() -> Graph:
-    """페르소나 챗봇 그래프를 생성합니다."""
+# 시작 시 분석할 최근 로그 항목 수 (분석/요약은 최근 대화 100줄/50줄만 사용)
+PREVIOUS_LOG_TAIL_ENTRIES = 100
+
+def create_persona_chatbot(gate_config: Optional[EnrichmentGateConfig] = None) -> "Graph":
+    """페르소나 챗봇 그래프를 생성합니다.
+    
+    Args:
+        gate_config: 보조 노드 게이트 설정 (없으면 전역 게이트 사용)
+    """
+    # LangGraph와 노드(LangChain/OpenAI) 의존성은 그래프를 만들 때 로드
+    from langgraph.graph import StateGraph
+    from langgraph.checkpoint.memory import MemorySaver
+    from chatbot_modules.graph_nodes import (
+        manage_messages,
+        extract_user_information,
+        track_conversation_context,
+        generate_response
+    )
+    from chatbot_modules.chains import chain_registry
+    
+    gate = EnrichmentGate(gate_config) if gate_config else enrichment_gate
+    
+    # 보조 노드와 로그 분석 체인을 미리 만들어 모든 턴과 사용자가 공유
+    chain_registry.build()
     
     # 상태 그래프 생성
     graph = StateGraph(State)
     
-    # 노드 추가
-    graph.add_node("manage_messages", manage_messages)
-    graph.add_node("extract_user_information", extract_user_information)
-    graph.add_node("track_conversation_context", track_conversation_context)
-    graph.add_node("generate_response", generate_response)
+    # 노드 추가 (노드별 처리 시간은 chatbot_node_seconds 지표에 기록)
+    graph.add_node("manage_messages", timed_node("manage_messages", manage_messages))
+    graph.add_node("extract_user_information", timed_node("extract_user_information", extract_user_information))
+    graph.add_node("track_conversation_context", timed_node("track_conversation_context", track_conversation_context))
+    graph.add_node("generate_response", timed_node("generate_response", generate_response))
     
     # 엣지 추가
-    graph.add_edge("manage_messages", "extract_user_information")
+    # 사소한 턴이면 보조 노드를 건너뛰고 바로 응답 생성
+    graph.add_conditional_edges(
+        "manage_messages",
+        gate,
+        {"enrich": "extract_user_information", "skip": "generate_response"}
+    )
     graph.add_edge("extract_user_information", "track_conversation_context")
     graph.add_edge("track_conversation_context", "generate_response")
     
@@ -51,80 +83,273 @@ def create_persona_chatbot() -> Graph:
     # 체크포인터 설정
     return graph.compile(checkpointer=memory)
 
-def run_chatbot():
-    """챗봇을 실행합니다."""
+def _merge_previous_analysis(user_id: str, analysis_result: Dict[str, Any], keep_existing: bool = False):
+    """이전 로그 분석 결과를 사용자 상태에 병합합니다.
+    
+    Args:
+        user_id: 사용자 ID
+        analysis_result: analyze_previous_logs의 결과
+        keep_existing: True면 대화 중에 이미 알게 된 단일 값 정보(이름, 현재 맥락 등)를 덮어쓰지 않음
+    """
+    if analysis_result.get('user_information'):
+        user_info = dict(analysis_result['user_information'])
+        if keep_existing:
+            current_info = user_state.get_user_information(user_id)
+            for key in list(user_info.keys()):
+                if not isinstance(user_info[key], (list, dict)) and current_info.get(key):
+                    del user_info[key]
+        user_state.update_user_information(user_id, user_info)
+        
+    if analysis_result.get('conversation_context'):
+        context = dict(analysis_result['conversation_context'])
+        if keep_existing and user_state.get_conversation_context(user_id).get('current_context'):
+            context.pop('current_context', None)
+        user_state.update_conversation_context(user_id, context)
+
+def _update_memory_store(store: "MemoryStore", config: MemoryIndexConfig) -> int:
+    """지난 실행 이후 새로 생기거나 늘어난 로그 파일의 턴을 user_id별로 임베딩해 저장소에 추가하고 추가한 턴 수를 반환합니다.
+    
+    로그 파일은 끝에만 추가되므로, 늘어난 파일은 이미 인덱싱한 항목 수만큼 건너뛰고 그 뒤의 턴만 읽습니다.
+    현재 실행의 로그 파일은 대화 중에 인덱스에 추가되므로 읽지 않습니다.
+    """
+    from chatbot_modules.memory_index import long_term_memory
+    
+    manifest = store.load_manifest(config)
+    current_log = get_log_filename()
+    current_log = os.path.abspath(current_log) if current_log else None
+    pending = {}  # 사용자별 새 턴 (user_id: [(사용자 메시지, 챗봇 메시지)])
+    for file_path in _list_log_files(LOG_DIR):
+        if os.path.abspath(file_path) == current_log:
+            continue
+        name = os.path.basename(file_path)
+        size = os.path.getsize(file_path)
+        seen = manifest["files"].get(name, {})
+        if seen.get("size") == size:
+            continue
+        entries = 0
+        for log_entry in iter_log_file(file_path):
+            entries += 1
+            if entries <= seen.get("entries", 0):
+                continue
+            turn = extract_conversation_turn(log_entry)
+            if turn and turn['request'][0]['content']:
+                pending.setdefault(log_entry.get('user_id') or "", []).append(
+                    (turn['request'][0]['content'], turn['response']['content'] or ""))
+        manifest["files"][name] = {"size": size, "entries": entries}
+        
+    added = 0
+    for owner, turns in pending.items():
+        store.append(owner, long_term_memory.embed_turns(turns), turns)
+        added += len(turns)
+    store.save_manifest(manifest)
+    return added
+
+def index_previous_turns(user_id: str, verbose: bool = True, other_users: Optional[bool] = None) -> int:
+    """이전 로그의 대화 턴을 사용자의 장기 기억 인덱스에 추가하고 추가한 턴 수를 반환합니다.
+    
+    LLM 분석은 최근 로그만 사용하지만, 인덱스에는 로컬 임베딩으로 과거 턴을 넣어
+    오래된 대화도 현재 메시지와 관련 있으면 다시 떠올릴 수 있게 합니다.
+    임베딩한 턴은 user_id별로 장기 기억 저장소에 보관하므로, 시작할 때는 새로 기록된 로그만 임베딩하고
+    나머지는 저장된 벡터를 그대로 불러옵니다. 인덱스에는 같은 user_id의 턴만 넣고, 다른 사용자와
+    user_id가 없는 이전 형식 로그의 턴은 index_other_users 설정을 켠 경우에만 넣습니다.
+    
+    Args:
+        user_id: 사용자 ID
+        verbose: True면 추가한 턴 수를 출력
+        other_users: 다른 사용자의 턴도 넣을지 여부 (없으면 index_other_users 설정을 따름)
+    """
+    # NumPy는 인덱싱할 때 로드
+    from chatbot_modules.memory_index import MEMORY_DIR, MemoryStore, long_term_memory
+    
+    config = long_term_memory.config
+    if not config.enabled or not config.index_previous_logs:
+        return 0
+        
+    started = time.perf_counter()
+    store = MemoryStore(config.store_dir or MEMORY_DIR)
+    new_turns = _update_memory_store(store, config)
+    
+    if other_users is None:
+        other_users = config.index_other_users
+    indexed = 0
+    if other_users:
+        stored = store.iter_all()
+    else:
+        stored = [(user_id, *store.load(user_id))]
+    for _, vectors, turns in stored:
+        long_term_memory.add_vectors(user_id, vectors, turns)
+        indexed += len(turns)
+        
+    log_event("memory_index", {
+        "user_id": user_id,
+        "indexed_turns": indexed,
+        "new_turns": new_turns,
+        "other_users": other_users,
+        "index_ms": round((time.perf_counter() - started) * 1000, 1)
+    })
+    if verbose and indexed:
+        print(f"과거 대화 {indexed}턴을 장기 기억 인덱스에 추가했습니다.")
+    return indexed
+
+def load_previous_context(user_id: str, verbose: bool = True, other_users: Optional[bool] = None) -> Dict[str, Any]:
+    """이전 로그를 로드·분석하여 사용자 상태와 장기 기억 인덱스를 초기화하고 분석 결과를 반환합니다.
+    
+    other_users는 장기 기억 인덱스에 다른 사용자의 턴도 넣을지 여부입니다. (index_previous_turns 참고)
+    """
+    try:
+        index_previous_turns(user_id, verbose=verbose, other_users=other_users)
+    except Exception as e:
+        print(f"과거 대화 인덱싱 중 오류 발생: {e}")
+        
+    previous_logs = load_previous_logs(user_id, max_entries=PREVIOUS_LOG_TAIL_ENTRIES, verbose=verbose)
+    if not previous_logs:
+        if verbose:
+            print("이전 대화 기록이 없습니다.")
+        return {}
+        
+    analysis_result = analyze_previous_logs(previous_logs)
+    _merge_previous_analysis(user_id, analysis_result, keep_existing=not verbose)
     
-    # API 키 확인
+    if verbose:
+        # 사용자 정보 출력
+        if 'user_information' in analysis_result:
+            print(f"사용자 정보 {len(analysis_result['user_information'].keys())}개 항목 로드 완료")
+            
+        # 대화 맥락 정보 출력
+        context = analysis_result.get('conversation_context', {})
+        if context.get('current_context'):
+            print("이전 대화 맥락 로드 완료")
+        if context.get('main_topics'):
+            print(f"주요 주제 {len(context['main_topics'])}개 로드 완료")
+            
+        print("이전 대화 기록 분석이 완료되었습니다.")
+        
+    return analysis_result
+
+def _warm_up_in_background(user_id: str, started_at: float, other_users: Optional[bool] = None) -> threading.Thread:
+    """이전 로그 분석을 백그라운드 스레드에서 실행합니다.
+    
+    분석이 끝나기 전에 시작된 턴은 그때까지의 (부분) 사용자 상태로 처리되고,
+    분석 결과는 준비되는 즉시 사용자 상태에 병합됩니다.
+    """
+    def _run():
+        warmup_started = time.perf_counter()
+        try:
+            analysis_result = load_previous_context(user_id, verbose=False, other_users=other_users)
+            log_event("startup_warmup", {
+                "user_id": user_id,
+                "status": "completed",
+                "loaded": bool(analysis_result),
+                "warmup_ms": round((time.perf_counter() - warmup_started) * 1000, 1),
+                "ready_after_start_ms": round((time.perf_counter() - started_at) * 1000, 1)
+            })
+        except Exception as e:
+            print(f"이전 대화 기록 분석 중 오류 발생: {e}")
+            log_event("startup_warmup", {"user_id": user_id, "status": "failed", "error": str(e)})
+    
+    # 백그라운드 스레드에서도 로그에 사용자 ID가 기록되도록 현재 맥락을 복사하여 실행
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(_run,), name="previous-log-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def run_chatbot(warmup: bool = True, persona_id: Optional[str] = None):
+    """챗봇을 실행합니다.
+    
+    Args:
+        warmup: True면 이전 대화 분석을 백그라운드에서 실행하고 곧바로 대화를 시작
+        persona_id: 대화할 페르소나 ID (없으면 기본 친구 페르소나, personas 모듈 참고)
+    """
+    from chatbot_modules.personas import graph_cache, persona_registry
+    
+    started_at = time.perf_counter()
+    
+    # 로깅 설정 및 API 키 확인
+    setup_logging()
     check_api_key()
     
-    # 그래프 생성
-    chatbot = create_persona_chatbot()
+    # 지표 엔드포인트/스냅샷 파일 (CHATBOT_METRICS_PORT, CHATBOT_METRICS_SNAPSHOT이 설정된 경우)
+    exporter = start_metrics_export()
+    if exporter is not None and exporter.address:
+        print(f"지표 엔드포인트: http://{exporter.address[0]}:{exporter.address[1]}/metrics")
+    
+    # 그래프 생성 (페르소나별 그래프는 컴파일된 그래프 하나를 공유)
+    persona = persona_registry.get(persona_id)
+    chatbot = graph_cache.get(persona_id)
     
     # 초기 상태 설정 및 사용자 ID 생성
     user_id = f"user_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
     thread_id = f"thread_{user_id}"
-    state = {"messages": [], "user_id": user_id}
+    state = {"user_id": user_id, "conversation_id": thread_id, "message_count": 0}
+    
+    # LLM 통신 로그에 사용자 ID와 페르소나 ID 기록
+    set_log_context(user_id=user_id, persona_id=chatbot.persona_id)
     
-    print("친구 AI 챗봇이 시작되었습니다.")
+    print(f"{persona['name']} AI 챗봇이 시작되었습니다.")
     print(f"LLM 통신 로그가 '{get_log_filename()}'에 저장됩니다.")
-    print("이전 대화 기록을 로딩하고 분석 중입니다...")
     
     # 이전 로그 로드 및 분석
-    previous_logs = load_previous_logs(user_id)
-    if previous_logs:
-        analysis_result = analyze_previous_logs(previous_logs)
-        
-        # 사용자 정보 초기화
-        if 'user_information' in analysis_result:
-            user_info = analysis_result['user_information']
-            user_state.update_user_information(user_id, user_info)
-            print(f"사용자 정보 {len(user_info.keys())}개 항목 로드 완료")
-            
-        # 대화 맥락 초기화
-        if 'conversation_context' in analysis_result:
-            context = analysis_result['conversation_context']
-            user_state.update_conversation_context(user_id, context)
-            
-            # 대화 맥락 정보 출력
-            if context.get('current_context'):
-                print("이전 대화 맥락 로드 완료")
-                
-            if context.get('main_topics'):
-                print(f"주요 주제 {len(context['main_topics'])}개 로드 완료")
-                
-        print("이전 대화 기록 분석이 완료되었습니다.")
+    # (CLI는 실행마다 사용자 ID가 새로 만들어지는 한 사람용 로컬 실행이므로 이전 실행의 턴도 장기 기억에 넣음)
+    warmup_thread = None
+    if warmup:
+        print("이전 대화 기록은 대화하는 동안 백그라운드에서 분석합니다.")
+        warmup_thread = _warm_up_in_background(user_id, started_at, other_users=True)
     else:
-        print("이전 대화 기록이 없습니다.")
+        print("이전 대화 기록을 로딩하고 분석 중입니다...")
+        load_previous_context(user_id, other_users=True)
     
     print("종료하려면 'exit' 또는 'quit'를 입력하세요.")
     print("-" * 50)
     
     # 초기 인사말
-    print(f"{FRIEND_PERSONA['name']}: {FRIEND_PERSONA['greeting']}")
+    print(f"{persona['name']}: {persona['greeting']}")
+    
+    # 첫 입력을 받을 수 있게 되기까지 걸린 시간 기록
+    log_event("startup", {
+        "user_id": user_id,
+        "warmup": warmup,
+        "time_to_first_interaction_ms": round((time.perf_counter() - started_at) * 1000, 1)
+    })
     
+    turn_count = 0
     while True:
         # 사용자 입력 받기
         user_input = input("\n사용자: ")
         
         # 종료 명령 확인
         if user_input.lower() in ["exit", "quit", "종료"]:
-            print(f"\n{FRIEND_PERSONA['name']}: 대화를 종료합니다. 다음에 또 만나요!")
+            print(f"\n{persona['name']}: 대화를 종료합니다. 다음에 또 만나요!")
             break
         
-        # 사용자 메시지 추가
-        state["messages"].append({"role": "user", "content": user_input})
+        # 백그라운드 분석이 끝나기 전에 시작된 턴 수 기록
+        turn_count += 1
+        if warmup_thread is not None and warmup_thread.is_alive():
+            log_event("startup_warmup", {"user_id": user_id, "status": "pending", "turn": turn_count})
+        
+        # 사용자 메시지를 메시지 저장소에 추가 (그래프 상태에는 메시지 수만 기록)
+        message_store.append(thread_id, "user", user_input)
+        state["message_count"] = message_store.count(thread_id)
         
         # 챗봇 실행
+        turn_started = time.perf_counter()
         result = chatbot.invoke(state, {"configurable": {"thread_id": thread_id}})
+        turn_seconds.observe(time.perf_counter() - turn_started)
         
         # 응답 출력
         if "response" in result:
-            print(f"\n{FRIEND_PERSONA['name']}: {result['response']}")
+            print(f"\n{persona['name']}: {result['response']}")
         else:
-            print(f"\n{FRIEND_PERSONA['name']}: 죄송합니다. 응답을 생성하는 데 문제가 발생했습니다.")
+            print(f"\n{persona['name']}: 죄송합니다. 응답을 생성하는 데 문제가 발생했습니다.")
         
         # 상태 업데이트
         state = result
+    
+    # 종료 전에 아직 분석하지 않은 턴의 사용자 정보 추출
+    from chatbot_modules.graph_nodes import flush_user_information
+    flush_user_information(user_id, message_store.view(thread_id))
+    
+    if exporter is not None:
+        exporter.stop()
 
 if __name__ == "__main__":
     # 챗봇 실행
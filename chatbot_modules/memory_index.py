@@ -0,0 +1,347 @@
+"""
+장기 기억 인덱스 모듈
+- embed_texts: 글자 n-gram 해싱 기반 로컬 임베딩 함수 (네트워크 불필요)
+- MemoryIndex: 대화 턴 벡터를 저장하고 top-k 유사도 검색을 수행하는 NumPy 인덱스
+- LongTermMemory: 사용자별 인덱스를 관리하는 클래스
+- MemoryStore: 이전 로그에서 만든 사용자별 벡터와 턴을 파일로 저장하는 클래스
+
+임베딩은 정규화한 텍스트의 글자 n-gram을 해시하여 고정 차원 벡터에 부호와 함께 누적한 뒤
+L2 정규화하므로, 두 벡터의 내적이 곧 코사인 유사도입니다. 벡터는 용량을 두 배씩 늘리는
+float32 행렬에 추가되고, 검색은 행렬 곱 한 번과 argpartition으로 수행됩니다.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chatbot_modules.models import MemoryIndexConfig
+from chatbot_modules.logging_utils import PROFILE_DIR
+from chatbot_modules.profile_store import user_file_stem
+
+# 이전 로그에서 만든 사용자별 인덱스 저장 디렉토리
+MEMORY_DIR = os.path.join(PROFILE_DIR, "memory")
+
+# n-gram 해시 계산용 상수 (64비트 FNV-1a 소수와 splitmix64 마무리 상수)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_SEPARATOR = "\x00"
+
+def _normalize(text: str) -> str:
+    """소문자로 바꾸고 연속 공백을 하나로 합칩니다."""
+    return " ".join(text.lower().replace(_SEPARATOR, " ").split())
+
+def embed_texts(texts: Sequence[str], dim: int = 512, ngram_sizes: Sequence[int] = (2,)) -> np.ndarray:
+    """텍스트 목록을 (len(texts), dim) 크기의 L2 정규화된 float32 행렬로 임베딩합니다.
+
+    모든 텍스트를 하나의 코드 포인트 배열로 이어 붙인 뒤 n-gram 해시를 벡터 연산으로 계산하므로
+    파이썬 반복은 텍스트 수가 아니라 n-gram 크기 수만큼만 일어납니다.
+    """
+    count = len(texts)
+    if count == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    # 텍스트 사이에 구분자를 넣어 이어 붙임 (각 텍스트 앞뒤 공백은 단어 경계 n-gram용)
+    normalized = [f" {_normalize(text)} " for text in texts]
+    joined = _SEPARATOR.join(normalized) + _SEPARATOR
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    rows = np.repeat(np.arange(count, dtype=np.int64), [len(text) + 1 for text in normalized])
+    separators = np.concatenate(([0], np.cumsum(codes == 0)))
+
+    flat_indices, signs = [], []
+    with np.errstate(over="ignore"):
+        for size in ngram_sizes:
+            windows = len(codes) - size + 1
+            if windows <= 0:
+                continue
+            # 구분자를 포함하지 않는 n-gram만 사용
+            valid = separators[size:size + windows] - separators[:windows] == 0
+            hashes = np.full(windows, np.uint64(size), dtype=np.uint64)
+            for offset in range(size):
+                hashes = (hashes ^ codes[offset:offset + windows]) * _FNV_PRIME
+            hashes ^= hashes >> np.uint64(33)
+            hashes *= _MIX_1
+            hashes ^= hashes >> np.uint64(33)
+            hashes *= _MIX_2
+            hashes ^= hashes >> np.uint64(33)
+            hashes = hashes[valid]
+
+            flat_indices.append(rows[:windows][valid] * dim + (hashes % np.uint64(dim)).astype(np.int64))
+            signs.append(np.where(hashes >> np.uint64(63), -1.0, 1.0))
+
+    if not flat_indices:
+        return np.zeros((count, dim), dtype=np.float32)
+    vectors = np.bincount(np.concatenate(flat_indices), weights=np.concatenate(signs),
+                          minlength=count * dim).reshape(count, dim).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+class MemoryIndex:
+    """대화 턴 벡터를 저장하고 검색하는 인덱스 (사용자 한 명 분량)
+
+    턴은 (사용자 메시지, 챗봇 메시지)로 저장하고, 검색 시 현재 대화(conversation_id)에서
+    나온 턴은 이미 프롬프트에 있으므로 제외할 수 있습니다.
+    """
+
+    def __init__(self, dim: int = 512, initial_capacity: int = 16):
+        """초기화"""
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._conversations = np.zeros(initial_capacity, dtype=np.int32)  # 턴별 대화 코드 (0: 대화 정보 없음)
+        self._conversation_codes = {}  # 대화 코드 (conversation_id: int)
+        self._turns = []  # (사용자 메시지, 챗봇 메시지)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _conversation_code(self, conversation_id: Optional[str]) -> int:
+        """대화 ID의 코드를 반환합니다. (잠금 보유 상태에서 호출)"""
+        if conversation_id is None:
+            return 0
+        return self._conversation_codes.setdefault(conversation_id, len(self._conversation_codes) + 1)
+
+    def add(self, vectors: np.ndarray, turns: List[Tuple[str, str]], conversation_id: Optional[str] = None):
+        """임베딩한 턴들을 인덱스 끝에 추가합니다. (용량이 부족하면 두 배로 늘림)"""
+        with self._lock:
+            needed = self._size + len(turns)
+            if needed > len(self._vectors):
+                capacity = max(needed, len(self._vectors) * 2)
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                grown_conversations = np.zeros(capacity, dtype=np.int32)
+                grown_conversations[:self._size] = self._conversations[:self._size]
+                self._vectors, self._conversations = grown, grown_conversations
+
+            self._vectors[self._size:needed] = vectors
+            self._conversations[self._size:needed] = self._conversation_code(conversation_id)
+            self._turns.extend(turns)
+            self._size = needed
+
+    def search(self, queries: np.ndarray, k: int, min_score: float = 0.0,
+               exclude_conversation: Optional[str] = None) -> List[List[Tuple[float, Tuple[str, str]]]]:
+        """질의 벡터(m, dim)마다 유사도가 높은 턴 k개를 (점수, 턴) 목록으로 반환합니다."""
+        with self._lock:
+            # 용량을 늘릴 때는 새 배열을 만들므로 잠금 밖에서도 이 구간은 바뀌지 않음
+            size = self._size
+            vectors = self._vectors[:size]
+            conversations = self._conversations[:size]
+            turns = self._turns
+            excluded = self._conversation_codes.get(exclude_conversation) if exclude_conversation else None
+
+        if size == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ vectors.T
+        if excluded is not None:
+            scores[:, conversations == excluded] = -np.inf
+
+        k = min(k, size)
+        if k < size:
+            top = np.argpartition(scores, size - k, axis=1)[:, size - k:]
+        else:
+            top = np.broadcast_to(np.arange(size), (len(queries), size))
+
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(float(scores[row, i]), turns[i]) for i in ordered if scores[row, i] >= min_score])
+        return results
+
+    def nbytes(self) -> int:
+        """벡터 저장에 할당된 메모리(바이트)를 반환합니다."""
+        return self._vectors.nbytes + self._conversations.nbytes
+
+class LongTermMemory:
+    """사용자별 장기 기억 인덱스를 관리하는 클래스"""
+
+    def __init__(self, config: Optional[MemoryIndexConfig] = None):
+        """초기화"""
+        self.config = config or MemoryIndexConfig()
+        self._indexes = {}  # 사용자별 인덱스 (user_id: MemoryIndex)
+        self._lock = threading.Lock()
+
+    def configure(self, config: MemoryIndexConfig):
+        """설정을 교체합니다. (임베딩 차원이 바뀌므로 기존 인덱스는 비움)"""
+        with self._lock:
+            self.config = config
+            self._indexes.clear()
+
+    def _index(self, user_id: str) -> MemoryIndex:
+        """사용자 인덱스를 반환합니다. (없으면 생성)"""
+        with self._lock:
+            if user_id not in self._indexes:
+                self._indexes[user_id] = MemoryIndex(self.config.dim, self.config.initial_capacity)
+            return self._indexes[user_id]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """현재 설정으로 텍스트를 임베딩합니다."""
+        return embed_texts(texts, self.config.dim, self.config.ngram_sizes)
+
+    def embed_turns(self, turns: List[Tuple[str, str]]) -> np.ndarray:
+        """턴들의 사용자 메시지를 index_batch_size개씩 나누어 임베딩합니다."""
+        batch_size = max(1, self.config.index_batch_size)
+        chunks = [
+            self.embed([user_text for user_text, _ in turns[start:start + batch_size]])
+            for start in range(0, len(turns), batch_size)
+        ]
+        return np.concatenate(chunks) if chunks else np.zeros((0, self.config.dim), dtype=np.float32)
+
+    def add_vectors(self, user_id: str, vectors: np.ndarray, turns: List[Tuple[str, str]],
+                    conversation_id: Optional[str] = None):
+        """이미 임베딩한 턴들을 추가합니다. (저장소에서 불러온 인덱스용)"""
+        if not self.config.enabled or not turns:
+            return
+        self._index(user_id).add(vectors, turns, conversation_id)
+
+    def add_turns(self, user_id: str, turns: List[Tuple[str, str]], conversation_id: Optional[str] = None):
+        """(사용자 메시지, 챗봇 메시지) 턴들을 한 번에 임베딩하여 추가합니다.
+        
+        질의(현재 사용자 메시지)와 같은 종류의 텍스트끼리 비교하도록 사용자 메시지만 임베딩합니다.
+        """
+        turns = [(user_text, assistant_text or "") for user_text, assistant_text in turns if user_text]
+        if not self.config.enabled or not turns:
+            return
+        vectors = self.embed([user_text for user_text, _ in turns])
+        self._index(user_id).add(vectors, turns, conversation_id)
+
+    def add_turn(self, user_id: str, user_text: str, assistant_text: str, conversation_id: Optional[str] = None):
+        """대화 턴 하나를 추가합니다."""
+        self.add_turns(user_id, [(user_text, assistant_text)], conversation_id)
+
+    def search_many(self, user_id: str, queries: Sequence[str], k: Optional[int] = None,
+                    exclude_conversation: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """여러 질의를 한 번에 검색하여 질의별 관련 턴 목록을 반환합니다."""
+        index = self._indexes.get(user_id)
+        if not self.config.enabled or index is None or len(index) == 0 or not queries:
+            return [[] for _ in queries]
+        results = index.search(self.embed(queries), k or self.config.top_k, self.config.min_score, exclude_conversation)
+        return [
+            [{"user": user_text, "assistant": assistant_text, "score": round(score, 3)}
+             for score, (user_text, assistant_text) in matches]
+            for matches in results
+        ]
+
+    def recall(self, user_id: str, query: str, exclude_conversation: Optional[str] = None) -> List[Dict[str, Any]]:
+        """현재 메시지와 관련된 과거 턴을 프롬프트에 넣기 좋은 길이로 잘라 반환합니다."""
+        if not query:
+            return []
+        limit = self.config.max_chars_per_turn
+        return [
+            {"user": match["user"][:limit], "assistant": match["assistant"][:limit], "score": match["score"]}
+            for match in self.search_many(user_id, [query], exclude_conversation=exclude_conversation)[0]
+        ]
+
+    def size(self, user_id: str) -> int:
+        """사용자 인덱스에 저장된 턴 수를 반환합니다."""
+        index = self._indexes.get(user_id)
+        return len(index) if index is not None else 0
+
+class MemoryStore:
+    """이전 로그에서 만든 사용자별 장기 기억 인덱스를 파일로 저장하는 클래스
+
+    - manifest.json: 임베딩 설정과 이미 인덱싱한 로그 파일별 크기·항목 수
+    - <사용자>.npz: 사용자별 벡터와 턴 (user_id가 없는 이전 형식 로그의 턴은 빈 user_id로 저장)
+
+    시작할 때마다 전체 로그를 다시 임베딩하지 않도록, 새로 생기거나 늘어난 로그 파일의 턴만 임베딩해 추가합니다.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, base_dir: str = MEMORY_DIR):
+        """초기화"""
+        self.base_dir = base_dir
+
+    def _path(self, user_id: str) -> str:
+        """사용자 ID에 해당하는 인덱스 파일 경로를 반환합니다. (프로필 파일과 같은 이름 규칙)"""
+        return os.path.join(self.base_dir, f"{user_file_stem(user_id)}.npz")
+
+    def _index_paths(self) -> List[str]:
+        """저장된 사용자별 인덱스 파일 경로를 반환합니다."""
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(os.path.join(self.base_dir, f) for f in os.listdir(self.base_dir) if f.endswith(".npz"))
+
+    @staticmethod
+    def _embedding(config: MemoryIndexConfig) -> Dict[str, Any]:
+        """저장된 벡터를 그대로 쓸 수 있는지 확인할 임베딩 설정"""
+        return {"dim": config.dim, "ngram_sizes": list(config.ngram_sizes)}
+
+    def load_manifest(self, config: MemoryIndexConfig) -> Dict[str, Any]:
+        """인덱싱한 로그 파일 목록을 반환합니다.
+
+        임베딩 설정이 바뀌었으면 저장된 벡터를 쓸 수 없으므로 인덱스 파일을 지우고 빈 목록으로 다시 시작합니다.
+        """
+        path = os.path.join(self.base_dir, self.MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                print(f"장기 기억 목록 파일 '{path}' 읽기 실패: {e}")
+        if manifest.get("embedding") != self._embedding(config):
+            for index_path in self._index_paths():
+                os.remove(index_path)
+            manifest = {"embedding": self._embedding(config), "files": {}}
+        return manifest
+
+    def save_manifest(self, manifest: Dict[str, Any]):
+        """인덱싱한 로그 파일 목록을 원자적으로 저장합니다."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = os.path.join(self.base_dir, self.MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str) -> Tuple[str, np.ndarray, List[Tuple[str, str]]]:
+        """인덱스 파일 하나를 (user_id, 벡터, 턴)으로 읽습니다."""
+        with np.load(path, allow_pickle=False) as data:
+            user_id = str(data["user_id"])
+            vectors = data["vectors"]
+            turns = [tuple(turn) for turn in json.loads(data["turns"].tobytes().decode("utf-8"))]
+        return user_id, vectors, turns
+
+    def load(self, user_id: str) -> Tuple[np.ndarray, List[Tuple[str, str]]]:
+        """사용자의 저장된 벡터와 턴을 반환합니다. 없으면 빈 값을 반환합니다."""
+        path = self._path(user_id)
+        if os.path.exists(path):
+            try:
+                _, vectors, turns = self._read(path)
+                return vectors, turns
+            except Exception as e:
+                print(f"장기 기억 파일 '{path}' 읽기 실패: {e}")
+        return np.zeros((0, 0), dtype=np.float32), []
+
+    def iter_all(self) -> Iterator[Tuple[str, np.ndarray, List[Tuple[str, str]]]]:
+        """저장된 모든 사용자의 (user_id, 벡터, 턴)을 반환합니다."""
+        for path in self._index_paths():
+            try:
+                yield self._read(path)
+            except Exception as e:
+                print(f"장기 기억 파일 '{path}' 읽기 실패: {e}")
+
+    def append(self, user_id: str, vectors: np.ndarray, turns: List[Tuple[str, str]]):
+        """사용자 인덱스 파일 끝에 턴들을 추가하여 원자적으로 저장합니다."""
+        if not turns:
+            return
+        stored_vectors, stored_turns = self.load(user_id)
+        if stored_turns:
+            vectors = np.concatenate([stored_vectors, vectors])
+            turns = stored_turns + list(turns)
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(user_id)
+        tmp_path = f"{path}.tmp"
+        encoded_turns = np.frombuffer(json.dumps(turns, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, user_id=np.array(user_id), vectors=vectors.astype(np.float32, copy=False), turns=encoded_turns)
+        os.replace(tmp_path, path)
+
+# 전역 장기 기억 객체
+long_term_memory = LongTermMemory()
@@ -0,0 +1,182 @@
+"""
+메시지 저장소 모듈
+- MessageStore: 대화 메시지를 한 번만 저장하고 ID로 참조하는 공유 저장소
+- MessageView: 대화의 일부 구간을 복사 없이 참조하는 읽기 전용 시퀀스
+- get_state_messages: 그래프 상태에서 대화 메시지를 꺼내는 함수
+
+그래프 상태, 체크포인트, UserState는 메시지 본문 대신 대화 ID와 메시지 수만 가지고,
+LangChain 메시지 객체는 LLM 호출 직전에만 만들어집니다.
+"""
+
+import sys
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+def _message_id(role: str, content: str) -> str:
+    """역할과 내용으로 메시지 ID(내용 주소)를 계산합니다."""
+    digest = hashlib.blake2b(f"{role}\0{content}".encode("utf-8"), digest_size=8).hexdigest()
+    return sys.intern(digest)
+
+class MessageView(Sequence):
+    """대화의 [start, end) 구간을 참조하는 읽기 전용 메시지 시퀀스
+
+    인덱싱하면 {"role", "content"} 딕셔너리를 그때그때 만들어 반환합니다.
+    """
+
+    __slots__ = ("store", "conversation_id", "start", "end")
+
+    def __init__(self, store: "MessageStore", conversation_id: str, start: int, end: int):
+        """초기화"""
+        self.store = store
+        self.conversation_id = conversation_id
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, index: Union[int, slice]):
+        ids = self.store.conversation_ids(self.conversation_id)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return [self.store.get(ids[self.start + i]) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self.store.get(ids[self.start + index])
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        ids = self.store.conversation_ids(self.conversation_id)
+        for i in range(self.start, self.end):
+            yield self.store.get(ids[i])
+
+    def __reversed__(self) -> Iterator[Dict[str, str]]:
+        ids = self.store.conversation_ids(self.conversation_id)
+        for i in range(self.end - 1, self.start - 1, -1):
+            yield self.store.get(ids[i])
+
+    def ids(self) -> List[str]:
+        """구간의 메시지 ID 목록을 반환합니다."""
+        return self.store.conversation_ids(self.conversation_id)[self.start:self.end]
+
+    def to_langchain(self) -> List[Any]:
+        """LangChain 메시지 객체 목록을 만들어 반환합니다. (LLM 호출 직전에만 사용)"""
+        from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+        message_classes = {"user": HumanMessage, "assistant": AIMessage, "system": SystemMessage}
+        return [message_classes.get(msg["role"], HumanMessage)(content=msg["content"]) for msg in self]
+
+class MessageStore:
+    """내용 주소 기반으로 메시지를 한 번만 저장하는 공유 저장소
+
+    - 메시지 레코드: ID → (역할, 내용) 튜플 (같은 역할/내용은 하나의 레코드를 공유)
+    - 대화 로그: 대화 ID → 메시지 ID 목록 (순서 보존)
+    - 참조 횟수: 대화를 삭제하면 더 이상 참조되지 않는 레코드도 삭제
+    """
+
+    def __init__(self):
+        """초기화"""
+        self._records = {}  # 메시지 레코드 (message_id: (role, content))
+        self._refcounts = {}  # 레코드 참조 횟수 (message_id: int)
+        self._conversations = {}  # 대화 로그 (conversation_id: List[message_id])
+        self._lock = threading.Lock()
+
+    def _intern_locked(self, message_id: str, role: str, content: str, refs: int = 1):
+        """레코드를 저장(없으면 생성)하고 참조 횟수를 refs만큼 늘립니다. (잠금 보유 상태에서 호출)
+
+        레코드 생성과 참조 증가를 한 번의 잠금 안에서 하므로, 다른 스레드가 같은 내용의 대화를 삭제하면서
+        참조 횟수가 0인 새 레코드를 지우는 일이 없습니다.
+        """
+        if message_id in self._records:
+            self._refcounts[message_id] += refs
+        else:
+            self._records[message_id] = (role, content)
+            self._refcounts[message_id] = refs
+
+    def append(self, conversation_id: str, role: str, content: str) -> str:
+        """대화에 메시지를 추가하고 ID를 반환합니다."""
+        role = sys.intern(role)
+        message_id = _message_id(role, content)
+        with self._lock:
+            self._intern_locked(message_id, role, content)
+            self._conversations.setdefault(conversation_id, []).append(message_id)
+        return message_id
+
+    def replace_conversation(self, conversation_id: str, messages: Sequence[Any]) -> int:
+        """메시지 목록(딕셔너리 또는 LangChain 메시지)으로 대화를 다시 구성하고 메시지 수를 반환합니다."""
+        new_records = []  # (message_id, role, content)
+        for msg in messages:
+            if isinstance(msg, dict):
+                role, content = msg.get("role"), msg.get("content", "")
+            else:
+                role, content = getattr(msg, "type", "assistant"), getattr(msg, "content", "")
+                role = {"human": "user", "ai": "assistant"}.get(role, role)
+            if role == "system":
+                continue
+            role = sys.intern(role)
+            new_records.append((_message_id(role, content), role, content))
+
+        new_ids = [message_id for message_id, _, _ in new_records]
+        with self._lock:
+            # 새 참조를 먼저 늘린 뒤 기존 참조를 해제 (두 목록에 모두 있는 레코드가 삭제되지 않도록)
+            for message_id, role, content in new_records:
+                self._intern_locked(message_id, role, content)
+            self._release(self._conversations.get(conversation_id, []))
+            self._conversations[conversation_id] = new_ids
+        return len(new_ids)
+
+    def _release(self, message_ids: List[str]):
+        """레코드 참조를 해제하고 참조가 없는 레코드를 삭제합니다. (잠금 보유 상태에서 호출)"""
+        for message_id in message_ids:
+            self._refcounts[message_id] -= 1
+            if self._refcounts[message_id] <= 0:
+                del self._refcounts[message_id]
+                del self._records[message_id]
+
+    def drop_conversation(self, conversation_id: str):
+        """대화를 삭제합니다."""
+        with self._lock:
+            self._release(self._conversations.pop(conversation_id, []))
+
+    def get(self, message_id: str) -> Dict[str, str]:
+        """메시지를 {"role", "content"} 딕셔너리로 반환합니다."""
+        role, content = self._records[message_id]
+        return {"role": role, "content": content}
+
+    def conversation_ids(self, conversation_id: str) -> List[str]:
+        """대화의 메시지 ID 목록(내부 목록)을 반환합니다. 수정하지 마세요."""
+        return self._conversations.get(conversation_id, [])
+
+    def count(self, conversation_id: str) -> int:
+        """대화의 메시지 수를 반환합니다."""
+        return len(self._conversations.get(conversation_id, ()))
+
+    def view(self, conversation_id: str, start: int = 0, end: Optional[int] = None) -> MessageView:
+        """대화 구간에 대한 뷰를 반환합니다."""
+        if end is None:
+            end = self.count(conversation_id)
+        return MessageView(self, conversation_id, start, end)
+
+    def stats(self) -> Dict[str, int]:
+        """저장소 크기 통계를 반환합니다."""
+        with self._lock:
+            return {
+                "records": len(self._records),
+                "conversations": len(self._conversations),
+                "references": sum(len(ids) for ids in self._conversations.values()),
+                "content_chars": sum(len(content) for _, content in self._records.values())
+            }
+
+# 전역 메시지 저장소 객체
+message_store = MessageStore()
+
+def get_state_messages(state: Dict[str, Any]) -> Sequence[Any]:
+    """그래프 상태의 대화 메시지를 반환합니다.
+    
+    대화 ID가 있으면 저장소의 [0, message_count) 구간 뷰를, 없으면 상태의 messages 목록을 반환합니다.
+    """
+    if "conversation_id" in state:
+        return message_store.view(state["conversation_id"], 0, state.get("message_count"))
+    return state.get("messages", [])
@@ -0,0 +1,484 @@
+"""
+런타임 지표 모듈
+- MetricsRegistry: 카운터/게이지/히스토그램을 이름별로 관리하는 프로세스 내 지표 레지스트리
+- Counter / Gauge / Histogram: 레이블 값 튜플별로 값을 누적하는 지표 (기록 한 번에 수 μs 이하)
+- MetricsExporter: Prometheus 텍스트 HTTP 엔드포인트(/metrics)와 주기적 스냅샷 JSON 파일
+- start_metrics_export: 설정(환경 변수)에 따라 내보내기를 시작하는 함수
+
+기록 경로는 잠금 한 번과 딕셔너리 갱신만 하며, 사용자 상태 크기나 스케줄러 대기열 길이처럼
+매번 계산하면 비싼 값은 수집기(register_collector)로 등록하여 엔드포인트/스냅샷을 만들 때만 계산합니다.
+
+환경 변수 CHATBOT_METRICS_PORT로 HTTP 포트를, CHATBOT_METRICS_SNAPSHOT으로 스냅샷 파일 경로를 지정합니다.
+    CHATBOT_METRICS_PORT=9464 python run_chatbot.py
+    curl http://127.0.0.1:9464/metrics
+"""
+
+import os
+import json
+import time
+import bisect
+import datetime
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    # 기록 경로(logging_utils 등)의 import 시간에 pydantic이 포함되지 않도록 설정 모델은 내보낼 때 로드
+    from chatbot_modules.models import MetricsConfig
+
+# HTTP 엔드포인트 포트 환경 변수
+METRICS_PORT_ENV_VAR = "CHATBOT_METRICS_PORT"
+
+# 스냅샷 파일 경로 환경 변수
+METRICS_SNAPSHOT_ENV_VAR = "CHATBOT_METRICS_SNAPSHOT"
+
+# 지연 시간 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 토큰 수 히스토그램 버킷
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+Labels = Tuple[str, ...]
+
+def _escape(value: Any) -> str:
+    """Prometheus 레이블 값을 이스케이프합니다."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_number(value: float) -> str:
+    """Prometheus 텍스트 형식의 숫자 표기"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    """레이블 값 튜플별로 값을 보관하는 지표의 공통 부분"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        """초기화"""
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # 레이블 값 튜플별 값
+        self._lock = threading.Lock()
+
+    def _label_text(self, labels: Labels, extra: str = "") -> str:
+        """레이블 값 튜플을 {name="value",...} 문자열로 만듭니다."""
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _items(self) -> List[Tuple[Labels, Any]]:
+        """레이블 값 튜플과 값의 사본"""
+        with self._lock:
+            return [(labels, list(value) if isinstance(value, list) else value) for labels, value in self._values.items()]
+
+    def clear(self):
+        """모든 값을 지웁니다."""
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    """증가만 하는 누적 카운터"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, labels: Labels = ()):
+        """카운터를 amount만큼 증가시킵니다."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        """현재 값을 반환합니다."""
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        """Prometheus 텍스트 형식의 값 줄"""
+        return [f"{self.name}{self._label_text(labels)} {_format_number(value)}" for labels, value in self._items()]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """스냅샷 값 목록"""
+        return [{"labels": dict(zip(self.labelnames, labels)), "value": value} for labels, value in self._items()]
+
+class Gauge(Counter):
+    """현재 값을 그대로 기록하는 게이지"""
+
+    type = "gauge"
+
+    def set(self, value: float, labels: Labels = ()):
+        """게이지 값을 설정합니다."""
+        with self._lock:
+            self._values[labels] = value
+
+    def replace(self, values: Dict[Labels, float]):
+        """모든 레이블 값을 한 번에 교체합니다. (수집기가 사라진 레이블을 지울 때 사용)"""
+        with self._lock:
+            self._values = dict(values)
+
+class Histogram(_Metric):
+    """버킷별 관측 수와 합계를 누적하는 히스토그램"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        """초기화"""
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()):
+        """값 하나를 기록합니다. (value 이상인 첫 버킷에 넣고 누적은 내보낼 때 계산)"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [버킷별 관측 수 ... +Inf 버킷 관측 수, 합계]
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, labels: Labels = ()) -> Iterator[None]:
+        """블록 실행 시간(초)을 기록하는 컨텍스트 관리자"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, labels)
+
+    def _cumulative(self, state: List[float]) -> List[Tuple[float, int]]:
+        """(버킷 상한, 누적 관측 수) 목록"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def render(self) -> List[str]:
+        """Prometheus 텍스트 형식의 값 줄 (_bucket, _sum, _count)"""
+        lines = []
+        for labels, state in self._items():
+            cumulative = self._cumulative(state)
+            for bound, total in cumulative:
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {total}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_format_number(state[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative[-1][1]}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """스냅샷 값 목록 (관측 수, 합계, 누적 버킷)"""
+        result = []
+        for labels, state in self._items():
+            cumulative = self._cumulative(state)
+            result.append({
+                "labels": dict(zip(self.labelnames, labels)),
+                "count": cumulative[-1][1],
+                "sum": round(state[-1], 6),
+                "buckets": {_format_number(bound): total for bound, total in cumulative}
+            })
+        return result
+
+class MetricsRegistry:
+    """이름별 지표와 내보낼 때 실행할 수집기를 관리하는 레지스트리"""
+
+    def __init__(self):
+        """초기화"""
+        self._metrics = {}  # 이름별 지표 (name: _Metric)
+        self._collectors = []  # 내보내기 직전에 게이지를 갱신하는 함수
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help: str, labelnames: Sequence[str], **kwargs) -> Any:
+        """같은 이름의 지표가 있으면 반환하고, 없으면 만듭니다."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"지표 '{name}'가 다른 종류나 레이블로 이미 등록되어 있습니다.")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """카운터를 등록(또는 조회)합니다."""
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """게이지를 등록(또는 조회)합니다."""
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """히스토그램을 등록(또는 조회)합니다."""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def register_collector(self, collector: Callable[[], None]):
+        """내보내기 직전에 호출할 수집기를 등록합니다."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self):
+        """수집기를 실행하여 게이지를 갱신합니다. (실패한 수집기는 건너뜀)"""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"지표 수집 오류 ({getattr(collector, '__name__', collector)}): {e}")
+
+    def metrics(self) -> List[_Metric]:
+        """등록된 지표 목록 (이름 순)"""
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def render_prometheus(self) -> str:
+        """Prometheus 텍스트 형식(0.0.4)으로 모든 지표를 반환합니다."""
+        self.collect()
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """모든 지표의 현재 값을 JSON으로 직렬화할 수 있는 딕셔너리로 반환합니다."""
+        self.collect()
+        return {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "metrics": {metric.name: {"type": metric.type, "help": metric.help, "values": metric.snapshot()}
+                        for metric in self.metrics()}
+        }
+
+    def reset(self):
+        """모든 지표 값을 지웁니다. (측정 스크립트용)"""
+        for metric in self.metrics():
+            metric.clear()
+
+# 전역 지표 레지스트리
+metrics = MetricsRegistry()
+
+# 핫 패스 지표
+turn_seconds = metrics.histogram("chatbot_turn_seconds", "대화 턴 하나(그래프 실행 전체)의 처리 시간(초)")
+node_seconds = metrics.histogram("chatbot_node_seconds", "그래프 노드별 처리 시간(초)", ["node"])
+llm_call_seconds = metrics.histogram("chatbot_llm_call_seconds", "LLM 호출 시도별 지연 시간(초)",
+                                     ["node", "model", "outcome"])
+llm_tokens = metrics.counter("chatbot_llm_tokens_total", "LLM 호출 토큰 수 (응답의 사용량 정보 기준)",
+                             ["node", "model", "kind"])
+llm_prompt_tokens = metrics.histogram("chatbot_llm_prompt_tokens", "LLM 호출당 요청 토큰 수", ["node"],
+                                      buckets=TOKEN_BUCKETS)
+cache_lookups = metrics.counter("chatbot_cache_lookups_total", "캐시 조회 수 (hit/miss)", ["cache", "result"])
+log_write_seconds = metrics.histogram("chatbot_log_write_seconds", "로그 항목 하나를 직렬화하여 기록하는 시간(초)",
+                                      ["kind"])
+
+def record_cache(cache: str, hit: bool):
+    """캐시 조회 결과를 기록합니다."""
+    cache_lookups.inc(1.0, (cache, "hit" if hit else "miss"))
+
+def timed_node(name: str, node: Callable[..., Any]) -> Callable[..., Any]:
+    """노드 함수의 처리 시간을 chatbot_node_seconds에 기록하는 래퍼를 반환합니다.
+
+    시그니처는 원래 함수를 따르므로(functools.wraps) LangGraph가 config 인자를 그대로 넘깁니다.
+    """
+    labels = (name,)
+
+    @wraps(node)
+    def _timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return node(*args, **kwargs)
+        finally:
+            node_seconds.observe(time.perf_counter() - started, labels)
+
+    return _timed
+
+# ----- 수집기 (내보낼 때만 계산) -----
+
+_user_state_entries = metrics.gauge("chatbot_user_state_entries", "UserState에 보관 중인 사용자 수", ["field"])
+_user_state_items = metrics.gauge("chatbot_user_state_items", "UserState 사용자 정보/대화 맥락의 항목 수 합계", ["field"])
+_message_store_size = metrics.gauge("chatbot_message_store_size", "메시지 저장소 크기", ["kind"])
+_llm_queue_depth = metrics.gauge("chatbot_llm_queue_depth", "LLM 작업 스케줄러의 등급별 대기 작업 수", ["priority"])
+_llm_running = metrics.gauge("chatbot_llm_running", "실행 중인 LLM 호출 수")
+_llm_admissions = metrics.gauge("chatbot_llm_scheduler_events", "LLM 작업 스케줄러의 등급별 누적 입장/버림 수",
+                                ["priority", "event"])
+
+def _collect_user_state():
+    """UserState와 메시지 저장소 크기"""
+    from chatbot_modules.state_management import user_state
+    from chatbot_modules.message_store import message_store
+
+    with user_state._lock:
+        fields = {
+            "conversation_history": user_state.conversation_history,
+            "user_information": user_state.user_information,
+            "conversation_contexts": user_state.conversation_contexts
+        }
+        _user_state_entries.replace({(field,): len(values) for field, values in fields.items()})
+        _user_state_items.replace({
+            (field,): sum(len(value) if isinstance(value, (list, dict)) else int(bool(value))
+                          for entry in fields[field].values() for value in entry.values())
+            for field in ("user_information", "conversation_contexts")
+        })
+    _message_store_size.replace({(kind,): value for kind, value in message_store.stats().items()})
+
+def _collect_llm_scheduler():
+    """LLM 작업 스케줄러 대기열 길이와 입장/버림 수"""
+    from chatbot_modules.llm_scheduler import llm_scheduler
+
+    stats = llm_scheduler.stats()
+    _llm_running.set(stats["running"])
+    _llm_queue_depth.replace({(priority,): values["queue_depth"] for priority, values in stats["priorities"].items()})
+    _llm_admissions.replace({
+        (priority, event): value
+        for priority, values in stats["priorities"].items()
+        for event, value in values.items()
+        if event not in ("queue_depth", "waiting_users") and not event.startswith("wait_")
+    })
+
+metrics.register_collector(_collect_user_state)
+metrics.register_collector(_collect_llm_scheduler)
+
+# ----- 내보내기 -----
+
+def load_metrics_config() -> "MetricsConfig":
+    """환경 변수에서 지표 내보내기 설정을 읽습니다. (설정이 없으면 내보내지 않음)"""
+    from chatbot_modules.models import MetricsConfig
+
+    port = os.getenv(METRICS_PORT_ENV_VAR)
+    try:
+        return MetricsConfig(port=int(port) if port else None, snapshot_path=os.getenv(METRICS_SNAPSHOT_ENV_VAR) or None)
+    except ValueError as e:
+        print(f"지표 포트 '{port}'를 읽지 못해 HTTP 엔드포인트를 열지 않습니다: {e}")
+        return MetricsConfig(snapshot_path=os.getenv(METRICS_SNAPSHOT_ENV_VAR) or None)
+
+class MetricsExporter:
+    """지표 레지스트리를 HTTP 엔드포인트와 스냅샷 파일로 내보내는 클래스
+
+    Args:
+        config: 내보내기 설정
+        registry: 내보낼 지표 레지스트리
+        instance: 스냅샷에 기록할 인스턴스 이름 (예: 워커 ID)
+    """
+
+    def __init__(self, config: "MetricsConfig", registry: Optional[MetricsRegistry] = None,
+                 instance: Optional[str] = None):
+        """초기화"""
+        self.config = config
+        self.registry = registry or metrics
+        self.instance = instance
+        self.server = None
+        self._stop = threading.Event()
+        self._snapshot_thread = None
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        """HTTP 엔드포인트 주소 (열지 않았으면 None)"""
+        return self.server.server_address[:2] if self.server else None
+
+    def start(self) -> "MetricsExporter":
+        """설정된 HTTP 엔드포인트와 스냅샷 스레드를 시작합니다."""
+        if self.config.port is not None:
+            self._start_server()
+        if self.config.snapshot_path:
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="metrics-snapshot", daemon=True)
+            self._snapshot_thread.start()
+        return self
+
+    def _start_server(self):
+        """Prometheus 텍스트 형식 HTTP 엔드포인트를 데몬 스레드에서 엽니다."""
+        # HTTP 서버는 엔드포인트를 열 때 로드
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path.split("?")[0] == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 요청마다 표준 오류에 접근 로그를 남기지 않음
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.config.host, self.config.port), _Handler)
+        except OSError as e:
+            print(f"지표 엔드포인트 {self.config.host}:{self.config.port}를 열지 못했습니다: {e}")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def write_snapshot(self) -> Optional[str]:
+        """스냅샷 파일을 기록합니다. (임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완전한 파일을 봄)"""
+        path = self.config.snapshot_path
+        if not path:
+            return None
+        snapshot = self.registry.snapshot()
+        if self.instance:
+            snapshot["instance"] = self.instance
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"지표 스냅샷 기록 오류: {e}")
+            return None
+        return path
+
+    def _snapshot_loop(self):
+        """스냅샷 파일을 주기적으로 다시 씁니다."""
+        while not self._stop.wait(self.config.snapshot_interval_seconds):
+            self.write_snapshot()
+
+    def stop(self):
+        """엔드포인트와 스냅샷 스레드를 멈추고 마지막 스냅샷을 기록합니다."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join(timeout=5)
+            self.write_snapshot()
+
+def start_metrics_export(config: Optional["MetricsConfig"] = None, instance: Optional[str] = None,
+                         port_offset: int = 0) -> Optional[MetricsExporter]:
+    """지표 내보내기를 시작합니다. 포트와 스냅샷 경로가 모두 없으면 None을 반환합니다.
+
+    Args:
+        config: 내보내기 설정 (없으면 환경 변수에서 읽음)
+        instance: 인스턴스 이름. 주면 스냅샷 파일 이름에 붙여 프로세스마다 다른 파일을 씀
+        port_offset: 설정 포트에 더할 값 (워커 프로세스마다 다른 포트를 쓸 때 사용)
+    """
+    from chatbot_modules.models import MetricsConfig
+
+    config = config or load_metrics_config()
+    if config.port is None and not config.snapshot_path:
+        return None
+    updates = {}
+    if config.port is not None and port_offset:
+        updates["port"] = config.port + port_offset
+    if config.snapshot_path and instance:
+        base, ext = os.path.splitext(config.snapshot_path)
+        updates["snapshot_path"] = f"{base}_{instance}{ext or '.json'}"
+    if updates:
+        config = MetricsConfig(**{**config.dict(), **updates})
+    return MetricsExporter(config, instance=instance).start()
@@ -0,0 +1,113 @@
+"""
+모델 라우터 모듈
+- ModelRouter: 노드/호출 지점별로 모델, 최대 토큰 수, 마감 시간을 결정하는 클래스
+- load_router_config: JSON 설정 파일에서 라우터 설정을 읽는 함수
+
+설정 파일 경로는 환경 변수 CHATBOT_MODEL_ROUTES로 지정합니다. 예:
+    {
+      "routes": {
+        "generate_response": {"model": "gpt-4o", "max_tokens": 512},
+        "extract_user_information": {"model": "gpt-4o-mini", "max_tokens": 256, "timeout": 5},
+        "track_conversation_context": {"model": "gpt-4o-mini", "candidates": ["gpt-3.5-turbo"]}
+      },
+      "dynamic": true
+    }
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from chatbot_modules.models import ModelRoute, ModelRouterConfig
+from chatbot_modules.logging_utils import log_event
+from chatbot_modules.call_stats import CallStats, call_stats
+
+# 라우터 설정 파일 경로 환경 변수
+ROUTES_ENV_VAR = "CHATBOT_MODEL_ROUTES"
+
+def load_router_config(path: Optional[str] = None) -> ModelRouterConfig:
+    """JSON 설정 파일에서 라우터 설정을 읽습니다. 파일이 없으면 기본 설정(라우팅 없음)을 반환합니다."""
+    path = path or os.getenv(ROUTES_ENV_VAR)
+    if not path:
+        return ModelRouterConfig()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return ModelRouterConfig(**json.load(f))
+    except Exception as e:
+        print(f"모델 라우터 설정 '{path}' 읽기 실패, 기본 모델을 사용합니다: {e}")
+        return ModelRouterConfig()
+
+class ModelRouter:
+    """호출 지점별 모델 경로를 결정하는 라우터
+
+    설정이 없는 호출 지점은 호출 정책의 기본 모델을 그대로 사용합니다.
+    동적 선택을 켜면 경로의 모델과 후보 모델 중에서 오류율이 허용 범위인 모델 가운데
+    최근 지연 시간이 가장 짧은 모델을 고릅니다.
+    """
+
+    def __init__(self, config: Optional[ModelRouterConfig] = None, stats: Optional[CallStats] = None):
+        """초기화"""
+        self.config = config or load_router_config()
+        self.stats = stats or call_stats
+        self._last_choice = {}  # 호출 지점별 마지막으로 선택한 모델 (선택 변경 로깅용)
+        self._lock = threading.Lock()
+
+    def configure(self, config: ModelRouterConfig):
+        """라우터 설정을 교체합니다."""
+        with self._lock:
+            self.config = config
+            self._last_choice.clear()
+
+    def _is_healthy(self, model: str) -> bool:
+        """최근 오류율이 허용 범위인지 반환합니다. 기록이 부족하면 정상으로 간주합니다."""
+        if self.stats.count(model) < self.config.min_samples:
+            return True
+        return self.stats.error_rate(model) <= self.config.max_error_rate
+
+    def _choose_dynamic(self, candidates: list) -> str:
+        """후보 중 정상이고 지연 시간이 가장 짧은 모델을 고릅니다."""
+        healthy = [model for model in candidates if self._is_healthy(model)]
+        if not healthy:
+            return candidates[0]
+
+        measured = []
+        for model in healthy:
+            if self.stats.count(model) >= self.config.min_samples:
+                latency = self.stats.percentile(model, self.config.latency_quantile)
+                if latency is not None:
+                    measured.append((latency, model))
+
+        # 설정된 모델이 정상이고 아직 통계가 부족하면 그대로 사용
+        if healthy[0] == candidates[0] and self.stats.count(candidates[0]) < self.config.min_samples:
+            return candidates[0]
+        if measured:
+            return min(measured)[1]
+        return healthy[0]
+
+    def select(self, call_site: str, default_model: str) -> Dict[str, Any]:
+        """호출 지점의 모델, 최대 토큰 수, 마감 시간을 반환합니다."""
+        route = self.config.routes.get(call_site, ModelRoute())
+        model = route.model or default_model
+
+        if self.config.dynamic and route.candidates:
+            candidates = [model] + [c for c in route.candidates if c != model]
+            chosen = self._choose_dynamic(candidates)
+            with self._lock:
+                previous = self._last_choice.get(call_site)
+                self._last_choice[call_site] = chosen
+            if previous is not None and previous != chosen:
+                log_event("model_router", {
+                    "call_site": call_site,
+                    "decision": "switch_model",
+                    "from": previous,
+                    "to": chosen,
+                    "stats": {m: {"p95": self.stats.percentile(m, self.config.latency_quantile),
+                                  "error_rate": round(self.stats.error_rate(m), 3)} for m in candidates}
+                })
+            model = chosen
+
+        return {"model": model, "max_tokens": route.max_tokens, "timeout": route.timeout}
+
+# 전역 모델 라우터 객체
+model_router = ModelRouter()
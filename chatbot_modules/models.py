@@ -3,6 +3,12 @@
 - Persona: 챗봇 페르소나 정의
 - ConversationContext: 대화 맥락 모델
 - UserInformation: 사용자 정보 모델
+- EnrichmentGateConfig: 보조 노드 게이트 설정
+- ExtractionSchedulerConfig: 사용자 정보 추출 스케줄러 설정
+- EnrichmentBatchConfig: 여러 사용자의 보조 노드 호출 묶음 설정
+- CallPolicyConfig: LLM 호출 정책 설정
+- ModelRoute, ModelRouterConfig: 노드/호출 지점별 모델 라우팅 설정
+- MetricsConfig: 런타임 지표 내보내기 설정
 """
 
 from typing import Dict, List, Optional, TypedDict
@@ -25,6 +31,17 @@ class ConversationContext(BaseModel):
     references: Dict[str, str] = Field(default_factory=dict, description="대화 중 언급된 참조 정보(예: 웹사이트, 책 등)")
     last_update_time: str = Field("", description="마지막으로 맥락이 업데이트된 시간")
 
+# 대화 맥락 크기 제한 설정
+class ContextLimitsConfig(BaseModel):
+    """시스템 프롬프트에 들어가는 대화 맥락 필드의 최대 크기와 만료 설정"""
+    max_topics: int = Field(5, description="유지할 최대 주요 주제 수 (최근 언급 순)")
+    max_pending_questions: int = Field(5, description="유지할 최대 미답변 질문 수 (초과 시 오래된 질문부터 제거)")
+    max_references: int = Field(10, description="유지할 최대 참조 정보 수 (초과 시 가장 오래 언급되지 않은 항목부터 제거)")
+    question_ttl_turns: int = Field(10, description="이 턴 수가 지나도록 답변되지 않은 질문은 제거")
+    reference_ttl_turns: int = Field(20, description="이 턴 수 동안 다시 언급되지 않은 참조 정보는 제거")
+    answered_overlap: float = Field(0.3, description="응답이 질문의 글자 bigram을 이 비율 이상 포함하면 답변된 것으로 보고 제거")
+    log_every: int = Field(1, description="맥락 크기 지표를 로깅하는 간격 (턴 수, 0이면 로깅 안 함)")
+
 # 사용자 정보 모델
 class UserInformation(BaseModel):
     """사용자 정보를 저장하는 모델"""
@@ -38,6 +55,148 @@ class UserInformation(BaseModel):
     family: Dict[str, str] = Field(default_factory=dict, description="사용자의 가족 정보 (관계: 이름)")
     contact_info: Optional[str] = Field(None, description="사용자의 연락처 정보")
 
+# 보조 노드(정보 추출/맥락 추적) 실행 여부를 판단하는 게이트 설정
+class EnrichmentGateConfig(BaseModel):
+    """사소한 턴에서 보조 LLM 호출을 건너뛰기 위한 로컬 분류기 설정"""
+    enabled: bool = Field(True, description="게이트 사용 여부 (False면 항상 보조 노드 실행)")
+    min_chars: int = Field(6, description="공백을 제외한 최소 글자 수 (미만이면 질문이나 개인 정보(나이/이사/결혼 등)가 아닌 한 건너뜀)")
+    min_novelty: float = Field(0.35, description="최근 사용자 메시지 대비 새로운 글자 bigram 비율의 최소값")
+    novelty_window: int = Field(5, description="새로움 계산에 사용할 최근 사용자 메시지 수")
+    trivial_phrases: List[str] = Field(
+        default_factory=lambda: [
+            "안녕", "안녕하세요", "하이", "ㅎㅇ", "hi", "hello", "hey",
+            "응", "어", "네", "예", "아니", "아니요", "ㅇㅇ", "ㄴㄴ", "ok", "okay", "오케이", "오키",
+            "그래", "그렇구나", "좋아", "알겠어", "고마워", "감사합니다", "ㄱㅅ", "맞아", "헐", "대박"
+        ],
+        description="그 자체로는 학습할 내용이 없는 인사/맞장구 표현"
+    )
+    question_keywords: List[str] = Field(
+        default_factory=lambda: ["뭐", "무엇", "어떻게", "왜", "언제", "어디", "누구", "몇", "어때", "할까"],
+        description="질문으로 간주할 키워드"
+    )
+    log_every: int = Field(1, description="건너뛰기 비율을 로깅하는 판정 간격 (턴 수)")
+
+# 사용자 정보 추출 스케줄러 설정
+class ExtractionSchedulerConfig(BaseModel):
+    """사용자 정보 추출 호출을 모아서 보내기 위한 스케줄러 설정"""
+    max_batch_tokens: int = Field(300, description="미분석 턴의 추정 토큰 수가 이 값 이상이면 추출 실행")
+    min_novel_bigrams: int = Field(60, description="이미 분석한 내용에 없는 새 글자 bigram 수가 이 값 이상이면 추출 실행")
+    max_pending_turns: int = Field(8, description="미분석 사용자 턴이 이 값 이상이면 추출 실행")
+    idle_seconds: float = Field(120.0, description="마지막 미분석 턴 이후 이 시간(초)이 지나면 세션이 유휴 상태로 보고 추출 실행")
+    max_send_tokens: int = Field(1200, description="한 번의 추출 호출에 보낼 최대 추정 토큰 수 (넘는 턴은 다음 추출 호출로 넘김)")
+    budget_calls: int = Field(20, description="budget_window_seconds 동안 사용자별로 허용되는 최대 추출 호출 수")
+    budget_window_seconds: float = Field(3600.0, description="추출 예산 집계 구간(초)")
+    max_known_bigrams: int = Field(20000, description="새로움 계산을 위해 기억하는 사용자별 bigram 최대 개수")
+
+# 보조 노드 호출 묶음 설정
+class EnrichmentBatchConfig(BaseModel):
+    """여러 사용자의 맥락 추적/정보 추출 호출을 짧은 구간 동안 모아 한 번의 요청으로 보내기 위한 설정
+
+    묶음은 LLM 요청 수(속도 제한 압력)를 줄이지만 턴 지연 시간은 줄이지 않습니다. 업스트림 동시 처리 한도가 없으면
+    묶음 대기 시간과 더 긴 묶음 응답 때문에 턴 p50이 오히려 늘 수 있습니다 (스텁 모델 8명 x 3턴: 189 → 251 ms).
+    """
+    enabled: bool = Field(True, description="묶음 사용 여부 (False면 사용자마다 따로 호출). 요청 수는 줄지만 속도 제한이 없으면 턴 지연 시간이 늘 수 있음")
+    max_batch_size: int = Field(8, description="한 요청에 넣을 최대 사용자 작업 수")
+    window_ms: float = Field(20.0, description="첫 작업이 들어온 뒤 다른 사용자의 작업을 기다리는 최대 시간(ms)")
+    max_batch_tokens: int = Field(4000, description="묶음 입력의 추정 토큰 수가 이 값 이상이면 기다리지 않고 보냄")
+    active_user_seconds: float = Field(5.0, description="이 시간(초) 안에 다른 사용자의 같은 종류 작업이 없었으면 기다리지 않고 바로 보냄")
+
+# LLM 호출 정책 설정
+class CallPolicyConfig(BaseModel):
+    """노드별 마감 시간, 재시도, 헤지 요청, 서킷 브레이커 설정"""
+    primary_model: str = Field("gpt-3.5-turbo", description="기본 모델")
+    fallback_model: str = Field("gpt-4o-mini", description="서킷 브레이커가 열렸을 때 사용할 더 빠른 대체 모델")
+    node_deadlines: Dict[str, float] = Field(
+        default_factory=lambda: {
+            "generate_response": 20.0,
+            "track_conversation_context": 8.0,
+            "extract_user_information": 8.0,
+            "analyze_previous_logs": 60.0,
+            "summarize_previous_conversations": 60.0,
+        },
+        description="노드별 호출 마감 시간(초)"
+    )
+    default_deadline: float = Field(15.0, description="노드별 설정이 없을 때의 마감 시간(초)")
+    turn_budget_seconds: float = Field(25.0, description="한 턴 전체의 LLM 호출 시간 예산(초)")
+    response_reserve_seconds: float = Field(10.0, description="응답 생성을 위해 남겨둘 시간(초). 남은 예산이 이보다 적으면 보조 노드를 건너뜀")
+    max_retries: int = Field(2, description="실패 시 최대 재시도 횟수")
+    retry_base_delay: float = Field(0.5, description="재시도 기본 대기 시간(초, 지수 증가 + 지터)")
+    retry_max_delay: float = Field(4.0, description="재시도 최대 대기 시간(초)")
+    hedge_enabled: bool = Field(True, description="헤지 요청 사용 여부")
+    hedge_quantile: float = Field(0.95, description="헤지 요청을 보내기까지 기다릴 지연 시간 분위수")
+    hedge_min_samples: int = Field(20, description="헤지 지연 시간을 계산하기 위한 최소 호출 기록 수")
+    hedge_min_delay: float = Field(0.5, description="헤지 요청 전 최소 대기 시간(초)")
+    breaker_failure_threshold: int = Field(5, description="서킷 브레이커를 여는 연속 실패 횟수")
+    breaker_cooldown_seconds: float = Field(30.0, description="서킷 브레이커가 열린 뒤 기본 모델을 다시 시도하기까지의 시간(초)")
+
+# LLM 작업 스케줄러 설정
+class LLMSchedulerConfig(BaseModel):
+    """프로세스 전체 LLM 호출의 동시 실행 수, 토큰 속도 제한, 우선순위별 부하 차단 설정"""
+    enabled: bool = Field(True, description="스케줄러 사용 여부 (False면 모든 호출을 바로 실행)")
+    max_concurrency: int = Field(8, description="동시에 실행할 최대 LLM 호출 수")
+    tokens_per_minute: int = Field(90000, description="분당 최대 토큰 수 (요청 추정 토큰 + 최대 응답 토큰 기준, 0이면 제한 없음)")
+    expected_completion_tokens: int = Field(300, description="max_tokens가 없는 호출의 응답 토큰 추정치")
+    node_priorities: Dict[str, str] = Field(
+        default_factory=lambda: {
+            "generate_response": "interactive",
+            "track_conversation_context": "enrichment",
+            "extract_user_information": "enrichment",
+            "analyze_previous_logs": "backfill",
+            "summarize_previous_conversations": "backfill",
+        },
+        description="노드별 우선순위 등급 (interactive > enrichment > backfill)"
+    )
+    default_priority: str = Field("enrichment", description="노드 정보가 없는 호출의 우선순위 등급")
+    max_queue_depth: Dict[str, int] = Field(
+        default_factory=lambda: {"enrichment": 16, "backfill": 64},
+        description="등급별 최대 대기열 길이. 넘으면 새 작업을 버림 (interactive는 버리지 않음)"
+    )
+    max_wait_seconds: Dict[str, float] = Field(
+        default_factory=lambda: {"enrichment": 5.0},
+        description="등급별 최대 대기 시간(초). 넘도록 시작하지 못한 작업은 버림 (설정이 없으면 상위 등급이 빌 때까지 미룸)"
+    )
+    stats_log_interval_seconds: float = Field(60.0, description="대기열 길이/대기 시간 지표를 로그에 기록하는 간격(초, 0이면 기록 안 함)")
+
+# 노드/호출 지점별 모델 경로
+class ModelRoute(BaseModel):
+    """하나의 노드 또는 호출 지점에서 사용할 모델 설정"""
+    model: Optional[str] = Field(None, description="사용할 모델 (없으면 기본 모델)")
+    max_tokens: Optional[int] = Field(None, description="최대 출력 토큰 수")
+    timeout: Optional[float] = Field(None, description="호출 마감 시간(초, 없으면 호출 정책의 노드 마감 시간)")
+    candidates: List[str] = Field(default_factory=list, description="동적 선택 시 함께 고려할 대체 모델 목록")
+
+# 모델 라우터 설정
+class ModelRouterConfig(BaseModel):
+    """노드/호출 지점별 모델 경로와 동적 선택 설정"""
+    routes: Dict[str, ModelRoute] = Field(default_factory=dict, description="호출 지점별 모델 경로 (예: generate_response, analyze_previous_logs)")
+    dynamic: bool = Field(False, description="최근 지연 시간/오류율 통계에 따라 후보 모델 중에서 선택할지 여부")
+    min_samples: int = Field(20, description="동적 선택에 사용할 모델별 최소 호출 기록 수")
+    max_error_rate: float = Field(0.2, description="이보다 오류율이 높은 모델은 동적 선택에서 제외")
+    latency_quantile: float = Field(0.95, description="동적 선택 시 비교할 지연 시간 분위수")
+
+# 장기 기억 인덱스 설정
+class MemoryIndexConfig(BaseModel):
+    """과거 대화 턴 검색(장기 기억 인덱스) 설정"""
+    enabled: bool = Field(True, description="관련 과거 대화 턴 검색 사용 여부")
+    dim: int = Field(512, description="해싱 임베딩 차원 수 (턴당 dim * 4 bytes)")
+    initial_capacity: int = Field(16, description="사용자 인덱스를 처음 만들 때 할당할 턴 수 (부족하면 두 배씩 늘림)")
+    ngram_sizes: List[int] = Field(default_factory=lambda: [2], description="임베딩에 사용할 글자 n-gram 크기")
+    top_k: int = Field(3, description="프롬프트에 넣을 관련 과거 턴 수")
+    min_score: float = Field(0.15, description="이보다 코사인 유사도가 낮은 턴은 넣지 않음")
+    max_chars_per_turn: int = Field(200, description="프롬프트에 넣을 때 턴의 사용자/챗봇 메시지별 최대 글자 수")
+    index_previous_logs: bool = Field(True, description="시작 시 이전 로그의 대화 턴을 인덱싱할지 여부 (지난 실행 이후 새로 기록된 로그만 임베딩)")
+    index_other_users: bool = Field(False, description="다른 user_id와 user_id가 없는 이전 형식 로그의 턴도 인덱스에 넣을지 여부 (한 사람이 쓰는 로컬 실행용, 사용자가 여럿이면 다른 사용자의 대화가 떠오를 수 있음)")
+    store_dir: Optional[str] = Field(None, description="이전 로그에서 만든 사용자별 인덱스 저장 디렉토리 (없으면 profiles/memory)")
+    index_batch_size: int = Field(2048, description="이전 로그 인덱싱 시 한 번에 임베딩할 턴 수")
+
+# 런타임 지표 내보내기 설정
+class MetricsConfig(BaseModel):
+    """프로세스 내 지표 레지스트리의 Prometheus 텍스트 HTTP 엔드포인트와 스냅샷 파일 설정"""
+    host: str = Field("127.0.0.1", description="HTTP 엔드포인트 주소 (기본값은 로컬에서만 접근)")
+    port: Optional[int] = Field(None, description="HTTP 엔드포인트 포트 (없으면 엔드포인트를 열지 않음)")
+    snapshot_path: Optional[str] = Field(None, description="지표 스냅샷 JSON 파일 경로 (없으면 기록 안 함)")
+    snapshot_interval_seconds: float = Field(15.0, description="스냅샷 파일을 다시 쓰는 간격(초)")
+
 # 친구 페르소나 설정
 FRIEND_PERSONA: Persona = {
     "name": "친구",
@@ -0,0 +1,213 @@
+"""
+페르소나 레지스트리 모듈
+- PersonaRegistry: 페르소나 ID별 페르소나 정의 (기본 친구 페르소나 + 설정 파일)
+- GraphCache: (페르소나, 그래프 변형)별 컴파일된 그래프 캐시
+- PersonaGraph: 컴파일된 그래프에 페르소나 ID를 묶은 바인딩
+- load_personas: JSON 설정 파일/디렉토리에서 페르소나를 읽는 함수
+
+설정 경로는 환경 변수 CHATBOT_PERSONAS로 지정합니다. 디렉토리면 그 안의 모든 .json 파일을 읽으며,
+파일 하나에 페르소나 하나(ID는 "id" 필드 또는 파일 이름) 또는 여러 개({"personas": {ID: 페르소나}})를 둘 수 있습니다. 예:
+    {
+      "id": "teacher",
+      "name": "선생님",
+      "description": "차분하게 설명해 주는 선생님 같은 챗봇",
+      "system_prompt": "당신은 친절한 선생님입니다. ...",
+      "greeting": "안녕하세요! 오늘은 무엇을 알아볼까요?"
+    }
+
+컴파일된 그래프는 변형마다 하나만 만들고, 페르소나별 그래프는 그 그래프에 페르소나 ID를 묶은 가벼운 바인딩입니다.
+따라서 모든 페르소나가 같은 노드, 체인, LLM 클라이언트, 사용자 상태, 메시지 저장소, 체크포인터를 공유합니다.
+페르소나는 요청할 때 config의 configurable.persona_id로 고르며, 지정하지 않으면 스레드 상태에 남은 페르소나를 씁니다.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chatbot_modules.models import FRIEND_PERSONA, Persona
+from chatbot_modules.metrics import record_cache
+
+# 페르소나 설정 경로 환경 변수
+PERSONAS_ENV_VAR = "CHATBOT_PERSONAS"
+
+# 기본 페르소나 ID
+DEFAULT_PERSONA_ID = "friend"
+
+# 기본 그래프 변형 이름
+DEFAULT_VARIANT = "default"
+
+def _to_persona(data: Dict[str, Any]) -> Persona:
+    """설정 항목을 페르소나로 변환합니다. (name, system_prompt 필수)"""
+    missing = [key for key in ("name", "system_prompt") if not data.get(key)]
+    if missing:
+        raise ValueError(f"필수 필드 누락: {', '.join(missing)}")
+    return {
+        "name": data["name"],
+        "description": data.get("description", ""),
+        "system_prompt": data["system_prompt"],
+        "greeting": data.get("greeting", "")
+    }
+
+def _read_persona_file(path: str) -> Dict[str, Persona]:
+    """페르소나 설정 파일 하나를 읽어 {페르소나 ID: 페르소나}를 반환합니다."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if "personas" in data:
+        return {persona_id: _to_persona(item) for persona_id, item in data["personas"].items()}
+    persona_id = data.get("id") or os.path.splitext(os.path.basename(path))[0]
+    return {persona_id: _to_persona(data)}
+
+def load_personas(path: Optional[str] = None) -> Dict[str, Persona]:
+    """JSON 설정 파일 또는 디렉토리에서 페르소나를 읽습니다. 읽지 못한 파일은 건너뜁니다."""
+    path = path or os.getenv(PERSONAS_ENV_VAR)
+    if not path:
+        return {}
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.json'))
+    else:
+        files = [path]
+
+    personas = {}
+    for file_path in files:
+        try:
+            personas.update(_read_persona_file(file_path))
+        except Exception as e:
+            print(f"페르소나 설정 '{file_path}' 읽기 실패, 건너뜁니다: {e}")
+    return personas
+
+class PersonaRegistry:
+    """페르소나 ID별 페르소나 정의를 관리하는 레지스트리
+
+    기본 친구 페르소나(DEFAULT_PERSONA_ID)는 항상 등록되어 있으며, 설정 파일의 같은 ID로 덮어쓸 수 있습니다.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """초기화"""
+        self._personas = {DEFAULT_PERSONA_ID: FRIEND_PERSONA}
+        self._lock = threading.Lock()
+        self.load(path)
+
+    def load(self, path: Optional[str] = None) -> List[str]:
+        """설정 파일/디렉토리의 페르소나를 등록하고 등록한 ID 목록을 반환합니다."""
+        personas = load_personas(path)
+        with self._lock:
+            self._personas.update(personas)
+        return list(personas)
+
+    def register(self, persona_id: str, persona: Dict[str, Any]):
+        """페르소나를 등록합니다."""
+        persona = _to_persona(persona)
+        with self._lock:
+            self._personas[persona_id] = persona
+
+    def resolve(self, persona_id: Optional[str]) -> str:
+        """페르소나 ID를 확인하여 반환합니다. (None이면 기본 페르소나, 등록되지 않은 ID면 ValueError)"""
+        persona_id = persona_id or DEFAULT_PERSONA_ID
+        if persona_id not in self._personas:
+            raise ValueError(f"알 수 없는 페르소나: {persona_id}")
+        return persona_id
+
+    def get(self, persona_id: Optional[str] = None) -> Persona:
+        """페르소나를 반환합니다. (None이면 기본 페르소나)"""
+        return self._personas[self.resolve(persona_id)]
+
+    def ids(self) -> List[str]:
+        """등록된 페르소나 ID 목록"""
+        with self._lock:
+            return sorted(self._personas)
+
+    def all(self) -> List[Persona]:
+        """등록된 모든 페르소나"""
+        with self._lock:
+            return list(self._personas.values())
+
+class PersonaGraph:
+    """컴파일된 그래프에 페르소나 ID를 묶은 바인딩
+
+    invoke/stream/get_state 호출의 config에 configurable.persona_id를 채워 넘기며
+    (요청 config에 persona_id가 있으면 그 값을 사용), 그 밖의 속성은 컴파일된 그래프를 그대로 사용합니다.
+    """
+
+    def __init__(self, graph: Any, persona_id: str):
+        """초기화"""
+        self.graph = graph
+        self.persona_id = persona_id
+
+    def _with_persona(self, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """config에 페르소나 ID를 채운 사본을 반환합니다."""
+        config = dict(config or {})
+        config["configurable"] = {"persona_id": self.persona_id, **(config.get("configurable") or {})}
+        return config
+
+    def invoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """페르소나를 지정하여 그래프를 실행합니다."""
+        return self.graph.invoke(input, self._with_persona(config), **kwargs)
+
+    def stream(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """페르소나를 지정하여 그래프를 스트리밍 실행합니다."""
+        return self.graph.stream(input, self._with_persona(config), **kwargs)
+
+    def get_state(self, config: Dict[str, Any], **kwargs) -> Any:
+        """스레드 상태를 반환합니다."""
+        return self.graph.get_state(config, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        """그 밖의 속성은 컴파일된 그래프에서 찾습니다."""
+        return getattr(self.graph, name)
+
+class GraphCache:
+    """(페르소나, 그래프 변형)별 컴파일된 그래프 캐시
+
+    그래프 변형(예: 게이트 설정이 다른 그래프)마다 한 번만 컴파일하고, 페르소나별로는 페르소나 ID를 묶은
+    바인딩을 캐시합니다. 같은 변형의 그래프는 체크포인터를 공유하므로 스레드 ID가 같으면 같은 대화입니다.
+    """
+
+    def __init__(self, registry: Optional[PersonaRegistry] = None):
+        """초기화"""
+        self.registry = registry or persona_registry
+        self._builders = {DEFAULT_VARIANT: _build_default_graph}  # 변형별 그래프 생성 함수
+        self._compiled = {}  # 변형별 컴파일된 그래프 (variant: CompiledGraph)
+        self._bound = {}  # 페르소나 바인딩 ((persona_id, variant): PersonaGraph)
+        self._lock = threading.Lock()
+
+    def register_variant(self, variant: str, builder: Callable[[], Any]):
+        """그래프 변형 생성 함수를 등록합니다. (이미 만든 같은 변형의 그래프는 버림)"""
+        with self._lock:
+            self._builders[variant] = builder
+            self._compiled.pop(variant, None)
+            self._bound = {key: graph for key, graph in self._bound.items() if key[1] != variant}
+
+    def compiled(self, variant: str = DEFAULT_VARIANT) -> Any:
+        """변형의 컴파일된 그래프를 반환합니다. (처음 요청할 때 컴파일)"""
+        with self._lock:
+            if variant not in self._compiled:
+                if variant not in self._builders:
+                    raise ValueError(f"알 수 없는 그래프 변형: {variant}")
+                self._compiled[variant] = self._builders[variant]()
+            return self._compiled[variant]
+
+    def get(self, persona_id: Optional[str] = None, variant: str = DEFAULT_VARIANT) -> PersonaGraph:
+        """페르소나 ID가 묶인 그래프를 반환합니다. (invoke/stream/get_state는 컴파일된 그래프와 같음)"""
+        key: Tuple[str, str] = (self.registry.resolve(persona_id), variant)
+        graph = self._bound.get(key)
+        record_cache("persona_graphs", graph is not None)
+        if graph is None:
+            compiled = self.compiled(variant)
+            with self._lock:
+                graph = self._bound.setdefault(key, PersonaGraph(compiled, key[0]))
+        return graph
+
+    def stats(self) -> Dict[str, Any]:
+        """컴파일된 그래프 수와 페르소나 바인딩 수를 반환합니다."""
+        with self._lock:
+            return {"compiled": sorted(self._compiled), "bound": len(self._bound)}
+
+def _build_default_graph() -> Any:
+    """기본 그래프 변형 (create_persona_chatbot 기본 설정)"""
+    from chatbot_modules.main import create_persona_chatbot
+    return create_persona_chatbot()
+
+# 전역 페르소나 레지스트리와 그래프 캐시
+persona_registry = PersonaRegistry()
+graph_cache = GraphCache(persona_registry)
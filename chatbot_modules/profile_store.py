@@ -0,0 +1,96 @@
+"""
+사용자 프로필 저장소 모듈
+- user_file_stem: 사용자별 저장 파일 이름(확장자 제외)을 만드는 함수 (프로필과 장기 기억 저장소가 공유)
+- ProfileStore: 사용자 정보와 대화 맥락을 사용자별 JSON 파일로 저장하는 클래스
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import threading
+from typing import Any, Dict, Optional
+
+from chatbot_modules.logging_utils import PROFILE_DIR
+from chatbot_modules.state_management import UserState
+
+def user_file_stem(user_id: str) -> str:
+    """사용자 ID로 파일 이름(확장자 제외)을 만듭니다.
+
+    파일 이름에 쓸 수 없는 문자는 "_"로 바꾸고, 바꾼 결과가 겹치지 않도록 ID의 해시 일부를 붙입니다.
+    """
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in user_id)
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:8]
+    return f"{safe_id}_{digest}"
+
+class ProfileStore:
+    """사용자 프로필(user_information, conversation_context)을 파일로 저장하는 클래스"""
+
+    def __init__(self, base_dir: str = PROFILE_DIR):
+        """초기화"""
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+
+    def _path(self, user_id: str) -> str:
+        """사용자 ID에 해당하는 프로필 파일 경로를 반환합니다."""
+        return os.path.join(self.base_dir, f"{user_file_stem(user_id)}.json")
+
+    def load(self, user_id: str) -> Dict[str, Any]:
+        """저장된 프로필을 반환합니다. 없으면 빈 딕셔너리를 반환합니다."""
+        path = self._path(user_id)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"프로필 파일 '{path}' 읽기 실패: {e}")
+            return {}
+
+    def save(self, user_id: str, profile: Dict[str, Any]):
+        """프로필을 원자적으로 저장합니다."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(user_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def merge(self, user_id: str, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+        """분석 결과를 기존 프로필에 UserState의 병합 규칙으로 합쳐 저장합니다."""
+        with self._lock:
+            profile = self.load(user_id)
+
+            merged = UserState()
+            if profile.get("user_information"):
+                merged.update_user_information(user_id, profile["user_information"])
+            if profile.get("conversation_context"):
+                merged.update_conversation_context(user_id, profile["conversation_context"])
+
+            if analysis_result.get("user_information"):
+                merged.update_user_information(user_id, analysis_result["user_information"])
+            if analysis_result.get("conversation_context"):
+                merged.update_conversation_context(user_id, analysis_result["conversation_context"])
+
+            profile = {
+                "user_id": user_id,
+                "user_information": merged.get_user_information(user_id),
+                "conversation_context": merged.get_conversation_context(user_id),
+                "updated_at": datetime.datetime.now().isoformat()
+            }
+            self.save(user_id, profile)
+            return profile
+
+    def apply_to(self, state: UserState, user_id: str, profile_user_id: Optional[str] = None) -> bool:
+        """저장된 프로필을 UserState에 불러옵니다. 불러온 프로필이 있으면 True를 반환합니다."""
+        profile = self.load(profile_user_id or user_id)
+        if not profile:
+            return False
+        if profile.get("user_information"):
+            state.update_user_information(user_id, profile["user_information"])
+        if profile.get("conversation_context"):
+            state.update_conversation_context(user_id, profile["conversation_context"])
+        return True
+
+# 전역 프로필 저장소 객체
+profile_store = ProfileStore()
@@ -0,0 +1,59 @@
+"""
+프롬프트 인코딩 모듈
+- compact_json: 빈 필드를 생략하고 공백 없이 직렬화하는 프롬프트용 JSON 인코딩
+- parse_delta: LLM이 반환한 변경분(add/change/remove)을 정규화
+- CONTEXT_DELTA_FORMAT / PROFILE_DELTA_FORMAT: 보조 노드 프롬프트에 넣는 변경분 응답 형식 안내
+
+보조 노드(track_conversation_context, extract_user_information)는 기존 맥락/사용자 정보를
+compact_json으로 한 번만 보내고, LLM은 전체 객체 대신 추가/변경/삭제된 필드만 반환합니다.
+변경분은 UserState.apply_conversation_context_delta / apply_user_information_delta로 병합됩니다.
+
+변경분 형식 예:
+    {"add": {"interests": ["등산"]}, "change": {"occupation": "디자이너"}, "remove": {"goals": ["이직"]}}
+"""
+
+import json
+from typing import Any, Dict, Iterable
+
+# 변경분 응답의 최상위 키
+DELTA_KEYS = ("add", "change", "remove")
+
+CONTEXT_DELTA_FORMAT = """바뀐 부분만 JSON으로 반환하세요 (빈 필드 생략, 바뀐 것이 없으면 {}).
+add에는 main_topics의 새 주제(짧은 키워드) 목록, pending_questions의 아직 답하지 않은 새 질문 목록, references의 새 참조 키와 값, change에는 current_context의 현재 맥락 요약(100자 이내)과 references의 값이 바뀐 참조 키와 값, remove에는 main_topics의 끝난 주제 목록, pending_questions의 답변된 질문 목록, references에서 지울 키 목록을 넣으세요. 예:
+{"add":{"main_topics":["여행"],"references":{"그곳":"제주도"}},"change":{"current_context":"다음 달 제주도 여행 계획을 이야기하는 중"},"remove":{"pending_questions":["여행 언제 가?"]}}"""
+
+PROFILE_DELTA_FORMAT = """바뀐 부분만 JSON으로 반환하세요 (빈 필드 생략, 새 정보가 없으면 {}).
+add에는 interests/goals의 새 항목 목록과 preferences/family의 새 키와 값, change에는 name/age/occupation/location/contact_info 중 새로 알게 되었거나 바뀐 값, remove에는 interests/goals에서 지울 항목 목록과 preferences/family에서 지울 키 목록을 넣으세요. 예:
+{"add":{"interests":["등산"],"family":{"동생":"대학생"}},"change":{"age":30},"remove":{"goals":["이직"]}}"""
+
+def _is_empty(value: Any) -> bool:
+    """프롬프트에서 생략할 빈 값인지 확인합니다. (0과 False는 유지)"""
+    return value is None or value == "" or (isinstance(value, (list, dict)) and not value)
+
+def _prune(value: Any) -> Any:
+    """중첩된 딕셔너리/리스트에서 빈 값을 재귀적으로 제거합니다."""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if not _is_empty(item)}
+    if isinstance(value, (list, tuple)):
+        pruned = [_prune(item) for item in value]
+        return [item for item in pruned if not _is_empty(item)]
+    return value
+
+def compact_json(data: Any, exclude: Iterable[str] = ()) -> str:
+    """빈 필드와 exclude 키를 생략하고 공백 없이 직렬화합니다. (내용이 없으면 "{}")"""
+    if isinstance(data, dict):
+        excluded = set(exclude)
+        data = {key: value for key, value in data.items() if key not in excluded}
+    return json.dumps(_prune(data), ensure_ascii=False, separators=(",", ":"))
+
+def parse_delta(result: Any) -> Dict[str, Dict[str, Any]]:
+    """LLM 응답을 {"add": {...}, "change": {...}, "remove": {...}} 형태로 정규화합니다.
+
+    변경분 키가 없는 응답(이전 형식의 전체 객체)은 모두 추가/변경으로 취급합니다.
+    """
+    if not isinstance(result, dict):
+        return {key: {} for key in DELTA_KEYS}
+    if not any(key in result for key in DELTA_KEYS):
+        return {"add": _prune(result), "change": {}, "remove": {}}
+    return {key: _prune(result.get(key)) if isinstance(result.get(key), dict) else {} for key in DELTA_KEYS}
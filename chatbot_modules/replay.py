@@ -0,0 +1,340 @@
+"""
+로그 재생 모듈
+- load_replay_corpus: 로그 파일에서 세션(사용자별 대화 턴)과 기록된 LLM 응답을 읽어 재생 말뭉치를 만듦
+- ReplayLLM: 요청 해시로 기록된 응답을 찾아 반환하는 재생 모델 (지연 시간 모델 설정 가능)
+- replay_sessions: create_persona_chatbot() 그래프로 세션을 턴 단위로 다시 실행하고 보고서를 만듦
+
+응답은 (노드, 요청 메시지 전체)의 해시로 찾고, 없으면 (노드, 마지막 사용자 메시지)로 찾습니다.
+두 번째 방법으로 찾았거나 찾지 못한 호출은 불일치(divergence)로 기록되므로, 프롬프트 조립이 바뀌면
+어느 세션/턴/노드에서 달라졌는지 알 수 있습니다. 보고서에는 노드별 LLM 외 처리 시간(overhead),
+노드별 프롬프트 크기 증가, 불일치 목록이 들어갑니다. 네트워크 없이 실행됩니다.
+
+사용법:
+    python -m chatbot_modules.replay logs/llm_log_20250101_120000.json --latency recorded
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from chatbot_modules.models import CallPolicyConfig, EnrichmentBatchConfig
+from chatbot_modules.logging_utils import get_log_context
+from chatbot_modules.log_analysis import _ROLE_ALIASES, iter_log_file
+
+# 응답 생성 노드 (이 노드의 호출이 대화 턴 하나)
+RESPONSE_NODE = "generate_response"
+
+# 보고서에 남길 최대 불일치 수
+MAX_REPORTED_DIVERGENCES = 50
+
+def _normalize_messages(messages: Iterable[Any]) -> List[Tuple[str, str]]:
+    """로그/LangChain 메시지를 (역할, 내용) 목록으로 정규화합니다."""
+    normalized = []
+    for msg in messages:
+        if isinstance(msg, dict):
+            role, content = msg.get("role", ""), msg.get("content", "")
+        else:
+            role, content = getattr(msg, "type", ""), getattr(msg, "content", "")
+        normalized.append((_ROLE_ALIASES.get(role, role), str(content)))
+    return normalized
+
+def request_hash(node: Optional[str], messages: List[Tuple[str, str]]) -> str:
+    """(노드, 요청 메시지 전체)의 해시"""
+    payload = json.dumps([node, messages], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _last_user_content(messages: List[Tuple[str, str]]) -> Optional[str]:
+    """마지막 사용자 메시지 내용을 반환합니다."""
+    for role, content in reversed(messages):
+        if role == "user" and content:
+            return content
+    return None
+
+def _is_response_call(entry: Dict[str, Any], messages: List[Tuple[str, str]]) -> bool:
+    """응답 생성 호출인지 확인합니다. (노드 정보가 없는 이전 로그는 페르소나 시스템 프롬프트로 판단)"""
+    from chatbot_modules.personas import persona_registry
+
+    if entry.get("node"):
+        return entry["node"] == RESPONSE_NODE
+    return bool(messages) and messages[0][0] == "system" and any(
+        messages[0][1].startswith(persona["system_prompt"]) for persona in persona_registry.all())
+
+class _Recording:
+    """기록된 응답 하나"""
+
+    __slots__ = ("content", "latency_ms")
+
+    def __init__(self, content: str, latency_ms: Optional[float]):
+        """초기화"""
+        self.content = content
+        self.latency_ms = latency_ms
+
+def load_replay_corpus(log_files: Iterable[str]) -> Dict[str, Any]:
+    """로그 파일에서 세션과 기록된 응답 색인을 만듭니다.
+
+    Returns:
+        {"sessions": [{"key", "user_id", "persona_id", "turns": [{"user", "response", "request_chars"}], "history"}],
+         "exact": {요청 해시: [_Recording]}, "fallback": {(노드, 마지막 사용자 메시지) 해시: [_Recording]}}
+    """
+    sessions, exact, fallback = [], defaultdict(list), defaultdict(list)
+    for path in log_files:
+        by_user = {}
+        for entry in iter_log_file(path):
+            request, response = entry.get("request"), entry.get("response")
+            if not isinstance(response, dict) or isinstance(request, (str, dict)) or request is None:
+                continue
+            messages = _normalize_messages(request)
+            node = entry.get("node")
+            recording = _Recording(str(response.get("content", "")), entry.get("latency_ms"))
+            exact[request_hash(node, messages)].append(recording)
+            fallback[request_hash(node, [("user", _last_user_content(messages) or "")])].append(recording)
+
+            if _is_response_call(entry, messages) and _last_user_content(messages):
+                # 같은 사용자라도 대화 기록이 줄어들면 새 대화로 보고 세션을 나눔
+                user_id = entry.get("user_id", "unknown")
+                history = sum(role != "system" for role, _ in messages)
+                session = by_user.get(user_id)
+                if session is None or history < session["history"]:
+                    session = {"key": f"{os.path.basename(path)}:{user_id}:{len(sessions)}", "user_id": user_id,
+                               "persona_id": entry.get("persona_id"), "turns": [], "history": 0}
+                    by_user[user_id] = session
+                    sessions.append(session)
+                session["history"] = history
+                session["turns"].append({
+                    "user": _last_user_content(messages),
+                    "response": recording.content,
+                    "request_chars": sum(len(content) for _, content in messages)
+                })
+    return {"sessions": sessions, "exact": exact, "fallback": fallback}
+
+class ReplayLLM:
+    """기록된 응답을 반환하는 재생 모델 (call_policy에 llm_factory로 주입)
+
+    Args:
+        corpus: load_replay_corpus의 결과
+        latency: "recorded"(기록된 지연 시간), "none"(지연 없음) 또는 고정 지연 시간(ms)
+        latency_scale: 지연 시간 배율
+    """
+
+    def __init__(self, corpus: Dict[str, Any], latency: Union[str, float] = "none", latency_scale: float = 1.0):
+        """초기화"""
+        self.exact = corpus["exact"]
+        self.fallback = corpus["fallback"]
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.current_turn = None  # 재생 중인 (세션 키, 턴 번호), 드라이버가 설정
+        self.calls = []  # 호출 기록 {"node", "turn", "match", "prompt_chars", "prompt_tokens", "llm_ms"}
+        self._served = defaultdict(int)  # 키별로 반환한 응답 수 (같은 요청이 반복되면 기록 순서대로 반환)
+        self._lock = threading.Lock()
+
+    def _delay(self, recording: Optional[_Recording]) -> float:
+        """지연 시간 모델에 따른 대기 시간(초)"""
+        if self.latency == "recorded":
+            milliseconds = recording.latency_ms if recording is not None and recording.latency_ms else 0.0
+        elif self.latency == "none":
+            milliseconds = 0.0
+        else:
+            milliseconds = float(self.latency)
+        return milliseconds * self.latency_scale / 1000
+
+    def _lookup(self, node: Optional[str], messages: List[Tuple[str, str]]) -> Tuple[str, Optional[_Recording]]:
+        """기록된 응답을 찾아 (일치 방식, 기록)을 반환합니다. (노드 정보가 없는 기록도 찾음)"""
+        last_user = [("user", _last_user_content(messages) or "")]
+        for match, index, payload in (("exact", self.exact, messages), ("fallback", self.fallback, last_user)):
+            for key_node in (node, None):
+                key = request_hash(key_node, payload)
+                recordings = index.get(key)
+                if recordings:
+                    with self._lock:
+                        served = self._served[(match, key)]
+                        self._served[(match, key)] = served + 1
+                    return match, recordings[min(served, len(recordings) - 1)]
+        return "missing", None
+
+    def invoke(self, input: Any, config: Any = None, **kwargs):
+        """기록된 응답을 지연 시간 모델에 따라 반환합니다. 기록이 없으면 노드에 맞는 빈 응답을 반환합니다."""
+        from langchain_core.messages import AIMessage
+        from chatbot_modules.utils import count_tokens
+
+        started = time.perf_counter()
+        raw = input.to_messages() if hasattr(input, "to_messages") else input
+        messages = _normalize_messages(raw)
+        node = get_log_context().get("node")
+        match, recording = self._lookup(node, messages)
+
+        delay = self._delay(recording)
+        if delay > 0:
+            time.sleep(delay)
+        if recording is not None:
+            content = recording.content
+        else:
+            # 보조 노드는 JSON 응답을 기대하므로 빈 객체 반환
+            content = "" if node == RESPONSE_NODE else "{}"
+
+        prompt_text = "".join(content for _, content in messages)
+        with self._lock:
+            self.calls.append({
+                "node": node,
+                "turn": self.current_turn,
+                "match": match,
+                "prompt_chars": len(prompt_text),
+                "prompt_tokens": count_tokens(prompt_text),
+                "llm_ms": (time.perf_counter() - started) * 1000
+            })
+        return AIMessage(content=content)
+
+def replay_llm_factory(llm: ReplayLLM):
+    """모든 모델 이름에 같은 재생 모델을 반환하는 팩토리 (call_policy.configure(llm_factory=...)용)"""
+    def _factory(model_name: str = "replay", **llm_kwargs) -> ReplayLLM:
+        return llm
+    return _factory
+
+def _slope(values: List[float]) -> float:
+    """턴 번호에 대한 최소제곱 기울기 (턴당 증가량)"""
+    count = len(values)
+    if count < 2:
+        return 0.0
+    mean_x, mean_y = (count - 1) / 2, sum(values) / count
+    numerator = sum((i - mean_x) * (value - mean_y) for i, value in enumerate(values))
+    denominator = sum((i - mean_x) ** 2 for i in range(count))
+    return numerator / denominator
+
+def replay_sessions(corpus: Dict[str, Any], latency: Union[str, float] = "none", latency_scale: float = 1.0,
+                    max_turns: Optional[int] = None) -> Dict[str, Any]:
+    """재생 말뭉치의 세션을 create_persona_chatbot() 그래프로 다시 실행하고 보고서를 반환합니다.
+
+    세션마다 새 사용자 ID로 실행하므로 기록 당시 이전 대화(장기 기억, 저장된 사용자 정보)가 있던 세션은
+    보조 노드 프롬프트가 달라질 수 있습니다. 헤지 요청은 같은 기록을 중복으로 소비하고, 여러 사용자 보조 노드 묶음은
+    기록 당시의 묶음 구성(동시에 진행된 턴)을 재현할 수 없으므로 재생 중에는 둘 다 끕니다.
+    """
+    from chatbot_modules.call_policy import call_policy
+    from chatbot_modules.enrichment_batcher import enrichment_batcher
+    from chatbot_modules.main import create_persona_chatbot
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.logging_utils import set_log_context
+
+    llm = ReplayLLM(corpus, latency, latency_scale)
+    call_policy.configure(CallPolicyConfig(**{**call_policy.config.dict(), "hedge_enabled": False}), llm_factory=replay_llm_factory(llm))
+    enrichment_batcher.configure(EnrichmentBatchConfig(**{**enrichment_batcher.config.dict(), "enabled": False}))
+    chatbot = create_persona_chatbot()
+
+    node_stats = defaultdict(lambda: {"calls": 0, "wall_ms": 0.0})
+    divergences, response_mismatches, turns = [], 0, 0
+    started = time.perf_counter()
+    for session in corpus["sessions"]:
+        thread_id = f"replay_{session['key']}"
+        state = {"user_id": thread_id, "conversation_id": thread_id, "message_count": 0}
+        config = {"configurable": {"thread_id": thread_id, "persona_id": session.get("persona_id")}}
+        set_log_context(user_id=thread_id)
+        for index, turn in enumerate(session["turns"][:max_turns]):
+            llm.current_turn = (session["key"], index)
+            message_store.append(thread_id, "user", turn["user"])
+            state["message_count"] = message_store.count(thread_id)
+
+            # 노드가 끝날 때마다 나오는 업데이트 사이의 시간을 노드 실행 시간으로 기록
+            node_started = time.perf_counter()
+            for update in chatbot.stream(state, config, stream_mode="updates"):
+                now = time.perf_counter()
+                for node in update:
+                    node_stats[node]["calls"] += 1
+                    node_stats[node]["wall_ms"] += (now - node_started) * 1000
+                node_started = now
+            state = chatbot.get_state(config).values
+            turns += 1
+
+            if state.get("response") != turn["response"]:
+                response_mismatches += 1
+                divergences.append({"session": session["key"], "turn": index, "node": RESPONSE_NODE,
+                                    "kind": "response_mismatch"})
+
+    # 호출 기록 집계 (노드별 LLM 시간, 일치 방식, 프롬프트 크기)
+    matches = defaultdict(int)
+    llm_ms = defaultdict(float)
+    prompt_tokens = defaultdict(lambda: defaultdict(list))  # 노드별, 세션별 프롬프트 토큰 수
+    for call in llm.calls:
+        matches[call["match"]] += 1
+        llm_ms[call["node"]] += call["llm_ms"]
+        session_key, index = call["turn"] or (None, None)
+        prompt_tokens[call["node"]][session_key].append(call["prompt_tokens"])
+        if call["match"] != "exact":
+            divergences.append({"session": session_key, "turn": index, "node": call["node"],
+                                "kind": "prompt_mismatch" if call["match"] == "fallback" else "missing_response"})
+
+    nodes = {}
+    for node, stats in node_stats.items():
+        overhead = stats["wall_ms"] - llm_ms.get(node, 0.0)
+        nodes[node] = {
+            "calls": stats["calls"],
+            "wall_ms": round(stats["wall_ms"], 1),
+            "llm_ms": round(llm_ms.get(node, 0.0), 1),
+            "overhead_ms_per_call": round(overhead / stats["calls"], 2)
+        }
+    # 프롬프트 크기 증가는 세션마다 계산한 뒤 평균 (세션 첫/마지막 호출 평균, 세션 내 호출당 증가량 평균)
+    prompt_growth = {}
+    for node, by_session in prompt_tokens.items():
+        series = list(by_session.values())
+        prompt_growth[node] = {
+            "calls": sum(len(values) for values in series),
+            "first_tokens": round(sum(values[0] for values in series) / len(series)),
+            "last_tokens": round(sum(values[-1] for values in series) / len(series)),
+            "max_tokens": max(max(values) for values in series),
+            "tokens_per_call": round(sum(_slope(values) for values in series) / len(series), 2)
+        }
+
+    return {
+        "sessions": len(corpus["sessions"]),
+        "turns": turns,
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+        "llm_calls": len(llm.calls),
+        "matches": dict(matches),
+        "response_mismatches": response_mismatches,
+        "nodes": nodes,
+        "prompt_growth": prompt_growth,
+        "divergence_count": len(divergences),
+        "divergences": divergences[:MAX_REPORTED_DIVERGENCES]
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령행 진입점"""
+    import argparse
+    from chatbot_modules.logging_utils import set_log_filename
+
+    parser = argparse.ArgumentParser(description="LLM 통신 로그의 대화를 기록된 응답으로 다시 실행하여 성능/회귀를 확인합니다.")
+    parser.add_argument("paths", nargs="+", help="로그 파일 또는 로그 디렉토리")
+    parser.add_argument("--latency", default="none", help='지연 시간 모델: "recorded", "none" 또는 고정 지연 시간(ms)')
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="지연 시간 배율")
+    parser.add_argument("--max-turns", type=int, default=None, help="세션당 재생할 최대 턴 수")
+    parser.add_argument("--output", default=None, help="보고서 JSON 저장 경로 (없으면 표준 출력)")
+    parser.add_argument("--fail-on-divergence", action="store_true", help="불일치가 있으면 종료 코드 1 반환")
+    args = parser.parse_args(argv)
+
+    log_files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            log_files.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".json")))
+        else:
+            log_files.append(path)
+
+    # 재생 중 기록되는 이벤트가 재생 대상 로그 디렉토리에 섞이지 않도록 임시 파일에 기록
+    set_log_filename(os.path.join(tempfile.gettempdir(), f"chatbot_replay_{os.getpid()}.json"))
+
+    latency = args.latency if args.latency in ("recorded", "none") else float(args.latency)
+    corpus = load_replay_corpus(log_files)
+    report = replay_sessions(corpus, latency, args.latency_scale, args.max_turns)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if args.fail_on_divergence and report["divergence_count"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+다중 프로세스 샤딩 모듈
+- HashRing: user_id를 워커에 배정하는 일관된 해시 링 (워커당 가상 노드 여러 개)
+- ShardedChatbot: 대화 턴을 user_id별 담당 워커 프로세스로 보내는 앞단 디스패처
+- export_user / import_user: 공유 프로필 저장소(ProfileStore)를 통한 사용자 상태 인계
+
+한 사용자의 UserState, 메시지 저장소 대화, LangGraph 스레드는 항상 한 워커 프로세스 안에만 있습니다.
+워커를 추가/제거하면 담당 워커가 바뀐 사용자만 옮기며, 이전 워커가 사용자 상태(사용자 정보, 대화 맥락,
+메시지, 정보 추출 진행 상황)를 프로필 파일에 기록하고 새 워커는 그 사용자의 첫 턴에서 이를 불러옵니다.
+인계하는 동안 해당 사용자의 새 턴은 디스패처에서 기다립니다.
+
+사용법 (JSON lines 입출력, persona_id는 선택):
+    echo '{"user_id": "user_1", "message": "안녕", "persona_id": "friend"}' | python -m chatbot_modules.sharding --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import hashlib
+import datetime
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from chatbot_modules.logging_utils import PROFILE_DIR
+from chatbot_modules.profile_store import ProfileStore
+
+# 워커가 종료 요청을 처리한 뒤 보내는 응답 값
+_STOPPED = "stopped"
+
+def _hash(key: str) -> int:
+    """링 위치용 64비트 해시를 계산합니다."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+def _worker_index(worker_id: str) -> int:
+    """워커 ID("worker3")의 번호"""
+    digits = worker_id[len(worker_id.rstrip("0123456789")):]
+    return int(digits) if digits else 0
+
+def _conversation_id(user_id: str) -> str:
+    """워커와 관계없이 같은 사용자의 대화 ID (LangGraph thread_id)"""
+    return f"thread_{user_id}"
+
+class HashRing:
+    """워커마다 가상 노드를 여러 개 두어 사용자를 고르게 나누는 일관된 해시 링
+
+    워커를 추가/제거하면 그 워커가 맡거나 맡던 구간의 사용자만 담당 워커가 바뀝니다.
+    """
+
+    def __init__(self, workers: Sequence[str] = (), virtual_nodes: int = 64):
+        """초기화"""
+        self.virtual_nodes = virtual_nodes
+        self._points = []  # 정렬된 링 위치
+        self._owners = {}  # 링 위치: 워커 ID
+        for worker_id in workers:
+            self.add(worker_id)
+
+    @property
+    def workers(self) -> List[str]:
+        """링에 있는 워커 ID 목록"""
+        return sorted(set(self._owners.values()))
+
+    def add(self, worker_id: str):
+        """워커를 링에 추가합니다."""
+        for i in range(self.virtual_nodes):
+            point = _hash(f"{worker_id}#{i}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = worker_id
+
+    def remove(self, worker_id: str):
+        """워커를 링에서 제거합니다."""
+        self._points = [point for point in self._points if self._owners[point] != worker_id]
+        self._owners = {point: owner for point, owner in self._owners.items() if owner != worker_id}
+
+    def owner(self, user_id: str) -> str:
+        """사용자를 담당하는 워커 ID를 반환합니다."""
+        if not self._points:
+            raise RuntimeError("해시 링에 워커가 없습니다.")
+        index = bisect.bisect(self._points, _hash(user_id)) % len(self._points)
+        return self._owners[self._points[index]]
+
+# ----- 워커 프로세스 -----
+
+def export_user(store: ProfileStore, user_id: str, worker_id: str, persona_id: Optional[str] = None):
+    """현재 프로세스의 사용자 상태를 프로필 저장소에 기록하고 프로세스에서 제거합니다.
+
+    아직 분석하지 않은 턴의 사용자 정보는 인계 전에 추출하여 프로필에 포함합니다.
+    """
+    from chatbot_modules.state_management import user_state
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.extraction_scheduler import extraction_scheduler
+    from chatbot_modules.graph_nodes import flush_user_information
+
+    conversation_id = _conversation_id(user_id)
+    flush_user_information(user_id, message_store.view(conversation_id))
+    store.save(user_id, {
+        "user_id": user_id,
+        "user_information": user_state.get_user_information(user_id),
+        "conversation_context": user_state.get_conversation_context(user_id),
+        "messages": [dict(msg) for msg in message_store.view(conversation_id)],
+        "extraction_analyzed_count": extraction_scheduler.analyzed_count.get(user_id, 0),
+        "persona_id": persona_id,
+        "handoff_from": worker_id,
+        "updated_at": datetime.datetime.now().isoformat()
+    })
+
+    user_state.remove_user(user_id)
+    message_store.drop_conversation(conversation_id)
+    extraction_scheduler.reset(user_id)
+
+def import_user(store: ProfileStore, user_id: str) -> Dict[str, Any]:
+    """프로필 저장소의 사용자 상태(없으면 빈 상태)를 현재 프로세스에 불러와 그래프 상태를 반환합니다."""
+    from chatbot_modules.state_management import user_state
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.extraction_scheduler import extraction_scheduler
+
+    conversation_id = _conversation_id(user_id)
+    profile = store.load(user_id)
+    store.apply_to(user_state, user_id)
+    message_store.replace_conversation(conversation_id, profile.get("messages") or [])
+    if profile.get("extraction_analyzed_count"):
+        extraction_scheduler.analyzed_count[user_id] = profile["extraction_analyzed_count"]
+    state = {"user_id": user_id, "conversation_id": conversation_id, "message_count": message_store.count(conversation_id)}
+    if profile.get("persona_id"):
+        state["persona_id"] = profile["persona_id"]
+    return state
+
+def _worker_main(worker_id: str, requests: Any, responses: Any, profile_dir: str, threads: int,
+                 initializer: Optional[Callable[..., None]], initargs: Tuple[Any, ...]):
+    """워커 프로세스 진입점: 요청 큐의 대화 턴/인계 요청을 처리하고 결과를 응답 큐에 넣습니다."""
+    from chatbot_modules.logging_utils import LOG_DIR, current_time, set_log_context, set_log_filename
+
+    # 워커마다 별도 로그 파일 사용 (델타 형식 인코더 상태가 프로세스별이므로)
+    set_log_filename(os.path.join(LOG_DIR, f"llm_log_{current_time}_{worker_id}.json"))
+    if initializer is not None:
+        initializer(*initargs)
+
+    from chatbot_modules.personas import graph_cache
+    from chatbot_modules.message_store import message_store
+    from chatbot_modules.metrics import start_metrics_export, turn_seconds
+
+    # 워커마다 별도 스냅샷 파일과 포트 사용 (설정 포트 + 1 + 워커 번호, 디스패처는 지표를 내보내지 않음)
+    exporter = start_metrics_export(instance=worker_id, port_offset=1 + _worker_index(worker_id))
+
+    # 모든 페르소나가 워커의 컴파일된 그래프 하나를 공유
+    chatbot = graph_cache.compiled()
+    store = ProfileStore(profile_dir)
+    states = {}  # 이 워커가 맡은 사용자의 그래프 상태 (user_id: State)
+
+    def _turn(user_id: str, message: str, persona_id: Optional[str] = None) -> Dict[str, Any]:
+        set_log_context(user_id=user_id, worker_id=worker_id)
+        state = states.get(user_id) or import_user(store, user_id)
+        message_store.append(state["conversation_id"], "user", message)
+        state["message_count"] = message_store.count(state["conversation_id"])
+        # 페르소나를 지정하지 않으면 스레드 상태의 페르소나 유지
+        graph = graph_cache.get(persona_id) if persona_id else chatbot
+        started = time.perf_counter()
+        state = graph.invoke(state, {"configurable": {"thread_id": state["conversation_id"]}})
+        turn_seconds.observe(time.perf_counter() - started)
+        states[user_id] = state
+        return {"response": state.get("response"), "worker_id": worker_id, "message_count": state["message_count"],
+                "persona_id": state.get("persona_id")}
+
+    def _export_user(user_id: str):
+        set_log_context(user_id=user_id, worker_id=worker_id)
+        state = states.pop(user_id, None) or {}
+        export_user(store, user_id, worker_id, state.get("persona_id"))
+
+    def _export(user_ids: List[str]) -> int:
+        for user_id in user_ids:
+            contextvars.Context().run(_export_user, user_id)
+        return len(user_ids)
+
+    def _handle(request_id: int, kind: str, payload: Any):
+        try:
+            if kind == "turn":
+                result = contextvars.Context().run(_turn, *payload)
+            elif kind == "export":
+                result = _export(payload)
+            else:
+                result = {"worker_id": worker_id, "users": len(states), "messages": message_store.stats()}
+            responses.put((request_id, True, result))
+        except Exception as e:
+            responses.put((request_id, False, f"{type(e).__name__}: {e}"))
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"{worker_id}-turn") as pool:
+        while True:
+            request_id, kind, payload = requests.get()
+            if kind == "stop":
+                break
+            pool.submit(_handle, request_id, kind, payload)
+    if exporter is not None:
+        exporter.stop()
+    responses.put((request_id, True, _STOPPED))
+
+# ----- 디스패처 -----
+
+class _Worker:
+    """디스패처가 관리하는 워커 프로세스 하나"""
+
+    def __init__(self, worker_id: str, process: Any, requests: Any, responses: Any):
+        """초기화"""
+        self.worker_id = worker_id
+        self.process = process
+        self.requests = requests
+        self.responses = responses
+        self.reader = None
+
+class ShardedChatbot:
+    """user_id를 일관된 해시로 워커 프로세스에 배정하여 대화 턴을 처리하는 디스패처
+
+    Args:
+        workers: 시작할 워커 프로세스 수
+        threads_per_worker: 워커마다 동시에 처리할 대화 턴 수 (서로 다른 사용자)
+        profile_dir: 사용자 상태 인계에 사용할 공유 프로필 저장소 디렉토리
+        virtual_nodes: 해시 링의 워커당 가상 노드 수
+        initializer: 워커 프로세스 시작 시 호출할 함수 (예: 스텁 모델 주입, 모듈 최상위 함수여야 함)
+        initargs: initializer 인자
+    """
+
+    def __init__(self, workers: int = 2, threads_per_worker: int = 4, profile_dir: str = PROFILE_DIR,
+                 virtual_nodes: int = 64, initializer: Optional[Callable[..., None]] = None,
+                 initargs: Tuple[Any, ...] = ()):
+        """초기화"""
+        self.threads_per_worker = threads_per_worker
+        self.profile_dir = profile_dir
+        self.initializer = initializer
+        self.initargs = initargs
+        self._mp = multiprocessing.get_context("spawn")
+        self._ring = HashRing(virtual_nodes=virtual_nodes)
+        self._workers = {}  # 워커 ID: _Worker
+        self._assignments = {}  # 사용자별 담당 워커 ID (처리한 적 있는 사용자)
+        self._user_locks = {}  # 사용자별 턴/인계 순서 보장 잠금
+        self._pending = {}  # 요청 ID: Future
+        self._next_request_id = 0
+        self._next_worker = 0
+        self._lock = threading.Lock()
+        self._rebalance_lock = threading.Lock()
+        for _ in range(workers):
+            self._start_worker()
+
+    def __enter__(self) -> "ShardedChatbot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ----- 워커 관리 -----
+
+    def _start_worker(self) -> str:
+        """워커 프로세스를 시작하고 링에 추가합니다."""
+        with self._lock:
+            worker_id = f"worker{self._next_worker}"
+            self._next_worker += 1
+        requests, responses = self._mp.Queue(), self._mp.Queue()
+        process = self._mp.Process(
+            target=_worker_main, name=f"chatbot-{worker_id}", daemon=True,
+            args=(worker_id, requests, responses, self.profile_dir, self.threads_per_worker,
+                  self.initializer, self.initargs)
+        )
+        process.start()
+        worker = _Worker(worker_id, process, requests, responses)
+        worker.reader = threading.Thread(target=self._read_responses, args=(worker,),
+                                         name=f"{worker_id}-reader", daemon=True)
+        worker.reader.start()
+        with self._lock:
+            self._workers[worker_id] = worker
+            self._ring.add(worker_id)
+        return worker_id
+
+    def _read_responses(self, worker: _Worker):
+        """워커 응답 큐를 읽어 요청별 Future를 완료합니다."""
+        while True:
+            try:
+                request_id, ok, result = worker.responses.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is not None:
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(f"{worker.worker_id}: {result}"))
+            if result == _STOPPED:
+                return
+
+    def _send(self, worker_id: str, kind: str, payload: Any = None) -> Future:
+        """워커에 요청을 보내고 응답 Future를 반환합니다."""
+        future = Future()
+        with self._lock:
+            request_id = self._next_request_id
+            self._next_request_id += 1
+            self._pending[request_id] = future
+            worker = self._workers[worker_id]
+        worker.requests.put((request_id, kind, payload))
+        return future
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        """사용자별 잠금을 반환합니다."""
+        with self._lock:
+            if user_id not in self._user_locks:
+                self._user_locks[user_id] = threading.Lock()
+            return self._user_locks[user_id]
+
+    def _rebalance(self, timeout: Optional[float]) -> int:
+        """담당 워커가 바뀐 사용자를 이전 워커에서 인계받도록 옮기고 옮긴 사용자 수를 반환합니다."""
+        with self._lock:
+            moves = {}  # 이전 워커 ID: [(user_id, 새 워커 ID)]
+            for user_id, worker_id in self._assignments.items():
+                owner = self._ring.owner(user_id)
+                if owner != worker_id:
+                    moves.setdefault(worker_id, []).append((user_id, owner))
+
+        moved = 0
+        for old_worker, users in moves.items():
+            locks = [self._user_lock(user_id) for user_id, _ in sorted(users)]
+            for lock in locks:
+                lock.acquire()
+            try:
+                self._send(old_worker, "export", [user_id for user_id, _ in users]).result(timeout)
+                with self._lock:
+                    for user_id, owner in users:
+                        self._assignments[user_id] = owner
+                moved += len(users)
+            finally:
+                for lock in locks:
+                    lock.release()
+        return moved
+
+    def add_worker(self, timeout: Optional[float] = 60.0) -> str:
+        """워커를 추가하고 새 워커가 맡게 된 사용자를 옮깁니다."""
+        with self._rebalance_lock:
+            worker_id = self._start_worker()
+            self._rebalance(timeout)
+            return worker_id
+
+    def remove_worker(self, worker_id: str, timeout: Optional[float] = 60.0) -> int:
+        """워커를 링에서 빼고 그 워커의 사용자를 다른 워커로 옮긴 뒤 종료합니다. 옮긴 사용자 수를 반환합니다."""
+        with self._rebalance_lock:
+            with self._lock:
+                if len(self._workers) <= 1:
+                    raise ValueError("마지막 워커는 제거할 수 없습니다.")
+                self._ring.remove(worker_id)
+            moved = self._rebalance(timeout)
+            self._stop_worker(worker_id, timeout)
+            return moved
+
+    def _stop_worker(self, worker_id: str, timeout: Optional[float]):
+        """워커 프로세스를 종료합니다."""
+        self._send(worker_id, "stop").result(timeout)
+        with self._lock:
+            worker = self._workers.pop(worker_id)
+        worker.process.join(timeout)
+
+    def stop(self, timeout: Optional[float] = 60.0):
+        """모든 워커를 종료합니다."""
+        for worker_id in list(self._workers):
+            try:
+                self._stop_worker(worker_id, timeout)
+            except Exception as e:
+                print(f"워커 '{worker_id}' 종료 중 오류 발생: {e}")
+
+    # ----- 대화 -----
+
+    def chat(self, user_id: str, message: str, timeout: Optional[float] = None,
+             persona_id: Optional[str] = None) -> Dict[str, Any]:
+        """사용자 메시지를 담당 워커로 보내고 {"response", "worker_id", "message_count", "persona_id"}를 반환합니다.
+
+        같은 사용자의 턴은 하나씩 차례로 처리됩니다. persona_id를 주지 않으면 사용자의 이전 페르소나를 유지합니다.
+        """
+        with self._user_lock(user_id):
+            with self._lock:
+                worker_id = self._assignments.get(user_id) or self._ring.owner(user_id)
+                self._assignments[user_id] = worker_id
+            return self._send(worker_id, "turn", (user_id, message, persona_id)).result(timeout)
+
+    def owner(self, user_id: str) -> str:
+        """사용자를 담당하는 워커 ID를 반환합니다."""
+        with self._lock:
+            return self._assignments.get(user_id) or self._ring.owner(user_id)
+
+    @property
+    def workers(self) -> List[str]:
+        """실행 중인 워커 ID 목록"""
+        with self._lock:
+            return sorted(self._workers)
+
+    def stats(self, timeout: Optional[float] = 10.0) -> Dict[str, Any]:
+        """워커별 담당 사용자 수와 메시지 저장소 통계를 반환합니다."""
+        futures = {worker_id: self._send(worker_id, "stats") for worker_id in self.workers}
+        return {worker_id: future.result(timeout) for worker_id, future in futures.items()}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령행 진입점: 표준 입력의 JSON lines 대화 턴을 워커로 보내고 응답을 JSON lines로 출력합니다."""
+    import argparse
+    from chatbot_modules.logging_utils import check_api_key, setup_logging
+
+    parser = argparse.ArgumentParser(description="user_id별로 워커 프로세스에 대화 턴을 나누어 처리합니다.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="워커 프로세스 수")
+    parser.add_argument("--threads-per-worker", type=int, default=4, help="워커마다 동시에 처리할 대화 턴 수")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="사용자 상태 인계용 프로필 저장소 디렉토리")
+    args = parser.parse_args(argv)
+    setup_logging()
+    check_api_key()
+
+    with ShardedChatbot(args.workers, args.threads_per_worker, args.profile_dir) as chatbot:
+        with ThreadPoolExecutor(max_workers=args.workers * args.threads_per_worker) as pool:
+            def _process(line: str) -> str:
+                try:
+                    request = json.loads(line)
+                    result = chatbot.chat(request["user_id"], request["message"], persona_id=request.get("persona_id"))
+                    return json.dumps({"user_id": request["user_id"], **result}, ensure_ascii=False)
+                except Exception as e:
+                    return json.dumps({"error": str(e), "line": line.strip()}, ensure_ascii=False)
+
+            for output in pool.map(_process, (line for line in sys.stdin if line.strip())):
+                print(output, flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
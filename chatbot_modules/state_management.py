@@ -3,28 +3,41 @@
 - UserState: 사용자의 대화 기록, 정보, 맥락을 관리하는 클래스
 """
 
+import json
 import datetime
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional, Sequence
 
-from chatbot_modules.models import ConversationContext, UserInformation
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from chatbot_modules.models import ConversationContext, ContextLimitsConfig, UserInformation
+from chatbot_modules.message_store import MessageView
 
 class UserState:
     """사용자 상태를 관리하는 클래스"""
     
-    def __init__(self):
+    def __init__(self, context_limits: Optional[ContextLimitsConfig] = None):
         """초기화"""
-        self.conversation_history = {}  # 대화 기록 (user_id: List[Dict])
+        self.conversation_history = {}  # 대화 기록 (user_id: List[Dict] 또는 MessageView)
         self.user_information = {}  # 사용자 정보 (user_id: Dict)
         self.conversation_contexts = {}  # 대화 맥락 (user_id: Dict)
+        self.context_limits = context_limits or ContextLimitsConfig()  # 대화 맥락 크기 제한
+        self._context_turns = {}  # 대화 맥락 만료 계산용 턴 정보 (user_id: {"turn", "questions", "references"})
+        self._lock = threading.RLock()  # 백그라운드 분석 결과 병합과 대화 턴의 동시 갱신 보호
 
     def save_conversation(self, user_id: str, messages: List[Any]):
-        """대화 내용을 저장합니다."""
+        """대화 내용을 저장합니다.
+        
+        메시지 저장소의 뷰(MessageView)는 복사하지 않고 참조로 저장합니다.
+        """
         
         # 사용자 ID가 존재하지 않으면 초기화
         if user_id not in self.conversation_history:
             self.conversation_history[user_id] = []
         
+        # 메시지 저장소 뷰는 그대로 저장 (메시지 본문은 저장소에 한 번만 존재)
+        if isinstance(messages, MessageView):
+            self.conversation_history[user_id] = messages
+            return
+        
         # 메시지 형식 정규화 및 저장
         normalized_messages = []
         for msg in messages:
@@ -37,11 +50,7 @@ class UserState:
             else:
                 # LangChain 메시지 객체 처리
                 normalized_messages.append({
-                    "role": msg.type if hasattr(msg, 'type') else (
-                        "system" if isinstance(msg, SystemMessage) else
-                        "user" if isinstance(msg, HumanMessage) else
-                        "assistant"
-                    ),
+                    "role": getattr(msg, 'type', "assistant"),
                     "content": msg.content,
                     "timestamp": datetime.datetime.now().isoformat()
                 })
@@ -52,26 +61,57 @@ class UserState:
         # 대화 내용 업데이트
         self.conversation_history[user_id] = filtered_messages
         
+    def get_conversation_history(self, user_id: str) -> Sequence[Dict[str, Any]]:
+        """대화 기록을 반환합니다."""
+        return self.conversation_history.get(user_id, [])
+        
     def update_user_information(self, user_id: str, info: Dict[str, Any]):
         """사용자 정보를 업데이트합니다."""
-        if user_id not in self.user_information:
-            self.user_information[user_id] = UserInformation().dict()
+        with self._lock:
+            if user_id not in self.user_information:
+                self.user_information[user_id] = UserInformation().dict()
             
-        # 딕셔너리 합치기 (중첩된 딕셔너리와 리스트 처리)
-        for key, value in info.items():
-            if value is not None and value != "":
-                if key in ["interests", "goals"] and isinstance(value, list):
-                    # 리스트 항목 추가 (중복 제거)
-                    current_list = self.user_information[user_id].get(key, [])
-                    self.user_information[user_id][key] = list(set(current_list + value))
-                elif key in ["preferences", "family"] and isinstance(value, dict):
-                    # 딕셔너리 업데이트
-                    current_dict = self.user_information[user_id].get(key, {})
-                    current_dict.update(value)
-                    self.user_information[user_id][key] = current_dict
+            # 딕셔너리 합치기 (중첩된 딕셔너리와 리스트 처리)
+            for key, value in info.items():
+                if value is not None and value != "":
+                    if key in ["interests", "goals"] and isinstance(value, list):
+                        # 리스트 항목 추가 (중복 제거)
+                        current_list = self.user_information[user_id].get(key, [])
+                        self.user_information[user_id][key] = list(set(current_list + value))
+                    elif key in ["preferences", "family"] and isinstance(value, dict):
+                        # 딕셔너리 업데이트
+                        current_dict = self.user_information[user_id].get(key, {})
+                        current_dict.update(value)
+                        self.user_information[user_id][key] = current_dict
+                    else:
+                        # 일반 값 업데이트
+                        self.user_information[user_id][key] = value
+    
+    def apply_user_information_delta(self, user_id: str, delta: Dict[str, Dict[str, Any]]):
+        """변경분(add/change/remove, prompt_encoding.parse_delta 참고)을 사용자 정보에 반영합니다.
+        
+        추가/변경은 update_user_information의 병합 규칙을 따르고, 삭제는 목록 필드에서 항목을,
+        딕셔너리 필드에서 키를 제거하며 단일 값 필드는 기본값으로 되돌립니다.
+        """
+        with self._lock:
+            for key in ("add", "change"):
+                if delta.get(key):
+                    self.update_user_information(user_id, delta[key])
+            if not delta.get("remove") or user_id not in self.user_information:
+                return
+                
+            info = self.user_information[user_id]
+            defaults = UserInformation().dict()
+            for key, value in delta["remove"].items():
+                if key not in defaults:
+                    continue
+                removed = value if isinstance(value, (list, dict)) else [value]
+                if isinstance(defaults[key], list):
+                    info[key] = [item for item in info.get(key, []) if item not in removed]
+                elif isinstance(defaults[key], dict):
+                    info[key] = {k: v for k, v in info.get(key, {}).items() if k not in removed}
                 else:
-                    # 일반 값 업데이트
-                    self.user_information[user_id][key] = value
+                    info[key] = defaults[key]
     
     def get_user_information(self, user_id: str) -> Dict[str, Any]:
         """사용자 정보를 반환합니다."""
@@ -80,43 +120,155 @@ class UserState:
             
         return self.user_information[user_id]
         
+    def _turn_info(self, user_id: str) -> Dict[str, Any]:
+        """맥락 항목별로 추가/언급된 턴 정보를 반환합니다. (잠금 보유 상태에서 호출)"""
+        if user_id not in self._context_turns:
+            self._context_turns[user_id] = {"turn": 0, "questions": {}, "references": {}}
+        return self._context_turns[user_id]
+        
     def update_conversation_context(self, user_id: str, context_updates: Dict[str, Any]):
-        """대화 맥락을 업데이트합니다."""
-        if user_id not in self.conversation_contexts:
-            self.conversation_contexts[user_id] = ConversationContext().dict()
+        """대화 맥락을 업데이트합니다.
+        
+        목록/딕셔너리 필드는 새 값만 전달하면 기존 값과 병합되며, context_limits의 최대 크기를 넘으면
+        가장 오래된 항목부터 제거됩니다.
+        - main_topics: 최근 언급된 주제가 앞에 오도록 정렬
+        - pending_questions: 중복 없이 추가된 순서대로 유지
+        - references: 가장 최근에 언급된 항목 순으로 유지
+        """
+        limits = self.context_limits
+        with self._lock:
+            if user_id not in self.conversation_contexts:
+                self.conversation_contexts[user_id] = ConversationContext().dict()
+            context = self.conversation_contexts[user_id]
+            turn_info = self._turn_info(user_id)
             
-        # 필드별 업데이트 처리
-        for key, value in context_updates.items():
-            if key == "main_topics" and isinstance(value, list):
-                # 기존 주제와 병합하고 중복 제거
-                current_topics = self.conversation_contexts[user_id].get("main_topics", [])
-                updated_topics = list(set(current_topics + value))
-                # 최대 10개 주제만 유지 (오래된 주제 제거)
-                self.conversation_contexts[user_id]["main_topics"] = updated_topics[-10:]
-            elif key == "current_context" and value:
-                # 현재 맥락 업데이트
-                self.conversation_contexts[user_id]["current_context"] = value
-            elif key == "pending_questions" and isinstance(value, list):
-                # 대기 중인 질문 업데이트
-                current_questions = self.conversation_contexts[user_id].get("pending_questions", [])
-                # 새 질문 추가
-                self.conversation_contexts[user_id]["pending_questions"] = current_questions + value
-            elif key == "references" and isinstance(value, dict):
-                # 참조 정보 업데이트
-                current_refs = self.conversation_contexts[user_id].get("references", {})
-                current_refs.update(value)
-                self.conversation_contexts[user_id]["references"] = current_refs
+            # 필드별 업데이트 처리
+            for key, value in context_updates.items():
+                if key == "main_topics" and isinstance(value, list):
+                    # 새로 언급된 주제를 앞으로 옮기고 중복 제거 (최근 언급 순)
+                    new_topics = [topic for topic in value if topic]
+                    updated_topics = list(dict.fromkeys(new_topics + context.get("main_topics", [])))
+                    context["main_topics"] = updated_topics[:limits.max_topics]
+                elif key == "current_context" and value:
+                    # 현재 맥락 업데이트
+                    context["current_context"] = value
+                elif key == "pending_questions" and isinstance(value, list):
+                    # 새 질문만 추가 (이미 있는 질문은 다시 추가하지 않음)
+                    questions = list(context.get("pending_questions", []))
+                    for question in value:
+                        if question and question not in questions:
+                            questions.append(question)
+                            turn_info["questions"][question] = turn_info["turn"]
+                    # 최대 개수를 넘으면 오래된 질문부터 제거
+                    for question in questions[:-limits.max_pending_questions or None]:
+                        turn_info["questions"].pop(question, None)
+                    context["pending_questions"] = questions[-limits.max_pending_questions:] if limits.max_pending_questions else []
+                elif key == "references" and isinstance(value, dict):
+                    # 참조 정보 업데이트 (갱신된 항목은 최근 언급으로 이동)
+                    references = dict(context.get("references", {}))
+                    for ref_key, ref_value in value.items():
+                        references.pop(ref_key, None)
+                        references[ref_key] = ref_value
+                        turn_info["references"][ref_key] = turn_info["turn"]
+                    # 최대 개수를 넘으면 가장 오래 언급되지 않은 항목부터 제거
+                    while len(references) > limits.max_references:
+                        oldest = min(references, key=lambda k: turn_info["references"].get(k, 0))
+                        del references[oldest]
+                        turn_info["references"].pop(oldest, None)
+                    context["references"] = references
                 
-        # 마지막 업데이트 시간 기록
-        self.conversation_contexts[user_id]["last_update_time"] = datetime.datetime.now().isoformat()
+            # 마지막 업데이트 시간 기록
+            context["last_update_time"] = datetime.datetime.now().isoformat()
+    
+    def apply_conversation_context_delta(self, user_id: str, delta: Dict[str, Dict[str, Any]]):
+        """변경분(add/change/remove, prompt_encoding.parse_delta 참고)을 대화 맥락에 반영합니다.
+        
+        추가/변경은 update_conversation_context의 병합 규칙(최근 순, 최대 크기)을 따르고,
+        삭제는 주제/질문 항목과 참조 정보 키를 제거합니다.
+        """
+        with self._lock:
+            for key in ("add", "change"):
+                if delta.get(key):
+                    self.update_conversation_context(user_id, delta[key])
+            if not delta.get("remove") or user_id not in self.conversation_contexts:
+                return
+                
+            context = self.conversation_contexts[user_id]
+            turn_info = self._turn_info(user_id)
+            for key, value in delta["remove"].items():
+                removed = value if isinstance(value, (list, dict)) else [value]
+                if key == "main_topics":
+                    context["main_topics"] = [topic for topic in context.get("main_topics", []) if topic not in removed]
+                elif key == "pending_questions":
+                    for question in removed:
+                        self.remove_pending_question(user_id, question)
+                elif key == "references":
+                    references = context.get("references", {})
+                    for ref_key in removed:
+                        references.pop(ref_key, None)
+                        turn_info["references"].pop(ref_key, None)
+                elif key == "current_context":
+                    context["current_context"] = ""
+    
+    def advance_turn(self, user_id: str, user_message: Optional[str] = None) -> int:
+        """새 대화 턴을 기록하고 만료된 맥락 항목을 제거한 뒤 현재 턴 번호를 반환합니다.
+        
+        - 사용자 메시지에 키나 값이 다시 언급된 참조 정보는 최근 언급으로 갱신
+        - reference_ttl_turns 동안 언급되지 않은 참조 정보 제거
+        - question_ttl_turns가 지나도록 남아 있는 질문 제거
+        """
+        limits = self.context_limits
+        with self._lock:
+            turn_info = self._turn_info(user_id)
+            turn_info["turn"] += 1
+            turn = turn_info["turn"]
+            context = self.conversation_contexts.get(user_id)
+            if not context:
+                return turn
+                
+            references = context.get("references", {})
+            message = (user_message or "").lower()
+            for ref_key, ref_value in list(references.items()):
+                if message and (str(ref_key).lower() in message or str(ref_value).lower() in message):
+                    turn_info["references"][ref_key] = turn
+                elif turn - turn_info["references"].setdefault(ref_key, turn) > limits.reference_ttl_turns:
+                    del references[ref_key]
+                    del turn_info["references"][ref_key]
+                    
+            for question in list(context.get("pending_questions", [])):
+                if turn - turn_info["questions"].setdefault(question, turn) > limits.question_ttl_turns:
+                    self.remove_pending_question(user_id, question)
+            return turn
     
     def remove_pending_question(self, user_id: str, question: str):
         """답변된 질문을 대기 목록에서 제거합니다."""
-        if user_id in self.conversation_contexts and "pending_questions" in self.conversation_contexts[user_id]:
-            questions = self.conversation_contexts[user_id]["pending_questions"]
-            if question in questions:
-                questions.remove(question)
-                self.conversation_contexts[user_id]["pending_questions"] = questions
+        with self._lock:
+            if user_id in self.conversation_contexts and "pending_questions" in self.conversation_contexts[user_id]:
+                questions = self.conversation_contexts[user_id]["pending_questions"]
+                if question in questions:
+                    questions.remove(question)
+                    self.conversation_contexts[user_id]["pending_questions"] = questions
+                self._turn_info(user_id)["questions"].pop(question, None)
+    
+    def get_context_size(self, user_id: str) -> Dict[str, Any]:
+        """프롬프트에 들어가는 대화 맥락의 크기 지표를 반환합니다."""
+        with self._lock:
+            context = self.conversation_contexts.get(user_id) or {}
+            return {
+                "turn": self._context_turns.get(user_id, {}).get("turn", 0),
+                "main_topics": len(context.get("main_topics", [])),
+                "pending_questions": len(context.get("pending_questions", [])),
+                "references": len(context.get("references", {})),
+                "context_chars": len(json.dumps(context, ensure_ascii=False)) if context else 0
+            }
+    
+    def remove_user(self, user_id: str):
+        """사용자의 대화 기록, 사용자 정보, 대화 맥락을 모두 제거합니다. (다른 프로세스로 인계한 뒤 호출)"""
+        with self._lock:
+            self.conversation_history.pop(user_id, None)
+            self.user_information.pop(user_id, None)
+            self.conversation_contexts.pop(user_id, None)
+            self._context_turns.pop(user_id, None)
     
     def get_conversation_context(self, user_id: str) -> Dict[str, Any]:
         """대화 맥락을 반환합니다."""
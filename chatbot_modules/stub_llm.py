@@ -0,0 +1,143 @@
+"""
+로컬 스텁 LLM 모듈
+- StubChatModel: 네트워크 없이 지연 시간과 실패를 주입할 수 있는 채팅 모델 스텁
+- stub_llm_factory: 호출 정책/라우터에 주입할 수 있는 스텁 모델 팩토리
+
+호출 정책, 스케줄러, 부하 테스트 등을 OpenAI API 없이 검증할 때 사용합니다.
+"""
+
+import json
+import time
+import random
+import threading
+from typing import Any, Callable, List, Optional, Union
+
+class StubLLMError(RuntimeError):
+    """스텁 모델이 주입된 실패를 발생시킬 때 사용하는 예외"""
+
+def _batch_item_ids(content: str) -> List[str]:
+    """보조 노드 묶음 요청(항목 JSON 배열)의 항목 ID 목록을 반환합니다. 묶음 요청이 아니면 빈 목록을 반환합니다."""
+    if not content.startswith("["):
+        return []
+    try:
+        items = json.loads(content)
+    except ValueError:
+        return []
+    return [str(item["id"]) for item in items if isinstance(item, dict) and "id" in item]
+
+def _default_responder(messages: List[Any]) -> str:
+    """마지막 메시지를 바탕으로 결정적인 응답을 만듭니다."""
+    last = messages[-1] if messages else None
+    content = getattr(last, "content", last.get("content", "") if isinstance(last, dict) else "")
+    # 보조 노드(JSON 응답 기대)에는 빈 JSON 객체를 반환 (여러 사용자 묶음 요청이면 항목 ID별 빈 변경분)
+    system = getattr(messages[0], "content", "") if messages else ""
+    if "JSON" in system:
+        item_ids = _batch_item_ids(str(content))
+        return "{" + ",".join(f'"{item_id}":{{}}' for item_id in item_ids) + "}" if item_ids else "{}"
+    return f"(stub) {str(content)[:50]}"
+
+class StubChatModel:
+    """LoggingChatOpenAI 대신 사용할 수 있는 로컬 스텁 채팅 모델
+
+    Args:
+        latency: 호출당 지연 시간(초) 또는 지연 시간을 반환하는 함수
+        failure_rate: 호출이 StubLLMError로 실패할 확률
+        responder: 메시지 목록을 받아 응답 문자열을 반환하는 함수
+        model_name: 모델 이름 (통계/로그 키)
+        seed: 난수 시드
+        concurrency_limit: 동시에 처리하는 최대 호출 수 (넘는 호출은 대기, 업스트림 속도 제한 모의)
+        scheduler: LLM 작업 스케줄러 (주면 LoggingChatOpenAI처럼 실행 차례를 받은 뒤 호출)
+    """
+
+    def __init__(self,
+                 latency: Union[float, Callable[[], float]] = 0.0,
+                 failure_rate: float = 0.0,
+                 responder: Optional[Callable[[List[Any]], str]] = None,
+                 model_name: str = "stub",
+                 seed: Optional[int] = None,
+                 concurrency_limit: Optional[int] = None,
+                 scheduler: Any = None):
+        """초기화"""
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.responder = responder or _default_responder
+        self.model_name = model_name
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._upstream = threading.Semaphore(concurrency_limit) if concurrency_limit else None
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+
+    def _to_messages(self, input: Any) -> List[Any]:
+        """프롬프트 값/문자열/메시지 목록을 메시지 목록으로 변환합니다."""
+        if hasattr(input, "to_messages"):
+            return input.to_messages()
+        if isinstance(input, str):
+            return [{"role": "user", "content": input}]
+        return list(input)
+
+    def invoke(self, input: Any, config: Any = None, **kwargs):
+        """지연 시간과 실패를 주입한 뒤 응답 메시지를 반환합니다."""
+        if self.scheduler is None:
+            return self._invoke(input)
+        from chatbot_modules.logging_utils import get_log_context
+        with self.scheduler.slot(get_log_context().get("user_id"), self.scheduler.resolve_priority(),
+                                 self.scheduler.config.expected_completion_tokens):
+            return self._invoke(input)
+
+    def _invoke(self, input: Any):
+        """업스트림 동시 처리 한도 안에서 응답을 만듭니다."""
+        if self._upstream is not None:
+            with self._upstream:
+                return self._respond(input)
+        return self._respond(input)
+
+    def _respond(self, input: Any):
+        """지연 시간과 실패를 주입한 뒤 응답 메시지를 만듭니다."""
+        from langchain_core.messages import AIMessage
+        from chatbot_modules.utils import estimate_tokens
+
+        with self._lock:
+            self.calls += 1
+            delay = self.latency() if callable(self.latency) else self.latency
+            failed = self._random.random() < self.failure_rate
+
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise StubLLMError(f"{self.model_name}: 주입된 실패")
+
+        messages = self._to_messages(input)
+        content = self.responder(messages)
+        # 실제 모델처럼 사용량 정보를 붙임 (토큰 수는 글자 수 기준 추정치)
+        input_tokens = estimate_tokens("".join(
+            str(message.get("content", "") if isinstance(message, dict) else getattr(message, "content", ""))
+            for message in messages))
+        output_tokens = estimate_tokens(content)
+        return AIMessage(content=content, usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                                          "total_tokens": input_tokens + output_tokens})
+
+def heavy_tail_latency(base: float = 0.05, tail: float = 1.0, tail_probability: float = 0.05,
+                       seed: Optional[int] = None) -> Callable[[], float]:
+    """대부분 base 근처이고 일부 호출만 tail만큼 느린 지연 시간 분포를 반환합니다."""
+    rng = random.Random(seed)
+
+    def _latency() -> float:
+        if rng.random() < tail_probability:
+            return tail * rng.uniform(0.8, 1.2)
+        return base * rng.uniform(0.8, 1.2)
+
+    return _latency
+
+def stub_llm_factory(**stub_kwargs) -> Callable[..., StubChatModel]:
+    """모델 이름별로 스텁 모델을 하나씩 만들어 재사용하는 팩토리를 반환합니다."""
+    models = {}
+    lock = threading.Lock()
+
+    def _factory(model_name: str = "stub", **llm_kwargs) -> StubChatModel:
+        with lock:
+            if model_name not in models:
+                models[model_name] = StubChatModel(model_name=model_name, **stub_kwargs)
+            return models[model_name]
+
+    return _factory
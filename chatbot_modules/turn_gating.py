@@ -0,0 +1,143 @@
+"""
+턴 게이팅 모듈
+- classify_turn: 사용자 메시지를 분석하는 로컬 분류기
+- EnrichmentGate: 보조 노드(정보 추출/맥락 추적) 실행 여부를 결정하는 라우터
+"""
+
+import re
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from chatbot_modules.models import EnrichmentGateConfig
+from chatbot_modules.logging_utils import log_event
+from chatbot_modules.utils import _contains_personal_info
+from chatbot_modules.message_store import get_state_messages
+
+# 자모, 이모지, 문장부호, 웃음(ㅋ/ㅎ)만으로 이루어진 메시지 판별용 패턴
+_TRIVIAL_PATTERN = re.compile(r'^[ㄱ-ㅎㅏ-ㅣ\W_]*$')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+def _message_role_and_content(msg: Any):
+    """딕셔너리/LangChain 메시지에서 (역할, 내용)을 꺼냅니다."""
+    if isinstance(msg, dict):
+        return msg.get("role"), msg.get("content", "")
+    role = getattr(msg, "type", None)
+    if role == "human":
+        role = "user"
+    return role, getattr(msg, "content", "")
+
+def _bigrams(text: str) -> set:
+    """공백을 제거한 문자열의 글자 bigram 집합을 반환합니다."""
+    compact = _WHITESPACE_PATTERN.sub("", text.lower())
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i:i + 2] for i in range(len(compact) - 1)}
+
+def classify_turn(messages: Sequence[Any], config: EnrichmentGateConfig) -> Dict[str, Any]:
+    """마지막 사용자 메시지가 보조 LLM 호출을 할 가치가 있는지 판정합니다.
+
+    Returns:
+        {"enrich": bool, "reason": str, "features": {...}}
+    """
+    # 뒤에서부터 필요한 만큼(현재 + 비교 구간)의 사용자 메시지만 수집
+    user_texts = []
+    for msg in reversed(messages):
+        role, content = _message_role_and_content(msg)
+        if role == "user" and content:
+            user_texts.append(content)
+            if len(user_texts) > config.novelty_window:
+                break
+    user_texts.reverse()
+    if not user_texts:
+        return {"enrich": False, "reason": "no_user_message", "features": {}}
+
+    text = user_texts[-1].strip()
+    compact = _WHITESPACE_PATTERN.sub("", text)
+    normalized = _PUNCTUATION_PATTERN.sub("", text).strip().lower()
+
+    # 최근 사용자 메시지 대비 새로운 bigram 비율
+    current_bigrams = _bigrams(text)
+    recent_bigrams = set()
+    for previous in user_texts[-(config.novelty_window + 1):-1]:
+        recent_bigrams |= _bigrams(previous)
+    if current_bigrams and recent_bigrams:
+        novelty = len(current_bigrams - recent_bigrams) / len(current_bigrams)
+    else:
+        novelty = 1.0
+
+    features = {
+        "length": len(compact),
+        "novelty": round(novelty, 3),
+        "has_question": "?" in text or any(k in text for k in config.question_keywords),
+        "personal_info": _contains_personal_info([{"role": "user", "content": text}]),
+    }
+
+    if features["personal_info"]:
+        return {"enrich": True, "reason": "personal_info", "features": features}
+    if _TRIVIAL_PATTERN.match(compact) or normalized in config.trivial_phrases:
+        return {"enrich": False, "reason": "trivial", "features": features}
+    if features["length"] < config.min_chars and not features["has_question"]:
+        return {"enrich": False, "reason": "too_short", "features": features}
+    if features["has_question"]:
+        return {"enrich": True, "reason": "question", "features": features}
+    if novelty < config.min_novelty:
+        return {"enrich": False, "reason": "low_novelty", "features": features}
+    return {"enrich": True, "reason": "novel", "features": features}
+
+class EnrichmentGate:
+    """조건부 엣지에서 사용하는 보조 노드 라우터
+
+    "enrich"를 반환하면 정보 추출/맥락 추적 노드를 실행하고,
+    "skip"을 반환하면 곧바로 응답 생성 노드로 이동합니다.
+    """
+
+    def __init__(self, config: Optional[EnrichmentGateConfig] = None):
+        """초기화"""
+        self.config = config or EnrichmentGateConfig()
+        self.total_turns = 0
+        self.skipped_turns = 0
+        self.skip_reasons = {}  # 건너뛴 이유별 횟수 (reason: int)
+        self._lock = threading.Lock()
+
+    def __call__(self, state: Dict[str, Any]) -> str:
+        """그래프 상태를 보고 다음 경로를 결정합니다."""
+        if not self.config.enabled:
+            return "enrich"
+
+        try:
+            decision = classify_turn(get_state_messages(state), self.config)
+        except Exception as e:
+            # 분류 실패 시 기존 동작(항상 실행)으로 되돌림
+            print(f"턴 분류 중 오류 발생: {e}")
+            return "enrich"
+
+        with self._lock:
+            self.total_turns += 1
+            if not decision["enrich"]:
+                self.skipped_turns += 1
+                self.skip_reasons[decision["reason"]] = self.skip_reasons.get(decision["reason"], 0) + 1
+            stats = self.get_stats()
+
+        if self.config.log_every > 0 and stats["total_turns"] % self.config.log_every == 0:
+            log_event("enrichment_gate", {
+                "user_id": state.get("user_id"),
+                "decision": "enrich" if decision["enrich"] else "skip",
+                "reason": decision["reason"],
+                "features": decision["features"],
+                **stats
+            })
+
+        return "enrich" if decision["enrich"] else "skip"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """누적 판정 통계와 건너뛰기 비율을 반환합니다."""
+        return {
+            "total_turns": self.total_turns,
+            "skipped_turns": self.skipped_turns,
+            "skip_rate": round(self.skipped_turns / self.total_turns, 3) if self.total_turns else 0.0,
+            "skip_reasons": dict(self.skip_reasons),
+        }
+
+# 전역 게이트 객체
+enrichment_gate = EnrichmentGate()
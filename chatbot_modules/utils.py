@@ -1,14 +1,13 @@
 """
 유틸리티 함수 모듈
 - 개인정보 감지
+- 토큰 수 추정/측정
 - 시스템 프롬프트 강화
 """
 
 import re
 import json
-from typing import Dict, Any, List
-
-from langchain_core.messages import HumanMessage
+from typing import Dict, Any, List, Optional
 
 from chatbot_modules.state_management import user_state
 
@@ -20,7 +19,7 @@ def _contains_personal_info(messages):
         if isinstance(msg, dict) and msg.get("role") == "user" and "content" in msg:
             last_user_message = msg["content"]
             break
-        elif isinstance(msg, HumanMessage):
+        elif getattr(msg, "type", None) == "human":
             last_user_message = msg.content
             break
     
@@ -39,7 +38,11 @@ def _contains_personal_info(messages):
         r'\b라고\s*불러\b', r'\b라고\s*해\b',
         r'\b살고\s*있어\b', r'\b살아\b',
         r'\b좋아해\b', r'\b관심\s*있어\b', r'\b좋아하는\b',
-        r'\b소개\b', r'\b나에\s*대해\b', r'\b저에\s*대해\b'
+        r'\b소개\b', r'\b나에\s*대해\b', r'\b저에\s*대해\b',
+        # 짧은 한국어 신상 발화 ("나 32살", "나 이사했어", "나 결혼해")는 글자 수가 적어도 놓치지 않도록 나이/이사/결혼 표현 포함
+        r'\d+\s*살', r'\d+\s*세\b', r'(스물|서른|마흔|쉰|예순|일흔)\s*(한|두|세|네|다섯|여섯|일곱|여덟|아홉)?\s*살',
+        r'이사\s*(했|해|하|할|가|갔|갈|왔|와|온)',
+        r'(결혼|약혼|이혼)\s*(했|해|하|할|식|한)'
     ]
     
     # 개인정보 관련 키워드가 있는지 확인
@@ -49,8 +52,35 @@ def _contains_personal_info(messages):
     
     return False
 
-def enhance_system_prompt(user_id: str, system_prompt: str) -> str:
-    """시스템 프롬프트에 이전 대화 맥락과 사용자 정보를 추가합니다."""
+def estimate_tokens(text: str) -> int:
+    """문자열의 토큰 수를 대략적으로 추정합니다. (한국어 기준 약 2글자당 1토큰)"""
+    if not text:
+        return 0
+    return max(1, len(text) // 2)
+
+# tiktoken 인코더 (첫 호출 시 로드, 로드할 수 없으면 False로 기록하고 추정치 사용)
+_TOKEN_ENCODING = "cl100k_base"
+_token_encoder = None
+
+def count_tokens(text: str) -> int:
+    """문자열의 토큰 수를 tiktoken으로 셉니다. (tiktoken을 쓸 수 없으면 estimate_tokens로 추정)"""
+    global _token_encoder
+    if not text:
+        return 0
+    if _token_encoder is None:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding(_TOKEN_ENCODING)
+        except Exception as e:
+            print(f"tiktoken 인코더를 불러오지 못해 토큰 수를 추정합니다: {e}")
+            _token_encoder = False
+    if _token_encoder is False:
+        return estimate_tokens(text)
+    return len(_token_encoder.encode(text))
+
+def enhance_system_prompt(user_id: str, system_prompt: str,
+                          recalled_turns: Optional[List[Dict[str, Any]]] = None) -> str:
+    """시스템 프롬프트에 이전 대화 맥락과 사용자 정보, 현재 메시지와 관련된 과거 대화 턴을 추가합니다."""
     enhanced_prompt = system_prompt
     
     try:
@@ -85,6 +115,11 @@ def enhance_system_prompt(user_id: str, system_prompt: str) -> str:
             
             if context.get('pending_questions'):
                 enhanced_prompt += f"\n\n아직 답변하지 않은 질문들:\n- {', '.join(context['pending_questions'])}"
+        
+        # 장기 기억 인덱스에서 찾은 관련 과거 대화
+        if recalled_turns:
+            recalled = "\n".join(f"- 사용자: {turn['user']} / 챗봇: {turn['assistant']}" for turn in recalled_turns)
+            enhanced_prompt += f"\n\n현재 메시지와 관련된 과거 대화:\n{recalled}"
     
     except Exception as e:
         print(f"시스템 프롬프트 강화 중 오류 발생: {e}")
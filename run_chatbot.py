@@ -13,10 +13,6 @@ import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-# 로그 디렉토리 확인 및 생성
-log_dir = os.path.join(current_dir, "logs")
-os.makedirs(log_dir, exist_ok=True)
-
 # API 키 확인
 try:
     from chatbot_modules.logging_utils import check_api_key
@@ -38,7 +34,10 @@ from chatbot_modules.main import run_chatbot
 
 if __name__ == "__main__":
     try:
-        run_chatbot()
+        # --no-warmup: 이전 대화 분석이 끝난 뒤 대화 시작
+        # --persona <ID>: 대화할 페르소나 (CHATBOT_PERSONAS 설정 파일에 정의, 없으면 기본 친구 페르소나)
+        persona_id = sys.argv[sys.argv.index("--persona") + 1] if "--persona" in sys.argv[:-1] else None
+        run_chatbot(warmup="--no-warmup" not in sys.argv, persona_id=persona_id)
     except KeyboardInterrupt:
         print("\n프로그램이 중단되었습니다.")
     except Exception as e: